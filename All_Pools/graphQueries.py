@@ -0,0 +1,168 @@
+import os
+import argparse
+from dotenv import load_dotenv # type: ignore
+from datetime import datetime
+import pandas as pd # type: ignore
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import wideInt
+from snapshotArchive import append_snapshots
+from subgraphClient import post_query
+from snapshotCatalog import register_snapshot
+
+load_dotenv()
+
+# Every tracked pool and the env variable holding its liquidityCSV directory
+POOLS = {
+    "0x11950d141ecb863f01007add7d1a342041227b58": 'output_csv_path_PEPE_WETH_Pool',
+    "0xcbcdf9626bc03e24f779434178a73a0b4bad62ed": 'output_csv_path_WBTC_ETH_Pool',
+    "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640": 'output_csv_path_USDC_ETH_0.05_Pool',
+    "0x8ad599c3a0ff1de082011efddc58f1908eb6e6d8": 'output_csv_path_USDC_ETH_0.3_Pool',
+}
+
+# The env variable holding each pool's optional snapshot archive, the same one its own
+# graphQueries.py appends to, so the archive holds every snapshot whichever script took it
+ARCHIVES = {
+    "0x11950d141ecb863f01007add7d1a342041227b58": 'output_archive_path_PEPE_WETH_Pool',
+    "0xcbcdf9626bc03e24f779434178a73a0b4bad62ed": 'output_archive_path_WBTC_ETH_Pool',
+    "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640": 'output_archive_path_USDC_ETH_0.05_Pool',
+    "0x8ad599c3a0ff1de082011efddc58f1908eb6e6d8": 'output_archive_path_USDC_ETH_0.3_Pool',
+}
+
+MIN_TICK = -887272
+
+def get_indexed_block():
+    query = """
+    {
+        _meta {
+            block {
+                number
+                timestamp
+            }
+        }
+    }
+    """
+    meta_block = post_query(query)['_meta']['block']
+    return int(meta_block['number'])
+
+def build_batch_query(cursors, block, batch_size):
+    """
+    Builds one query with an aliased pool(...) field per pool that still has tick
+    pages left, each continuing from its own tickIdx cursor.
+    """
+    fields = []
+    for alias, (pool_address, cursor) in cursors.items():
+        fields.append("""
+            %s: pool(id: "%s", block: {number: %d}) {
+                id
+                tick
+                ticks(first: %d, orderBy: tickIdx, orderDirection: asc, where: {tickIdx_gt: "%d"}) {
+                    tickIdx
+                    liquidityNet
+                }
+            }""" % (alias, pool_address, block, batch_size, cursor))
+    return "{%s\n}" % "".join(fields)
+
+def get_pools_data(pool_addresses, batch_size=1000):
+    """
+    Fetches the tick and all tick pages of every pool through shared requests, all
+    pinned to the same indexed block. Returns {pool_address: (pool_data, ticks)}.
+    """
+    block = get_indexed_block()
+    aliases = {f"pool_{i}": address for i, address in enumerate(pool_addresses)}
+    cursors = {alias: (address, MIN_TICK - 1) for alias, address in aliases.items()}
+    results = {address: (None, []) for address in pool_addresses}
+
+    while cursors:
+        data = post_query(build_batch_query(cursors, block, batch_size))
+        for alias in list(cursors):
+            address = aliases[alias]
+            pool = data[alias]
+            if pool is None:
+                print(f"Error: pool {address} not found at block {block}")
+                del cursors[alias]
+                continue
+
+            pool_data, ticks = results[address]
+            if pool_data is None:
+                pool_data = {
+                    "id": pool['id'],
+                    "tick": pool['tick'],
+                    "block": block
+                }
+            page = pool['ticks']
+            for tick in page:
+                ticks.append({
+                    "tickIdx": tick['tickIdx'],
+                    "liquidityNet": tick['liquidityNet']
+                })
+            results[address] = (pool_data, ticks)
+
+            # Pools with a short page are done and drop out of the next request
+            if len(page) < batch_size:
+                del cursors[alias]
+            else:
+                cursors[alias] = (address, int(page[-1]['tickIdx']))
+
+    return results
+
+def write_snapshot(output_dir, pool_data, all_ticks, timestamp, archive_path=None):
+    df = pd.DataFrame(all_ticks)
+    
+    df['timestamp'] = timestamp
+    df['current_tick'] = pool_data['tick']
+    df['pool_id'] = pool_data['id']
+    
+    df['tickIdx'] = df['tickIdx'].astype(int)
+    df = df.sort_values('tickIdx')
+    df['cumulative_liquidity'] = wideInt.to_strings(wideInt.cumsum(wideInt.parse(df['liquidityNet'])))
+    filename = f"liquidity_data_{timestamp}.csv"
+    filepath = os.path.join(output_dir, filename)
+    df.to_csv(filepath, index=False)
+    print(f"Data saved to {filepath}")
+    register_snapshot(filepath, df, pool_data.get('block'))
+    if archive_path:
+        append_snapshots(archive_path, [df])
+        print(f"Snapshot archived to {archive_path}")
+    return filepath
+
+def get_hourly_pools_data(pools):
+    # One timestamp for every pool so cross-pool snapshots line up exactly
+    timestamp = int(datetime.now().timestamp())
+
+    try:
+        results = get_pools_data(list(pools))
+    except Exception as e:
+        print(f"Error: {e}")
+        return
+
+    for pool_address, (pool_data, all_ticks) in results.items():
+        output_dir = os.getenv(pools[pool_address])
+        if not output_dir:
+            print(f"Error: '{pools[pool_address]}' not found in .env file.")
+            continue
+        if not all_ticks:
+            print(f"No tick data for pool {pool_address}")
+            continue
+        os.makedirs(output_dir, exist_ok=True)
+        write_snapshot(output_dir, pool_data, all_ticks, timestamp, os.getenv(ARCHIVES[pool_address]))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pools', nargs='*', default=list(POOLS),
+                        help="pool addresses to snapshot (defaults to every tracked pool)")
+    args = parser.parse_args()
+
+    pools = {}
+    for pool_address in args.pools:
+        pool_address = pool_address.lower()
+        if pool_address not in POOLS:
+            print(f"Error: no output directory configured for pool {pool_address}")
+            continue
+        pools[pool_address] = POOLS[pool_address]
+
+    if pools:
+        get_hourly_pools_data(pools)
+
+if __name__ == "__main__":
+    main()
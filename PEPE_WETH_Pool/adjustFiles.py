@@ -1,59 +1,170 @@
 import os
+import re
+import hashlib
+import numpy as np
 import pandas as pd
 from decimal import Decimal, getcontext
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import wideInt
+from manifest import load_manifest, save_manifest, is_current, record, prune
+from snapshotCatalog import get_catalog_db, catalog_row, add_catalog_row
 
 # Set Decimal precision to handle very large numbers
 getcontext().prec = 78  # Approximately 256 bits
 load_dotenv()
 
-def process_csv_files():
+# Snapshots handed to each worker at once, so the vectorized pass covers many files
+FILES_PER_TASK = 32
+
+# Bump when the adjusted output changes, so every snapshot is redone on the next run
+ADJUST_VERSION = 1
+
+def decimal_values(values):
+    # Slow path for files that hold float-formatted values ('123.0', '1.5e+16'): Decimal itself
+    numbers, exponents, text = [], [], []
+    for value in values:
+        numbers.append(wideInt.to_integral(value))
+        number = Decimal(value)
+        exponents.append(number.as_tuple().exponent)
+        text.append(str(number))
+    return numbers, np.array(exponents, dtype=np.int64), np.array(text, dtype=object)
+
+def adjust_liquidity(liquidity_net, starts=(0,)):
+    """
+    Returns liquidityNet and the clamped cumulative liquidity as the strings the Decimal
+    loop used to write. The running sum restarts from Decimal('0') when it goes negative
+    or a new file begins at one of starts; Decimal also keeps the smallest exponent added
+    since, so '.0' inputs print as '123.0'.
+    """
+    values = list(liquidity_net)
+    try:
+        numbers = list(map(int, values))
+        exponents = None
+    except (ValueError, TypeError):
+        numbers, exponents, net_text = decimal_values(values)
+
+    files = wideInt.segment_ids(len(values), starts)
+    net = wideInt.from_ints(numbers)
+    cumulative = wideInt.clamped_cumsum(net, files)
+    text = wideInt.to_strings(cumulative)
+
+    if exponents is None:
+        # Decimal prints integer literals as int does, except that it keeps '-0'
+        net_text = np.array(list(map(str, numbers)), dtype=object)
+        for i in np.flatnonzero(wideInt.is_zero(net)):
+            if values[i].strip().startswith('-'):
+                net_text[i] = '-0'
+        return net_text, text
+
+    exponents = np.minimum(exponents, 0)
+    if not exponents.any():
+        return net_text, text
+
+    # A reset starts a new run at exponent 0 and a new file at the row's own exponent;
+    # within a run the exponent is a running min
+    first = np.diff(files, prepend=-1) != 0
+    previous = np.vstack([wideInt.zeros(1), cumulative[:-1]])
+    previous[first] = 0
+    reset = wideInt.is_negative(wideInt.add(previous, net))
+    exponents[reset] = 0
+    run = np.cumsum(reset | first)
+    span = 1 - exponents.min()
+    exponents = np.minimum.accumulate(exponents - run * span) + run * span
+
+    zero = wideInt.is_zero(cumulative)
+    for i in np.flatnonzero(exponents < 0):
+        if zero[i] and exponents[i] < -6:
+            text[i] = f"0E{exponents[i]}"
+        else:
+            text[i] = text[i] + '.' + '0' * -exponents[i]
+    return net_text, text
+
+def read_snapshot(filepath):
+    # liquidityNet stays a string to preserve precision; only the needed columns are read
+    df = pd.read_csv(filepath, usecols=['tickIdx', 'liquidityNet', 'timestamp', 'current_tick', 'pool_id'], dtype={
+        'liquidityNet': str,
+        'tickIdx': 'int64',
+        'timestamp': 'int64',
+        'current_tick': 'int64',
+        'pool_id': str
+    })
+    return df[['tickIdx', 'liquidityNet', 'timestamp', 'current_tick', 'pool_id']].sort_values('tickIdx')
+
+def adjust_files(paths):
+    """
+    Adjusts a batch of (source, destination) snapshot files, running the cumulative sums
+    of all of them in one vectorized pass. Returns (destination, stats, catalog row) per
+    file; the row is built from the frame and the bytes written, so nothing is read back.
+    """
+    frames = [read_snapshot(source) for source, _ in paths]
+    lengths = [len(df) for df in frames]
+    starts = np.cumsum([0] + lengths[:-1])
+    liquidity_net, cumulative = adjust_liquidity(pd.concat([df['liquidityNet'] for df in frames]), starts)
+
+    results = []
+    for df, (_, dest_path), start, length in zip(frames, paths, starts, lengths):
+        df['liquidityNet'] = liquidity_net[start:start + length]
+        df['cumulative_liquidity'] = cumulative[start:start + length]
+        data = df.to_csv(index=False, float_format='%.0f').encode()
+        with open(dest_path, 'wb') as f:
+            f.write(data)
+        row = catalog_row(dest_path, df, sha256=hashlib.sha256(data).hexdigest())
+        results.append((dest_path, {
+            'rows': length,
+            'max_cumulative_liquidity': row.max_cumulative_liquidity
+        }, row))
+    return results
+
+def adjust_batch(paths):
+    # One bad file should not sink its batch, so a failed batch is retried file by file
+    try:
+        return [(source, dest_path, stats, row, None) for (source, _), (dest_path, stats, row) in zip(paths, adjust_files(paths))]
+    except Exception:
+        results = []
+        for source, dest_path in paths:
+            try:
+                results.append((source, *adjust_files([(source, dest_path)])[0], None))
+            except Exception as e:
+                results.append((source, dest_path, None, None, e))
+        return results
+
+def process_csv_files(workers=None, files_per_task=FILES_PER_TASK, force=False):
     source_dir = os.getenv('output_csv_path_PEPE_WETH_Pool')
     dest_dir = os.getenv('output_csv_adjusted_path_PEPE_WETH_POOL')
-    
+
     os.makedirs(dest_dir, exist_ok=True)
-    
-    for filename in os.listdir(source_dir):
-        if filename.endswith('.csv'):
-            print(f"\nProcessing {filename}...")
-            filepath = os.path.join(source_dir, filename)
-            
-            # Read CSV with string types to preserve precision
-            df = pd.read_csv(filepath, dtype={
-                'liquidityNet': str,
-                'tickIdx': str,
-                'timestamp': str,
-                'current_tick': str,
-                'pool_id': str
-            })
-            
-            # Keep only needed columns
-            df = df[['tickIdx', 'liquidityNet', 'timestamp', 'current_tick', 'pool_id']]
-            
-            # Convert to appropriate types
-            df['liquidityNet'] = df['liquidityNet'].apply(Decimal)
-            df['tickIdx'] = df['tickIdx'].astype(int)
-            df['timestamp'] = df['timestamp'].astype(int)
-            df['current_tick'] = df['current_tick'].astype(int)
-            
-            df = df.sort_values('tickIdx')
-            
-            # Calculate cumulative with Decimal
-            cumulative = Decimal('0')
-            cumulative_list = []
-            
-            for liquidity in df['liquidityNet']:
-                cumulative += liquidity
-                if cumulative < 0:
-                    cumulative = Decimal('0')
-                cumulative_list.append(str(cumulative))  # Convert to string to preserve precision
-            
-            df['cumulative_liquidity'] = cumulative_list
-            
-            # Save to CSV with string format to preserve precision
-            dest_path = os.path.join(dest_dir, filename)
-            df.to_csv(dest_path, index=False, float_format='%.0f')
-            print(f"Saved adjusted file to: {dest_path}")
+
+    filenames = [filename for filename in sorted(os.listdir(source_dir)) if filename.endswith('.csv')]
+
+    # Only snapshots that are new, changed, or adjusted by older code need work
+    manifest = load_manifest(dest_dir)
+    prune(manifest, filenames)
+    paths = [(os.path.join(source_dir, filename), os.path.join(dest_dir, filename)) for filename in filenames]
+    paths = [(source, dest_path) for source, dest_path in paths
+             if force or not is_current(manifest, source, ADJUST_VERSION)]
+    print(f"{len(filenames) - len(paths)} of {len(filenames)} files already adjusted.")
+    batches = [paths[i:i + files_per_task] for i in range(0, len(paths), files_per_task)]
+
+    # Batches are independent, so they are adjusted across a pool of processes
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(adjust_batch, batches):
+            for source, dest_path, stats, row, error in results:
+                filename = os.path.basename(dest_path)
+                print(f"\nProcessing {filename}...")
+                if error is None:
+                    match = re.match(r'liquidity_data_(\d+)\.csv', filename)
+                    record(manifest, source, ADJUST_VERSION, [dest_path], stats=stats,
+                           timestamp=int(match.group(1)) if match else None)
+                    add_catalog_row(row, commit=False)
+                    print(f"Saved adjusted file to: {dest_path}")
+                else:
+                    print(f"Error processing {filename}: {error}")
+            save_manifest(dest_dir, manifest)
+            get_catalog_db().commit()
+    save_manifest(dest_dir, manifest)
 
 if __name__ == "__main__":
     process_csv_files()
\ No newline at end of file
@@ -1,42 +1,32 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from datetime import datetime
-import os, re
-from decimal import Decimal, getcontext
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import wideInt
+from manifest import load_manifest, save_manifest, is_current, cached_stats, record, prune, source_name
+from snapshotArchive import snapshot_sources, read_snapshot
 
 load_dotenv()
 
-def get_max_liquidity(csv_files):
-    max_liquidity = 0
-    for _, filepath in csv_files:
-        try:
-            df = pd.read_csv(filepath)
-            df['cumulative_liquidity'] = df['cumulative_liquidity'].apply(Decimal)
-            max_liquidity = max(max_liquidity, df['cumulative_liquidity'].max())
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
-            continue
-    return max_liquidity
-
-def plot_liquidity_distribution(csv_file_path, max_liquidity):
-    output_charts_path = os.getenv('output_charts_path_PEPE_WETH_Pool')
-
-    if not output_charts_path:
-        print("Error: 'output_charts_path' not found in .env file.")
-        return
-
-    # Define absolute paths for bar and line charts
-    bar_charts_path = os.path.join(output_charts_path, 'barCharts')
-    line_charts_path = os.path.join(output_charts_path, 'lineCharts')
-
-    # Ensure the output directories exist
-    os.makedirs(bar_charts_path, exist_ok=True)
-    os.makedirs(line_charts_path, exist_ok=True)
+# Bump when the charts change, so every chart is redrawn on the next run
+CHART_VERSION = 1
 
+def load_snapshot(csv_file_path):
+    """
+    Parses a snapshot once for both passes: the float data the charts plot and the
+    stats kept in the chart manifest (exact max cumulative liquidity, current tick and
+    row count). Returns None if the snapshot cannot be read.
+    """
     # Read and preprocess data
     try:
-        df = pd.read_csv(csv_file_path)
+        df = read_snapshot(csv_file_path, clamped=True)
     except FileNotFoundError:
         print(f"Error: The file '{csv_file_path}' does not exist.")
         return
@@ -50,7 +40,8 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity):
     # Convert data types
     try:
         df['tickIdx'] = df['tickIdx'].astype(int)
-        df['cumulative_liquidity'] = df['cumulative_liquidity'].apply(Decimal)
+        cumulative = wideInt.parse(df['cumulative_liquidity'])
+        df['cumulative_liquidity'] = wideInt.to_float(cumulative)
     except KeyError as e:
         print(f"Error: Missing expected column {e} in CSV.")
         return
@@ -63,8 +54,6 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity):
 
     # Extract necessary data
     try:
-        tickIdx = df['tickIdx']
-        cumulative_liquidity = df['cumulative_liquidity']
         current_tick = int(df['current_tick'].iloc[0])
         timestamp = int(df['timestamp'].iloc[0])
         pool_id = df['pool_id'].iloc[0]
@@ -78,13 +67,93 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity):
         print(f"Error: Data type conversion issue - {e}.")
         return
 
+    return {
+        'df': df[['tickIdx', 'cumulative_liquidity']],
+        'current_tick': current_tick,
+        'timestamp': timestamp,
+        'pool_id': pool_id,
+        'stats': {
+            'max_cumulative_liquidity': str(wideInt.max_int(cumulative)),
+            'current_tick': current_tick,
+            'rows': len(df)
+        }
+    }
+
+def get_max_liquidity(csv_files, manifest=None, stats=None, snapshots=None):
+    """
+    The y-axis limit shared by every chart, from each file's stats. Files charted on an
+    earlier run keep their stats in the manifest, so only new or changed ones are read;
+    those are kept in snapshots, when given, for the rendering pass to reuse. The limit is an
+    exact int, which can pass 2**64, so it is converted to float wherever matplotlib gets it.
+    """
+    max_liquidity = 0
+    for _, filepath in csv_files:
+        file_stats = cached_stats(manifest, filepath) if manifest is not None else None
+        if file_stats is None or 'rows' not in file_stats:
+            snapshot = load_snapshot(filepath)
+            if snapshot is None:
+                continue
+            file_stats = snapshot['stats']
+            if snapshots is not None:
+                snapshots[filepath] = snapshot
+        if stats is not None:
+            stats[filepath] = file_stats
+        max_liquidity = max(max_liquidity, int(file_stats['max_cumulative_liquidity']))
+    return max_liquidity
+
+# Mantissas the y-axis limit is rounded up to, in hundredths, about a quarter apart
+Y_LIMIT_STEPS = (100, 125, 160, 200, 250, 320, 400, 500, 630, 800, 1000)
+
+def y_limit(max_liquidity):
+    """
+    The y-axis limit for a maximum liquidity, rounded up to the next step, so charts drawn
+    against it stay current until a new maximum passes the step rather than on every new
+    maximum.
+    """
+    max_liquidity = int(max_liquidity)
+    if max_liquidity <= 0:
+        return 1.0
+    # Compared as exact ints, since the maximum can pass 2**64
+    scale = 10 ** (len(str(max_liquidity)) - 1)
+    return float(next(step * scale // 100 for step in Y_LIMIT_STEPS if step * scale // 100 >= max_liquidity))
+
+def format_timestamp(timestamp):
     # Convert timestamp to readable format in EST
     try:
         dt = datetime.fromtimestamp(timestamp, tz=datetime.now().astimezone().tzinfo)  # Adjust timezone if needed
-        time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
     except Exception as e:
         print(f"Error converting timestamp: {e}")
-        time_str = "Unknown Time"
+        return "Unknown Time"
+
+def plot_liquidity_distribution(csv_file_path, max_liquidity, snapshot=None):
+    output_charts_path = os.getenv('output_charts_path_PEPE_WETH_Pool')
+
+    if not output_charts_path:
+        print("Error: 'output_charts_path' not found in .env file.")
+        return
+
+    # Define absolute paths for bar and line charts
+    bar_charts_path = os.path.join(output_charts_path, 'barCharts')
+    line_charts_path = os.path.join(output_charts_path, 'lineCharts')
+
+    # Ensure the output directories exist
+    os.makedirs(bar_charts_path, exist_ok=True)
+    os.makedirs(line_charts_path, exist_ok=True)
+    chart_files = []
+    saved = True
+
+    # Snapshots parsed for the y-axis limit are passed in, so each file is read once per run
+    if snapshot is None:
+        snapshot = load_snapshot(csv_file_path)
+        if snapshot is None:
+            return
+    df = snapshot['df']
+    tickIdx = df['tickIdx']
+    cumulative_liquidity = df['cumulative_liquidity']
+    current_tick, timestamp, pool_id = snapshot['current_tick'], snapshot['timestamp'], snapshot['pool_id']
+
+    time_str = format_timestamp(timestamp)
 
     # ----------------- Create Bar Chart (Centered around current tick, ±50,000) -----------------
     tick_min = current_tick - 50000
@@ -94,7 +163,8 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity):
     df_focus = df[(df['tickIdx'] >= tick_min) & (df['tickIdx'] <= tick_max)]
 
     if not df_focus.empty:
-        plt.figure(figsize=(14, 7))
+        fig = Figure(figsize=(14, 7))
+        ax = fig.add_subplot()
         
         # Calculate dynamic bar width based on tick range and number of ticks
         num_ticks = len(df_focus)
@@ -103,77 +173,267 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity):
         else:
             bar_width = 1
         
-        plt.bar(df_focus['tickIdx'], df_focus['cumulative_liquidity'], width=bar_width, color='skyblue', align='center')
-        plt.ylim(bottom=0, top=max_liquidity)
+        ax.bar(df_focus['tickIdx'], df_focus['cumulative_liquidity'], width=bar_width, color='skyblue', align='center')
+        ax.set_ylim(bottom=0, top=float(max_liquidity))
 
-        plt.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
-        plt.text(current_tick, plt.ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+        ax.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
+        ax.text(current_tick, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
 
-        plt.title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
-        plt.xlabel('Tick Index')
-        plt.ylabel('Cumulative Liquidity')
-        plt.legend()
+        ax.set_title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+        ax.set_xlabel('Tick Index')
+        ax.set_ylabel('Cumulative Liquidity')
+        ax.legend()
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         bar_chart_file = os.path.join(bar_charts_path, f'liquidity_bar_chart_{timestamp}.png')
         try:
-            plt.savefig(bar_chart_file)
+            fig.savefig(bar_chart_file)
+            chart_files.append(bar_chart_file)
             print(f"Bar chart saved to '{bar_chart_file}'")
         except Exception as e:
             print(f"Error saving bar chart: {e}")
-        finally:
-            plt.close()
+            saved = False
     else:
         print("No data available in the specified range for the bar chart.")
 
     # ----------------- Create Line Chart (Full Data) -----------------
-    plt.figure(figsize=(14, 7))
-    plt.plot(tickIdx, cumulative_liquidity, color='blue', linewidth=1, label='Cumulative Liquidity')
-    plt.ylim(bottom=0, top=max_liquidity)
+    fig = Figure(figsize=(14, 7))
+    ax = fig.add_subplot()
+    ax.plot(tickIdx, cumulative_liquidity, color='blue', linewidth=1, label='Cumulative Liquidity')
+    ax.set_ylim(bottom=0, top=float(max_liquidity))
 
-    plt.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
-    plt.text(current_tick, plt.ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+    ax.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
+    ax.text(current_tick, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
 
-    plt.title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
-    plt.xlabel('Tick Index')
-    plt.ylabel('Cumulative Liquidity')
-    plt.legend()
+    ax.set_title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+    ax.set_xlabel('Tick Index')
+    ax.set_ylabel('Cumulative Liquidity')
+    ax.legend()
 
-    plt.tight_layout()
+    fig.tight_layout()
 
     line_chart_file = os.path.join(line_charts_path, f'liquidity_line_chart_{timestamp}.png')
     try:
-        plt.savefig(line_chart_file)
+        fig.savefig(line_chart_file)
+        chart_files.append(line_chart_file)
         print(f"Line chart saved to '{line_chart_file}'")
     except Exception as e:
         print(f"Error saving line chart: {e}")
-    finally:
-        plt.close()
+        saved = False
+
+    # The charts written, or None if any failed so the file is retried next run
+    return chart_files if saved else None
+
+def new_figure(max_liquidity):
+    fig = Figure(figsize=(14, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_ylim(bottom=0, top=float(max_liquidity))
+    ax.set_xlabel('Tick Index')
+    ax.set_ylabel('Cumulative Liquidity')
+    return fig, ax
+
+def tick_marker(ax):
+    # The current tick line and its label, moved to each snapshot's tick by move_marker
+    line = ax.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Current Tick')
+    text = ax.text(0, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+    return line, text
+
+def move_marker(marker, tick):
+    line, text = marker
+    line.set_xdata([tick, tick])
+    text.set_x(tick)
+
+class ChartRenderer:
+    """
+    Draws the bar and line charts of a pool on two figures built once, instead of a new
+    figure, axes and legend per snapshot. Each snapshot only moves the bars, the line, the
+    current tick marker and the title before the figure is rasterized. The layout is fitted
+    on the first snapshot and kept, so charts can differ slightly from plot_liquidity_distribution's.
+    """
+
+    def __init__(self, max_liquidity, output_charts_path):
+        self.bar_charts_path = os.path.join(output_charts_path, 'barCharts')
+        self.line_charts_path = os.path.join(output_charts_path, 'lineCharts')
+        os.makedirs(self.bar_charts_path, exist_ok=True)
+        os.makedirs(self.line_charts_path, exist_ok=True)
+
+        self.bar_figure, self.bar_axes = new_figure(max_liquidity)
+        self.bars = None
+        self.shown_bars = 0
+        self.bar_marker = tick_marker(self.bar_axes)
+        self.bar_axes.legend()
+
+        self.line_figure, self.line_axes = new_figure(max_liquidity)
+        self.line, = self.line_axes.plot([], [], color='blue', linewidth=1, label='Cumulative Liquidity')
+        self.line_marker = tick_marker(self.line_axes)
+        self.line_axes.legend()
+        self.laid_out = set()
+
+    def update_bars(self, ticks, heights, width):
+        # A fixed pool of bars, moved and resized in place, with the ones a snapshot does not
+        # need hidden. It is only rebuilt when a snapshot needs more bars than it holds, with
+        # a quarter to spare so a slowly growing bar count does not rebuild it every time.
+        count = len(ticks)
+        if self.bars is None or len(self.bars) < count:
+            if self.bars is not None:
+                self.bars.remove()
+            size = count + count // 4
+            self.bars = self.bar_axes.bar(np.zeros(size), np.zeros(size), width=width, color='skyblue', align='center')
+            self.shown_bars = size
+        for rect, tick, height in zip(self.bars, ticks, heights):
+            rect.set_x(tick - width / 2)
+            rect.set_width(width)
+            rect.set_height(height)
+        for rect in self.bars[count:self.shown_bars]:
+            rect.set_visible(False)
+        for rect in self.bars[self.shown_bars:count]:
+            rect.set_visible(True)
+        self.shown_bars = count
+
+    def fit(self, fig, ax):
+        # The x-axis follows the snapshot's data, as a fresh figure's would; the layout is fitted once
+        ax.relim(visible_only=True)
+        ax.autoscale_view(scaley=False)
+        if fig not in self.laid_out:
+            fig.tight_layout()
+            self.laid_out.add(fig)
+
+    def save(self, fig, ax, chart_file, chart):
+        self.fit(fig, ax)
+        try:
+            fig.savefig(chart_file)
+            print(f"{chart} saved to '{chart_file}'")
+            return True
+        except Exception as e:
+            print(f"Error saving {chart.lower()}: {e}")
+            return False
+
+    def update_bar_chart(self, snapshot):
+        # Moves the bar chart to the snapshot; False if it has no ticks in the chart's range
+        df, current_tick = snapshot['df'], snapshot['current_tick']
+        tick_min = current_tick - 50000
+        tick_max = current_tick + 50000
+        df_focus = df[(df['tickIdx'] >= tick_min) & (df['tickIdx'] <= tick_max)]
+        if df_focus.empty:
+            print("No data available in the specified range for the bar chart.")
+            return False
+        self.update_bars(df_focus['tickIdx'].to_numpy(), df_focus['cumulative_liquidity'].to_numpy(),
+                         (tick_max - tick_min) / len(df_focus) * 0.9)
+        move_marker(self.bar_marker, current_tick)
+        time_str, pool_id = format_timestamp(snapshot['timestamp']), snapshot['pool_id']
+        self.bar_axes.set_title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+        return True
+
+    def update_line_chart(self, snapshot):
+        df = snapshot['df']
+        self.line.set_data(df['tickIdx'], df['cumulative_liquidity'])
+        move_marker(self.line_marker, snapshot['current_tick'])
+        time_str, pool_id = format_timestamp(snapshot['timestamp']), snapshot['pool_id']
+        self.line_axes.set_title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+
+    def render(self, csv_file_path, snapshot=None):
+        if snapshot is None:
+            snapshot = load_snapshot(csv_file_path)
+            if snapshot is None:
+                return
+        timestamp = snapshot['timestamp']
+        chart_files = []
+        saved = True
+
+        if self.update_bar_chart(snapshot):
+            bar_chart_file = os.path.join(self.bar_charts_path, f'liquidity_bar_chart_{timestamp}.png')
+            if self.save(self.bar_figure, self.bar_axes, bar_chart_file, 'Bar chart'):
+                chart_files.append(bar_chart_file)
+            else:
+                saved = False
+
+        self.update_line_chart(snapshot)
+        line_chart_file = os.path.join(self.line_charts_path, f'liquidity_line_chart_{timestamp}.png')
+        if self.save(self.line_figure, self.line_axes, line_chart_file, 'Line chart'):
+            chart_files.append(line_chart_file)
+        else:
+            saved = False
+
+        # The charts written, or None if any failed so the file is retried next run
+        return chart_files if saved else None
+
+    def bar_frame(self, snapshot):
+        # The snapshot's bar chart as an RGB array, exactly as it would be saved, or None if it has no ticks in range
+        if not self.update_bar_chart(snapshot):
+            return None
+        self.fit(self.bar_figure, self.bar_axes)
+        self.bar_figure.canvas.draw()
+        return np.asarray(self.bar_figure.canvas.buffer_rgba())[:, :, :3]
+
+# One renderer per process, so --reuse-figure also works across --workers
+renderer = None
+
+def render_snapshot(csv_file_path, max_liquidity, snapshot=None):
+    global renderer
+    if renderer is None:
+        renderer = ChartRenderer(max_liquidity, os.getenv('output_charts_path_PEPE_WETH_Pool'))
+    return renderer.render(csv_file_path, snapshot)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot liquidity distribution charts for the pool's snapshots")
+    parser.add_argument('--start-time', type=int, help="only plot snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only plot snapshots at or before this unix timestamp")
+    parser.add_argument('--workers', type=int, default=1, help="render charts across this many processes (0 or 1 renders them in this one)")
+    parser.add_argument('--reuse-figure', action='store_true', help="update one figure per chart type instead of building one per snapshot")
+    args = parser.parse_args()
+    if args.workers < 0:
+        parser.error("--workers must be 0 or more")
+
     csv_dir = os.getenv('output_csv_adjusted_path_PEPE_WETH_POOL')
     print(f"CSV Directory: {csv_dir}")
-    pattern = re.compile(r'liquidity_data_(\d+)\.csv')
-    csv_files = []
+    # Snapshots come from the pool's archive when it has one, otherwise from the CSVs
+    archive_path = os.getenv('output_archive_path_PEPE_WETH_Pool')
 
     try:
-        all_files = os.listdir(csv_dir)
+        csv_files = snapshot_sources(csv_dir, archive_path)
     except FileNotFoundError:
         print(f"Error: The directory '{csv_dir}' does not exist.")
         exit(1)
-    for filename in all_files:
-        match = pattern.match(filename)
-        if match:
-            timestamp = int(match.group(1))
-            filepath = os.path.join(csv_dir, filename)
-            csv_files.append((timestamp, filepath))
-    csv_files.sort()
     if not csv_files:
         print(f"No CSV files found in '{csv_dir}'.")
         exit(1)
         
-    max_liquidity = get_max_liquidity(csv_files)
+    output_charts_path = os.getenv('output_charts_path_PEPE_WETH_Pool')
+    if not output_charts_path:
+        print("Error: 'output_charts_path' not found in .env file.")
+        exit(1)
+
+    # Files whose charts are already up to date are skipped; every chart shares the
+    # y-axis limit, so a new overall maximum that passes its step redraws them all
+    manifest = load_manifest(output_charts_path)
+    if args.start_time is None and args.end_time is None:
+        prune(manifest, [source_name(filepath) for _, filepath in csv_files])
+    # Only the stats are kept from this pass, not the parsed snapshots, so memory does not
+    # grow with the number of files to chart; each is parsed again where it is rendered
+    file_stats = {}
+    max_liquidity = y_limit(get_max_liquidity(csv_files, manifest, file_stats))
+    params = {'y_limit': repr(max_liquidity)}
+    pending = []
     for timestamp, filepath in csv_files:
+        # The y-axis limit spans the whole history, so only the plotting is limited to the window
+        if (args.start_time is not None and timestamp < args.start_time) or (args.end_time is not None and timestamp > args.end_time):
+            continue
+        if is_current(manifest, filepath, CHART_VERSION, params):
+            continue
         print(f"Processing file: {filepath}")
-        plot_liquidity_distribution(filepath, max_liquidity)
\ No newline at end of file
+        pending.append((timestamp, filepath))
+
+    # The charts keep no pyplot state, so snapshots can be rendered in worker processes. Each
+    # is handed its source and parses it itself, and results come back in order; a serial run
+    # renders each snapshot as it is read
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        render = executor.map if args.workers > 1 else map
+        results = render(render_snapshot if args.reuse_figure else plot_liquidity_distribution, [filepath for _, filepath in pending],
+                         [max_liquidity] * len(pending))
+        for (timestamp, filepath), chart_files in zip(pending, results):
+            if chart_files is not None:
+                record(manifest, filepath, CHART_VERSION, chart_files, stats=file_stats.get(filepath), params=params, timestamp=timestamp)
+                save_manifest(output_charts_path, manifest)
+    save_manifest(output_charts_path, manifest)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+import pyarrow as pa # type: ignore
+import pyarrow.compute as pc # type: ignore
+import pyarrow.dataset as ds # type: ignore
+import pyarrow.parquet as pq # type: ignore
+
+# Append-only Parquet store for decoded pool events, laid out as
+#   <root>/<pool_address>/<event>/<partition_start>-<partition_end>/part-<first_block>-<last_block>-<n>.parquet
+# Every append writes new part files, so existing data is never rewritten except on a reorg rollback.
+# Rows are identified by (block, logIndex): appending rows already stored skips them.
+
+PARTITION_BLOCKS = 100000
+
+# Exact integers up to 76 digits, enough for any realistic int256 token amount
+WIDE_INT = pa.decimal256(76, 0)
+
+COLUMN_TYPES = {
+    'transaction_hash': pa.string(),
+    'sender': pa.string(),
+    'recipient': pa.string(),
+    'provider': pa.string(),
+    'gas': pa.int64(),
+    'gasPrice': pa.int64(),
+    'gasPriceAdjusted': pa.float64(),
+    'value': pa.float64(),
+    'amount': WIDE_INT,
+    'WBTCTokens': WIDE_INT,
+    'ETHTokens': WIDE_INT,
+    'WBTCTokensAdjusted': pa.float64(),
+    'ETHTokensAdjusted': pa.float64(),
+    'tick': pa.int32(),
+    'block': pa.int64(),
+    'logIndex': pa.int64(),
+    'timestamp': pa.timestamp('s', tz='UTC'),
+    'lowerTick': pa.int32(),
+    'upperTick': pa.int32(),
+}
+
+# Columns of each event in the order query.decode_*_log builds them. Every part file is
+# written with its event's full schema, with nulls where rows were not enriched.
+EVENT_COLUMNS = {
+    'Swap': ['transaction_hash', 'sender', 'recipient', 'gas', 'gasPrice', 'gasPriceAdjusted', 'value',
+             'WBTCTokens', 'ETHTokens', 'WBTCTokensAdjusted', 'ETHTokensAdjusted', 'tick', 'block',
+             'logIndex', 'timestamp'],
+    'Mint': ['transaction_hash', 'provider', 'gas', 'gasPrice', 'gasPriceAdjusted', 'amount',
+             'WBTCTokens', 'ETHTokens', 'WBTCTokensAdjusted', 'ETHTokensAdjusted', 'block', 'logIndex',
+             'timestamp', 'lowerTick', 'upperTick'],
+}
+EVENT_COLUMNS['Burn'] = EVENT_COLUMNS['Mint']
+
+EVENT_SCHEMAS = {
+    event_name: pa.schema([pa.field(name, COLUMN_TYPES[name]) for name in columns])
+    for event_name, columns in EVENT_COLUMNS.items()
+}
+
+def partition_bounds(block_number):
+    start = block_number - block_number % PARTITION_BLOCKS
+    return start, start + PARTITION_BLOCKS - 1
+
+def event_dir(root, pool_address, event_name):
+    return os.path.join(root, pool_address.lower(), event_name)
+
+def to_arrow(rows, schema):
+    """
+    Builds a table with the event's schema from decoded event rows (the dicts
+    query.decode_*_log returns), typing amounts as exact wide integers and
+    block/timestamp as typed columns. Keys outside the schema are dropped.
+    """
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if field.type == WIDE_INT:
+            values = [None if v is None else Decimal(int(v)) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def stored_keys(root, pool_address, event_name, start_block, end_block):
+    # (block, logIndex) of the rows already stored in [start_block, end_block]
+    files = part_files(root, pool_address, event_name, start_block, end_block)
+    if not files:
+        return set()
+    table = ds.dataset(files, format='parquet', schema=EVENT_SCHEMAS[event_name]).to_table(
+        columns=['block', 'logIndex'],
+        filter=(ds.field('block') >= start_block) & (ds.field('block') <= end_block))
+    return set(zip(table.column('block').to_pylist(), table.column('logIndex').to_pylist()))
+
+def append_events(root, pool_address, event_name, rows):
+    """
+    Appends rows of one event type, splitting them across block-range partitions.
+    Rows whose (block, logIndex) is already stored, as when a scan resumes over blocks it
+    had written before its checkpoint was saved, are skipped. Returns the paths of the
+    part files written.
+    """
+    if not rows:
+        return []
+
+    seen = stored_keys(root, pool_address, event_name, min(row['block'] for row in rows),
+                       max(row['block'] for row in rows))
+    partitions = {}
+    for row in rows:
+        key = (row['block'], row['logIndex'])
+        if key in seen:
+            continue
+        seen.add(key)
+        partitions.setdefault(partition_bounds(row['block']), []).append(row)
+
+    written = []
+    for (start, end), partition_rows in sorted(partitions.items()):
+        partition_dir = os.path.join(event_dir(root, pool_address, event_name), f"{start}-{end}")
+        os.makedirs(partition_dir, exist_ok=True)
+        blocks = [row['block'] for row in partition_rows]
+        filepath = os.path.join(partition_dir, f"part-{min(blocks)}-{max(blocks)}-{time.time_ns()}.parquet")
+        pq.write_table(to_arrow(partition_rows, EVENT_SCHEMAS[event_name]), filepath)
+        written.append(filepath)
+    return written
+
+def part_files(root, pool_address, event_name, start_block=None, end_block=None):
+    """
+    Lists part files whose block span overlaps [start_block, end_block], pruning by the
+    partition directory and part file names before any file is opened.
+    """
+    base_dir = event_dir(root, pool_address, event_name)
+    if not os.path.isdir(base_dir):
+        return []
+
+    def overlaps(first, last):
+        return (start_block is None or last >= start_block) and (end_block is None or first <= end_block)
+
+    files = []
+    for partition in sorted(os.listdir(base_dir), key=lambda name: int(name.split('-')[0])):
+        partition_start, partition_end = (int(b) for b in partition.split('-'))
+        if not overlaps(partition_start, partition_end):
+            continue
+        partition_dir = os.path.join(base_dir, partition)
+        for filename in sorted(os.listdir(partition_dir)):
+            if not filename.endswith('.parquet'):
+                continue
+            _, first, last, _ = filename[:-len('.parquet')].split('-')
+            if overlaps(int(first), int(last)):
+                files.append(os.path.join(partition_dir, filename))
+    return files
+
+def read_events(root, pool_address, event_name, start_block=None, end_block=None,
+                start_time=None, end_time=None, columns=None):
+    """
+    Reads one event type as a DataFrame, keeping rows with start_block <= block <= end_block
+    and start_time <= timestamp <= end_time (unix seconds or datetimes). The filters are
+    pushed down to the Parquet row-group statistics, so non-matching data is skipped.
+    Rows come back in (block, logIndex) order.
+    """
+    files = part_files(root, pool_address, event_name, start_block, end_block)
+    if not files:
+        return None
+
+    dataset = ds.dataset(files, format='parquet', schema=EVENT_SCHEMAS[event_name])
+    condition = None
+    for expression in (
+        None if start_block is None else ds.field('block') >= start_block,
+        None if end_block is None else ds.field('block') <= end_block,
+        None if start_time is None else ds.field('timestamp') >= to_timestamp(start_time),
+        None if end_time is None else ds.field('timestamp') <= to_timestamp(end_time),
+    ):
+        if expression is not None:
+            condition = expression if condition is None else condition & expression
+
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    order = [name for name in ('block', 'logIndex') if name in df.columns]
+    if order:
+        df = df.sort_values(order, kind='stable').reset_index(drop=True)
+    # A rollback interrupted between writing a replacement part and removing the old one leaves
+    # both; parts written before logIndex was stored have it null and are kept as they are
+    if len(order) == 2:
+        df = df[~(df.duplicated(order) & df['logIndex'].notna())].reset_index(drop=True)
+    return df
+
+def to_timestamp(value):
+    if isinstance(value, datetime):
+        return pa.scalar(value, type=pa.timestamp('s', tz='UTC'))
+    return pa.scalar(int(value), type=pa.timestamp('s', tz='UTC'))
+
+def rollback_events(root, pool_address, event_name, from_block):
+    """
+    Removes rows with block >= from_block after a reorg. Part files entirely past the
+    reorg are deleted; a part file straddling it is replaced by one with its earlier rows,
+    written before the old part is removed so a crash in between never loses those rows.
+    """
+    for filepath in part_files(root, pool_address, event_name, start_block=from_block):
+        table = pq.read_table(filepath, schema=EVENT_SCHEMAS[event_name])
+        kept = table.filter(pc.less(table.column('block'), from_block))
+        if kept.num_rows:
+            blocks = kept.column('block').to_pylist()
+            partition_dir = os.path.dirname(filepath)
+            pq.write_table(kept, os.path.join(partition_dir, f"part-{min(blocks)}-{max(blocks)}-{time.time_ns()}.parquet"))
+        os.remove(filepath)
@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import pandas as pd # type: ignore
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import wideInt
+
+# Rebuilds a pool's tick -> liquidityNet distribution at any block by replaying Mint/Burn
+# events, as produced by query.get_liquidity_provider_data or read_liquidity_provider_data.
+# The replay state is checkpointed every CHECKPOINT_BLOCKS blocks so a query only replays
+# the events after the nearest earlier checkpoint. A state's position is the (block, logIndex)
+# of the last event applied, since a block can hold any number of Mints and Burns.
+
+CHECKPOINT_BLOCKS = 50000
+
+def new_state(block=0, timestamp=0, log_index=-1):
+    return {'block': block, 'logIndex': log_index, 'timestamp': timestamp, 'gross': {}, 'net': {}}
+
+def positions(events):
+    """
+    (block, logIndex) of every event row, in row order. Rows without a logIndex (histories
+    stored before it was kept) fall back to their offset within the block, which is stable
+    as long as the same history is replayed.
+    """
+    offsets = events.groupby('block', sort=False).cumcount()
+    if 'logIndex' in events.columns:
+        offsets = events['logIndex'].fillna(offsets)
+    return list(zip(events['block'].astype('int64').tolist(), offsets.astype('int64').tolist()))
+
+def to_unix(timestamp):
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    return int(pd.Timestamp(timestamp).timestamp())
+
+def apply_event(state, event, amount, lower_tick, upper_tick):
+    """
+    Applies one Mint or Burn the way the pool updates its ticks: liquidityNet rises at the
+    lower tick and falls at the upper tick, and a tick is dropped once its liquidityGross
+    returns to zero.
+    """
+    delta = amount if event == "Mint" else -amount
+    gross, net = state['gross'], state['net']
+    for tick, net_delta in ((lower_tick, delta), (upper_tick, -delta)):
+        gross[tick] = gross.get(tick, 0) + delta
+        net[tick] = net.get(tick, 0) + net_delta
+        if gross[tick] == 0:
+            del gross[tick]
+            del net[tick]
+
+def replay(state, events, until_block=None, until_time=None):
+    """
+    Applies the events after the state's (block, logIndex) up to until_block / until_time,
+    in (block, logIndex) order. events needs event, amount, lowerTick, upperTick, block and
+    timestamp columns, and logIndex where available.
+    """
+    position = (state['block'], state['logIndex'])
+    for row, (block, log_index) in zip(events.itertuples(index=False), positions(events)):
+        if (block, log_index) <= position:
+            continue
+        if until_block is not None and block > until_block:
+            break
+        timestamp = to_unix(row.timestamp)
+        if until_time is not None and timestamp > until_time:
+            break
+        apply_event(state, row.event, int(row.amount), int(row.lowerTick), int(row.upperTick))
+        state['block'], state['logIndex'] = block, log_index
+        state['timestamp'] = timestamp
+    return state
+
+def save_checkpoint(checkpoint_dir, state):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    filepath = os.path.join(checkpoint_dir, f"checkpoint_{state['block']}_{state['timestamp']}.json")
+    tmp_file = filepath + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump({
+            'block': state['block'],
+            'logIndex': state['logIndex'],
+            'timestamp': state['timestamp'],
+            # Python's json keeps these integers exact, however large
+            'ticks': [[tick, state['gross'][tick], state['net'][tick]] for tick in sorted(state['gross'])]
+        }, f)
+    os.replace(tmp_file, filepath)
+    return filepath
+
+def load_checkpoint(checkpoint_dir, block=None, timestamp=None):
+    """
+    Loads the latest checkpoint at or before block / timestamp, or an empty state if
+    there is none. Checkpoints without a logIndex are skipped: they were built by a replay
+    that dropped every event after the first one in a block.
+    """
+    pattern = re.compile(r'checkpoint_(\d+)_(\d+)\.json')
+    best = None
+    if os.path.isdir(checkpoint_dir):
+        for filename in os.listdir(checkpoint_dir):
+            match = pattern.match(filename)
+            if not match:
+                continue
+            cp_block, cp_time = int(match.group(1)), int(match.group(2))
+            if (block is not None and cp_block > block) or (timestamp is not None and cp_time > timestamp):
+                continue
+            if best is None or cp_block > best[0]:
+                with open(os.path.join(checkpoint_dir, filename)) as f:
+                    data = json.load(f)
+                if 'logIndex' in data:
+                    best = (cp_block, data)
+    if best is None:
+        return new_state()
+
+    data = best[1]
+    state = new_state(data['block'], data['timestamp'], data['logIndex'])
+    for tick, gross, net in data['ticks']:
+        state['gross'][tick] = gross
+        state['net'][tick] = net
+    return state
+
+def build_checkpoints(events, checkpoint_dir, every_blocks=CHECKPOINT_BLOCKS):
+    """
+    Replays the whole event history once, saving a checkpoint whenever every_blocks
+    blocks have passed since the previous one. Returns the final state.
+    """
+    state = load_checkpoint(checkpoint_dir)
+    next_checkpoint = state['block'] + every_blocks
+    position = (state['block'], state['logIndex'])
+    for row, (block, log_index) in zip(events.itertuples(index=False), positions(events)):
+        if (block, log_index) <= position:
+            continue
+        # Checkpoint at block boundaries so a state never holds half a block
+        if block > next_checkpoint and state['block'] > 0:
+            save_checkpoint(checkpoint_dir, state)
+            next_checkpoint = state['block'] + every_blocks
+        apply_event(state, row.event, int(row.amount), int(row.lowerTick), int(row.upperTick))
+        state['block'], state['logIndex'] = block, log_index
+        state['timestamp'] = to_unix(row.timestamp)
+    save_checkpoint(checkpoint_dir, state)
+    return state
+
+def liquidity_at(events, checkpoint_dir, block=None, timestamp=None):
+    """
+    Returns the replay state as of block (or unix timestamp), starting from the nearest
+    earlier checkpoint and replaying only the events after it.
+    """
+    state = load_checkpoint(checkpoint_dir, block, timestamp)
+    return replay(state, events, until_block=block, until_time=timestamp)
+
+def distribution(state):
+    """
+    The state as a tickIdx / liquidityNet / cumulative_liquidity DataFrame sorted by tick,
+    the same columns the liquidityCSV snapshots carry.
+    """
+    ticks = sorted(state['net'])
+    net = wideInt.from_ints([state['net'][tick] for tick in ticks])
+    return pd.DataFrame({
+        'tickIdx': ticks,
+        'liquidityNet': wideInt.to_strings(net),
+        'cumulative_liquidity': wideInt.to_strings(wideInt.cumsum(net)),
+    })
+
+def write_distribution_csv(state, output_dir, pool_id, current_tick=None):
+    # Same layout and file name as graphQueries' liquidity_data_<timestamp>.csv snapshots
+    df = distribution(state)
+    df.insert(2, 'timestamp', state['timestamp'])
+    df.insert(3, 'current_tick', current_tick)
+    df.insert(4, 'pool_id', pool_id.lower())
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, f"liquidity_data_{state['timestamp']}.csv")
+    df.to_csv(filepath, index=False)
+    print(f"Data saved to {filepath}")
+    return filepath
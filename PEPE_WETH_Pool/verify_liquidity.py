@@ -1,10 +1,21 @@
+import os
 import pandas as pd
 import numpy as np
 from decimal import Decimal
+from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from snapshotArchive import SnapshotArchive
+
+load_dotenv()
 
 try:
-    # Read CSV file
-    df = pd.read_csv('/Users/trian/Projects/Uniswap/PEPE_WETH_Pool/outputFiles/liquidityCSV/liquidity_data_1736528402.csv')
+    # Read the snapshot from the pool's archive if there is one, else its CSV file
+    archive_path = os.getenv('output_archive_path_PEPE_WETH_Pool')
+    if archive_path and os.path.exists(archive_path):
+        df = SnapshotArchive(archive_path).read(1736528402)
+    else:
+        df = pd.read_csv('/Users/trian/Projects/Uniswap/PEPE_WETH_Pool/outputFiles/liquidityCSV/liquidity_data_1736528402.csv')
     
     # Convert to numeric, coerce errors to NaN
     df['liquidityNet'] = pd.to_numeric(df['liquidityNet'], errors='coerce')
@@ -1,15 +1,21 @@
 import imageio.v2 as imageio
 import os
+import numpy as np
 from dotenv import load_dotenv
 import re
+import argparse
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared'))
+from charts import ChartRenderer, load_snapshot, central_ticks
+from snapshotArchive import snapshot_sources
+from gifWriter import GifWriter, build_palette
 
 load_dotenv()
 
-def create_bar_chart_animation():
-    # Get paths from env
-    charts_dir = os.path.join(os.getenv('output_charts_path_USDC_ETH_0.05_Pool'), 'barCharts')
-    output_dir = os.getenv('output_charts_path_USDC_ETH_0.05_Pool')
+# Frames sampled across the animation to build its shared GIF palette
+PALETTE_FRAMES = 8
 
+def list_bar_charts(charts_dir):
     # Get all PNG files and sort by timestamp
     pattern = re.compile(r'liquidity_bar_chart_(\d+)\.png')
     png_files = []
@@ -22,6 +28,29 @@ def create_bar_chart_animation():
             png_files.append((timestamp, filepath))
     
     png_files.sort()  # Sort by timestamp
+    return png_files
+
+def select_frames(frames, every=None, max_frames=None):
+    """
+    Thins (timestamp, frame) pairs, oldest first: at most one frame per every seconds,
+    then at most max_frames of those, spread evenly across the animation.
+    """
+    if every:
+        kept = []
+        for timestamp, frame in frames:
+            if not kept or timestamp >= kept[-1][0] + every:
+                kept.append((timestamp, frame))
+        frames = kept
+    if max_frames and len(frames) > max_frames:
+        frames = [frames[i] for i in np.linspace(0, len(frames) - 1, max_frames).round().astype(int)]
+    return frames
+
+def create_bar_chart_animation():
+    # Get paths from env
+    charts_dir = os.path.join(os.getenv('output_charts_path_USDC_ETH_0.05_Pool'), 'barCharts')
+    output_dir = os.getenv('output_charts_path_USDC_ETH_0.05_Pool')
+
+    png_files = list_bar_charts(charts_dir)
 
     if not png_files:
         print("No PNG files found")
@@ -37,5 +66,84 @@ def create_bar_chart_animation():
     imageio.mimsave(output_path, images, duration=1)  # 1 second per frame
     print(f"Animation saved to {output_path}")
 
+def assemble_gif(output_path=None, every=None, max_frames=None, duration=1):
+    """
+    Streams the saved bar charts into a GIF one PNG at a time. The frames share one palette
+    built from a sample of them, and each frame after the first only stores the pixels that
+    changed, which makes the GIF a fraction of the size of one from mimsave. every (seconds)
+    and max_frames thin the frames first. duration is in seconds per frame.
+    """
+    charts_dir = os.path.join(os.getenv('output_charts_path_USDC_ETH_0.05_Pool'), 'barCharts')
+    output_dir = os.getenv('output_charts_path_USDC_ETH_0.05_Pool')
+    output_path = output_path or os.path.join(output_dir, 'liquidity_animation.gif')
+
+    png_files = select_frames(list_bar_charts(charts_dir), every, max_frames)
+    if not png_files:
+        print("No PNG files found")
+        return
+
+    palette = build_palette(imageio.imread(filepath) for _, filepath in select_frames(png_files, max_frames=PALETTE_FRAMES))
+    with GifWriter(output_path, duration=duration * 1000, palette=palette) as writer:
+        for _, filepath in png_files:
+            writer.append_data(imageio.imread(filepath))
+    print(f"Animation of {len(png_files)} frames saved to {output_path}")
+
+def open_writer(output_path, duration):
+    # GIFs are streamed by gifWriter, videos by imageio's ffmpeg writer; both take one frame at a time
+    if output_path.lower().endswith('.gif'):
+        return GifWriter(output_path, duration=duration * 1000)
+    codec = 'libvpx-vp9' if output_path.lower().endswith('.webm') else 'libx264'
+    return imageio.get_writer(output_path, fps=1 / duration, codec=codec)
+
+def create_streamed_animation(output_path=None, start_time=None, end_time=None, duration=1, every=None, max_frames=None):
+    """
+    Renders each snapshot's bar chart straight into the animation, one frame at a time,
+    instead of reading back the saved PNGs, so memory does not grow with the number of
+    frames. output_path's extension picks the format: .gif, .mp4 or .webm. duration is
+    in seconds per frame; every and max_frames thin the frames as in assemble_gif.
+    """
+    csv_dir = os.getenv('output_csv_path_USDC_ETH_0.05_Pool')
+    archive_path = os.getenv('output_archive_path_USDC_ETH_0.05_Pool')
+    output_dir = os.getenv('output_charts_path_USDC_ETH_0.05_Pool')
+    output_path = output_path or os.path.join(output_dir, 'liquidity_animation.gif')
+
+    try:
+        sources = snapshot_sources(csv_dir, archive_path, start_time, end_time)
+    except FileNotFoundError:
+        print(f"Error: The directory '{csv_dir}' does not exist.")
+        return
+    pool_matches = central_ticks(sources)
+    sources = select_frames(sources, every, max_frames)
+    if not sources:
+        print("No snapshots found")
+        return
+
+    # The renderer draws against the charts' fixed y-axis limit, so no pass over the history is needed for one
+    renderer = ChartRenderer(None, output_dir)
+    frames = 0
+    with open_writer(output_path, duration) as writer:
+        for timestamp, source in sources:
+            snapshot = load_snapshot(source)
+            frame = renderer.bar_frame(snapshot, pool_matches.get(timestamp)) if snapshot is not None else None
+            if frame is not None:
+                writer.append_data(frame)
+                frames += 1
+    print(f"Animation of {frames} frames saved to {output_path}")
+
 if __name__ == "__main__":
-    create_bar_chart_animation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Assemble the pool's bar charts into an animation")
+    parser.add_argument('--stream', action='store_true', help="render frames straight from the snapshots instead of the saved PNGs")
+    parser.add_argument('--assemble', action='store_true', help="stream the saved PNGs into a GIF with a shared palette, storing only changed pixels")
+    parser.add_argument('--output', help="animation file for --stream (.gif, .mp4 or .webm) or --assemble (default: liquidity_animation.gif)")
+    parser.add_argument('--every', type=int, help="at most one frame per this many seconds, e.g. 21600 for one every 6h")
+    parser.add_argument('--max-frames', type=int, help="at most this many frames, spread evenly over the animation")
+    parser.add_argument('--start-time', type=int, help="only animate snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only animate snapshots at or before this unix timestamp")
+    args = parser.parse_args()
+
+    if args.stream:
+        create_streamed_animation(args.output, args.start_time, args.end_time, every=args.every, max_frames=args.max_frames)
+    elif args.assemble:
+        assemble_gif(args.output, args.every, args.max_frames)
+    else:
+        create_bar_chart_animation()
\ No newline at end of file
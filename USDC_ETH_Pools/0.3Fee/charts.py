@@ -1,20 +1,31 @@
 import os
-import re
+import argparse
 import math
 import csv
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 import matplotlib.ticker as ticker
 from decimal import Decimal, getcontext
 import mpmath as mp
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared'))
+import wideInt
+from manifest import load_manifest, save_manifest, is_current, cached_stats, record, prune, source_name
+from snapshotArchive import snapshot_sources, read_snapshot
 
 load_dotenv()
 
 getcontext().prec = 50
 mp.mp.prec = 160
 
+# Bump when the charts change, so every chart is redrawn on the next run
+CHART_VERSION = 1
+
 def precise_tick(price):
     """
     Compute tick = log_{1.0001}(10^12 / price) with high precision.
@@ -28,35 +39,14 @@ def precise_tick(price):
     tick_mpf = mp.log(ratio_mpf) / mp.log(base)
     return float(tick_mpf)
 
-def get_max_liquidity(pool_csv_files):
-    max_liquidity = 0
-    for _, filepath in pool_csv_files:
-        try:
-            df = pd.read_csv(filepath)
-            max_liquidity = max(max_liquidity, df['cumulative_liquidity'].astype(float).max())
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
-            continue
-    return max_liquidity
-
-def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None):
-
-    max_liquidity = 1e18 # for comparison with 0.05Fee pool
-
-    output_charts_path = os.getenv('output_charts_path_USDC_ETH_0.3_Pool')
-
-    if not output_charts_path:
-        print("Error: 'output_charts_path' not found in .env file.")
-        return
-
-    bar_charts_path = os.path.join(output_charts_path, 'barCharts')
-    line_charts_path = os.path.join(output_charts_path, 'lineCharts')
-
-    os.makedirs(bar_charts_path, exist_ok=True)
-    os.makedirs(line_charts_path, exist_ok=True)
-
+def load_snapshot(csv_file_path):
+    """
+    Parses a snapshot once for both passes: the float data the charts plot and the
+    stats kept in the chart manifest (exact max cumulative liquidity, current tick and
+    row count). Returns None if the snapshot cannot be read.
+    """
     try:
-        df = pd.read_csv(csv_file_path)
+        df = read_snapshot(csv_file_path)
     except FileNotFoundError:
         print(f"Error: The file '{csv_file_path}' does not exist.")
         return
@@ -69,7 +59,8 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None)
 
     try:
         df['tickIdx'] = df['tickIdx'].astype(int)
-        df['cumulative_liquidity'] = df['cumulative_liquidity'].astype(float)
+        cumulative = wideInt.parse(df['cumulative_liquidity'])
+        df['cumulative_liquidity'] = wideInt.to_float(cumulative)
     except KeyError as e:
         print(f"Error: Missing expected column {e} in CSV.")
         return
@@ -80,8 +71,6 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None)
     df = df.sort_values('tickIdx')
 
     try:
-        tickIdx = df['tickIdx']
-        cumulative_liquidity = df['cumulative_liquidity']
         current_tick = int(df['current_tick'].iloc[0])
         timestamp = int(df['timestamp'].iloc[0])
         pool_id = df['pool_id'].iloc[0]
@@ -95,12 +84,76 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None)
         print(f"Error: Data type conversion issue - {e}.")
         return
 
+    return {
+        'df': df[['tickIdx', 'cumulative_liquidity']],
+        'current_tick': current_tick,
+        'timestamp': timestamp,
+        'pool_id': pool_id,
+        'stats': {
+            'max_cumulative_liquidity': str(wideInt.max_int(cumulative)),
+            'current_tick': current_tick,
+            'rows': len(df)
+        }
+    }
+
+def get_max_liquidity(pool_csv_files, manifest=None, stats=None, snapshots=None):
+    """
+    The y-axis limit shared by every chart, from each file's stats. Files charted on an
+    earlier run keep their stats in the manifest, so only new or changed ones are read;
+    those are kept in snapshots, when given, for the rendering pass to reuse. The limit is an
+    exact int, which can pass 2**64, so it is converted to float wherever matplotlib gets it.
+    """
+    max_liquidity = 0
+    for _, filepath in pool_csv_files:
+        file_stats = cached_stats(manifest, filepath) if manifest is not None else None
+        if file_stats is None or 'rows' not in file_stats:
+            snapshot = load_snapshot(filepath)
+            if snapshot is None:
+                continue
+            file_stats = snapshot['stats']
+            if snapshots is not None:
+                snapshots[filepath] = snapshot
+        if stats is not None:
+            stats[filepath] = file_stats
+        max_liquidity = max(max_liquidity, int(file_stats['max_cumulative_liquidity']))
+    return max_liquidity
+
+def format_timestamp(timestamp):
     try:
         dt = datetime.fromtimestamp(timestamp, tz=datetime.now().astimezone().tzinfo)
-        time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
     except Exception as e:
         print(f"Error converting timestamp: {e}")
-        time_str = "Unknown Time"
+        return "Unknown Time"
+
+def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None, snapshot=None):
+
+    max_liquidity = 1e18 # for comparison with 0.05Fee pool
+
+    output_charts_path = os.getenv('output_charts_path_USDC_ETH_0.3_Pool')
+
+    if not output_charts_path:
+        print("Error: 'output_charts_path' not found in .env file.")
+        return
+
+    bar_charts_path = os.path.join(output_charts_path, 'barCharts')
+    line_charts_path = os.path.join(output_charts_path, 'lineCharts')
+
+    os.makedirs(bar_charts_path, exist_ok=True)
+    os.makedirs(line_charts_path, exist_ok=True)
+    chart_files = []
+    saved = True
+
+    if snapshot is None:
+        snapshot = load_snapshot(csv_file_path)
+        if snapshot is None:
+            return
+    df = snapshot['df']
+    tickIdx = df['tickIdx']
+    cumulative_liquidity = df['cumulative_liquidity']
+    current_tick, timestamp, pool_id = snapshot['current_tick'], snapshot['timestamp'], snapshot['pool_id']
+
+    time_str = format_timestamp(timestamp)
 
     # ----------------- Create Bar Chart (Centered around current tick) -----------------
     tick_min = current_tick - 15000
@@ -109,7 +162,8 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None)
     df_focus = df[(df['tickIdx'] >= tick_min) & (df['tickIdx'] <= tick_max)]
 
     if not df_focus.empty:
-        plt.figure(figsize=(14, 7))
+        fig = Figure(figsize=(14, 7))
+        ax = fig.add_subplot()
         
         num_ticks = len(df_focus)
         if num_ticks > 0:
@@ -117,84 +171,70 @@ def plot_liquidity_distribution(csv_file_path, max_liquidity, central_tick=None)
         else:
             bar_width = 1
         
-        plt.bar(df_focus['tickIdx'], df_focus['cumulative_liquidity'], width=bar_width, color='skyblue', align='center')
-        plt.ylim(bottom=0, top=max_liquidity)
+        ax.bar(df_focus['tickIdx'], df_focus['cumulative_liquidity'], width=bar_width, color='skyblue', align='center')
+        ax.set_ylim(bottom=0, top=float(max_liquidity))
 
-        plt.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
-        plt.text(current_tick, plt.ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+        ax.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
+        ax.text(current_tick, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
 
         # Plot vertical line for centralized price if available
         if central_tick is not None:
-            plt.axvline(x=central_tick, color='green', linestyle='-', linewidth=2, label='Centralized Price')
+            ax.axvline(x=central_tick, color='green', linestyle='-', linewidth=2, label='Centralized Price')
 
-        plt.title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
-        plt.xlabel('Tick Index')
-        plt.ylabel('Cumulative Liquidity')
-        plt.legend()
+        ax.set_title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+        ax.set_xlabel('Tick Index')
+        ax.set_ylabel('Cumulative Liquidity')
+        ax.legend()
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         bar_chart_file = os.path.join(bar_charts_path, f'liquidity_bar_chart_{timestamp}.png')
         try:
-            plt.savefig(bar_chart_file)
+            fig.savefig(bar_chart_file)
+            chart_files.append(bar_chart_file)
             print(f"Bar chart saved to '{bar_chart_file}'")
         except Exception as e:
             print(f"Error saving bar chart: {e}")
-        finally:
-            plt.close()
+            saved = False
     else:
         print(f"No data available in the specified range (tickIdx {tick_min} to {tick_max}) for the bar chart.")
 
     # ----------------- Create Line Chart (Full Data) -----------------
-    plt.figure(figsize=(14, 7))
-    plt.plot(tickIdx, cumulative_liquidity, color='blue', linewidth=1, label='Cumulative Liquidity')
-    plt.ylim(bottom=0, top=max_liquidity)
+    fig = Figure(figsize=(14, 7))
+    ax = fig.add_subplot()
+    ax.plot(tickIdx, cumulative_liquidity, color='blue', linewidth=1, label='Cumulative Liquidity')
+    ax.set_ylim(bottom=0, top=float(max_liquidity))
 
-    plt.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
-    plt.text(current_tick, plt.ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+    ax.axvline(x=current_tick, color='red', linestyle='--', linewidth=2, label='Current Tick')
+    ax.text(current_tick, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
 
     if central_tick is not None:
-        plt.axvline(x=central_tick, color='green', linestyle='-', linewidth=2, label='Centralized Price')
+        ax.axvline(x=central_tick, color='green', linestyle='-', linewidth=2, label='Centralized Price')
 
-    plt.title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
-    plt.xlabel('Tick Index')
-    plt.ylabel('Cumulative Liquidity')
-    plt.legend()
+    ax.set_title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+    ax.set_xlabel('Tick Index')
+    ax.set_ylabel('Cumulative Liquidity')
+    ax.legend()
 
-    plt.tight_layout()
+    fig.tight_layout()
 
     line_chart_file = os.path.join(line_charts_path, f'liquidity_line_chart_{timestamp}.png')
     try:
-        plt.savefig(line_chart_file)
+        fig.savefig(line_chart_file)
+        chart_files.append(line_chart_file)
         print(f"Line chart saved to '{line_chart_file}'")
     except Exception as e:
         print(f"Error saving line chart: {e}")
-    finally:
-        plt.close()
+        saved = False
 
-if __name__ == "__main__":
-    csv_dir = os.getenv('output_csv_path_USDC_ETH_0.3_Pool')
-    print(f"CSV Directory: {csv_dir}")
-    pattern = re.compile(r'liquidity_data_(\d+)\.csv')
-    pool_csv_files = []
-
-    try:
-        all_files = os.listdir(csv_dir)
-    except FileNotFoundError:
-        print(f"Error: The directory '{csv_dir}' does not exist.")
-        exit(1)
-    for filename in all_files:
-        match = pattern.match(filename)
-        if match:
-            timestamp = int(match.group(1))
-            filepath = os.path.join(csv_dir, filename)
-            pool_csv_files.append((timestamp, filepath))
-    pool_csv_files.sort()
-    if not pool_csv_files:
-        print(f"No CSV files found in '{csv_dir}'.")
-        exit(1)
-    max_liquidity = get_max_liquidity(pool_csv_files)
+    # The charts written, or None if any failed so the file is retried next run
+    return chart_files if saved else None
 
+def central_ticks(pool_csv_files):
+    """
+    The centralized price tick matched to each pool snapshot, keyed by the snapshot's
+    timestamp. Snapshots with no centralized price within a minute are left out.
+    """
     # ---------- Load and prepare centralized price data ----------
     cex_csv_dir = os.getenv('output_csv_path_USDC_ETH_cex')
     cex_list = []  # List of tuples: (timestamp, central_tick)
@@ -227,9 +267,230 @@ if __name__ == "__main__":
             p1 += 1
         else:
             p2 += 1
+    return pool_matches
+
+def new_figure(max_liquidity):
+    fig = Figure(figsize=(14, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_ylim(bottom=0, top=float(max_liquidity))
+    ax.set_xlabel('Tick Index')
+    ax.set_ylabel('Cumulative Liquidity')
+    return fig, ax
+
+def tick_marker(ax):
+    # The current tick line and its label, moved to each snapshot's tick by move_marker
+    line = ax.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Current Tick')
+    text = ax.text(0, ax.get_ylim()[1]*0.95, 'Current Tick', color='red', rotation=90, va='top', ha='right')
+    return line, text
+
+def move_marker(marker, tick):
+    line, text = marker
+    line.set_xdata([tick, tick])
+    text.set_x(tick)
+
+class ChartRenderer:
+    """
+    Draws the bar and line charts of a pool on two figures built once, instead of a new
+    figure, axes and legend per snapshot. Each snapshot only moves the bars, the line, the
+    current tick marker and the title before the figure is rasterized. The layout is fitted
+    on the first snapshot and kept, so charts can differ slightly from plot_liquidity_distribution's.
+    """
+
+    def __init__(self, max_liquidity, output_charts_path):
+        max_liquidity = 1e18 # for comparison with 0.05Fee pool
+
+        self.bar_charts_path = os.path.join(output_charts_path, 'barCharts')
+        self.line_charts_path = os.path.join(output_charts_path, 'lineCharts')
+        os.makedirs(self.bar_charts_path, exist_ok=True)
+        os.makedirs(self.line_charts_path, exist_ok=True)
+
+        self.bar_figure, self.bar_axes = new_figure(max_liquidity)
+        self.bars = None
+        self.shown_bars = 0
+        self.bar_marker = tick_marker(self.bar_axes)
+        self.bar_central = self.bar_axes.axvline(x=0, color='green', linestyle='-', linewidth=2, label='Centralized Price')
+
+        self.line_figure, self.line_axes = new_figure(max_liquidity)
+        self.line, = self.line_axes.plot([], [], color='blue', linewidth=1, label='Cumulative Liquidity')
+        self.line_marker = tick_marker(self.line_axes)
+        self.line_central = self.line_axes.axvline(x=0, color='green', linestyle='-', linewidth=2, label='Centralized Price')
+        # The centralized price line and its legend entry only show for snapshots with a matched price
+        self.central_shown = None
+        self.laid_out = set()
+
+    def show_central(self, central_tick):
+        shown = central_tick is not None
+        for ax, line in ((self.bar_axes, self.bar_central), (self.line_axes, self.line_central)):
+            line.set_visible(shown)
+            if shown:
+                line.set_xdata([central_tick, central_tick])
+            if shown != self.central_shown:
+                ax.legend(handles=[artist for artist in ax.get_lines() if artist.get_visible()])
+        self.central_shown = shown
+
+    def update_bars(self, ticks, heights, width):
+        # A fixed pool of bars, moved and resized in place, with the ones a snapshot does not
+        # need hidden. It is only rebuilt when a snapshot needs more bars than it holds, with
+        # a quarter to spare so a slowly growing bar count does not rebuild it every time.
+        count = len(ticks)
+        if self.bars is None or len(self.bars) < count:
+            if self.bars is not None:
+                self.bars.remove()
+            size = count + count // 4
+            self.bars = self.bar_axes.bar(np.zeros(size), np.zeros(size), width=width, color='skyblue', align='center')
+            self.shown_bars = size
+        for rect, tick, height in zip(self.bars, ticks, heights):
+            rect.set_x(tick - width / 2)
+            rect.set_width(width)
+            rect.set_height(height)
+        for rect in self.bars[count:self.shown_bars]:
+            rect.set_visible(False)
+        for rect in self.bars[self.shown_bars:count]:
+            rect.set_visible(True)
+        self.shown_bars = count
+
+    def fit(self, fig, ax):
+        # The x-axis follows the snapshot's data, as a fresh figure's would; the layout is fitted once
+        ax.relim(visible_only=True)
+        ax.autoscale_view(scaley=False)
+        if fig not in self.laid_out:
+            fig.tight_layout()
+            self.laid_out.add(fig)
+
+    def save(self, fig, ax, chart_file, chart):
+        self.fit(fig, ax)
+        try:
+            fig.savefig(chart_file)
+            print(f"{chart} saved to '{chart_file}'")
+            return True
+        except Exception as e:
+            print(f"Error saving {chart.lower()}: {e}")
+            return False
+
+    def update_bar_chart(self, snapshot):
+        # Moves the bar chart to the snapshot; False if it has no ticks in the chart's range
+        df, current_tick = snapshot['df'], snapshot['current_tick']
+        tick_min = current_tick - 15000
+        tick_max = current_tick + 15000
+        df_focus = df[(df['tickIdx'] >= tick_min) & (df['tickIdx'] <= tick_max)]
+        if df_focus.empty:
+            print(f"No data available in the specified range (tickIdx {tick_min} to {tick_max}) for the bar chart.")
+            return False
+        self.update_bars(df_focus['tickIdx'].to_numpy(), df_focus['cumulative_liquidity'].to_numpy(),
+                         (tick_max - tick_min) / len(df_focus) * 0.9)
+        move_marker(self.bar_marker, current_tick)
+        time_str, pool_id = format_timestamp(snapshot['timestamp']), snapshot['pool_id']
+        self.bar_axes.set_title(f'Liquidity Distribution (Bar Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+        return True
+
+    def update_line_chart(self, snapshot):
+        df = snapshot['df']
+        self.line.set_data(df['tickIdx'], df['cumulative_liquidity'])
+        move_marker(self.line_marker, snapshot['current_tick'])
+        time_str, pool_id = format_timestamp(snapshot['timestamp']), snapshot['pool_id']
+        self.line_axes.set_title(f'Liquidity Distribution (Line Chart)\nTimestamp: {time_str}\nPool ID: {pool_id}')
+
+    def render(self, csv_file_path, central_tick=None, snapshot=None):
+        if snapshot is None:
+            snapshot = load_snapshot(csv_file_path)
+            if snapshot is None:
+                return
+        timestamp = snapshot['timestamp']
+        self.show_central(central_tick)
+        chart_files = []
+        saved = True
+
+        if self.update_bar_chart(snapshot):
+            bar_chart_file = os.path.join(self.bar_charts_path, f'liquidity_bar_chart_{timestamp}.png')
+            if self.save(self.bar_figure, self.bar_axes, bar_chart_file, 'Bar chart'):
+                chart_files.append(bar_chart_file)
+            else:
+                saved = False
+
+        self.update_line_chart(snapshot)
+        line_chart_file = os.path.join(self.line_charts_path, f'liquidity_line_chart_{timestamp}.png')
+        if self.save(self.line_figure, self.line_axes, line_chart_file, 'Line chart'):
+            chart_files.append(line_chart_file)
+        else:
+            saved = False
+
+        # The charts written, or None if any failed so the file is retried next run
+        return chart_files if saved else None
+
+    def bar_frame(self, snapshot, central_tick=None):
+        # The snapshot's bar chart as an RGB array, exactly as it would be saved, or None if it has no ticks in range
+        self.show_central(central_tick)
+        if not self.update_bar_chart(snapshot):
+            return None
+        self.fit(self.bar_figure, self.bar_axes)
+        self.bar_figure.canvas.draw()
+        return np.asarray(self.bar_figure.canvas.buffer_rgba())[:, :, :3]
+
+# One renderer per process, so --reuse-figure also works across --workers
+renderer = None
+
+def render_snapshot(csv_file_path, max_liquidity, central_tick=None, snapshot=None):
+    global renderer
+    if renderer is None:
+        renderer = ChartRenderer(max_liquidity, os.getenv('output_charts_path_USDC_ETH_0.3_Pool'))
+    return renderer.render(csv_file_path, central_tick, snapshot)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot liquidity distribution charts for the pool's snapshots")
+    parser.add_argument('--start-time', type=int, help="only plot snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only plot snapshots at or before this unix timestamp")
+    parser.add_argument('--workers', type=int, default=1, help="render charts across this many processes (0 or 1 renders them in this one)")
+    parser.add_argument('--reuse-figure', action='store_true', help="update one figure per chart type instead of building one per snapshot")
+    args = parser.parse_args()
+    if args.workers < 0:
+        parser.error("--workers must be 0 or more")
+
+    csv_dir = os.getenv('output_csv_path_USDC_ETH_0.3_Pool')
+    print(f"CSV Directory: {csv_dir}")
+    # Snapshots come from the pool's archive when it has one, otherwise from the CSVs
+    archive_path = os.getenv('output_archive_path_USDC_ETH_0.3_Pool')
+
+    try:
+        pool_csv_files = snapshot_sources(csv_dir, archive_path, args.start_time, args.end_time)
+    except FileNotFoundError:
+        print(f"Error: The directory '{csv_dir}' does not exist.")
+        exit(1)
+    if not pool_csv_files:
+        print(f"No CSV files found in '{csv_dir}'.")
+        exit(1)
+
+    output_charts_path = os.getenv('output_charts_path_USDC_ETH_0.3_Pool')
+    if not output_charts_path:
+        print("Error: 'output_charts_path' not found in .env file.")
+        exit(1)
+
+    # Files whose charts are already up to date are skipped
+    manifest = load_manifest(output_charts_path)
+    if args.start_time is None and args.end_time is None:
+        prune(manifest, [source_name(filepath) for _, filepath in pool_csv_files])
+    # These charts draw against a fixed y-axis limit, so no pass over the history is needed for one
+    pool_matches = central_ticks(pool_csv_files)
 
     # ---------- Process each pool CSV and plot, using matched centralized tick if available ----------
+    pending = []
     for pool_ts, filepath in pool_csv_files:
         ct = pool_matches.get(pool_ts)  # May be None if no match
+        params = {'central_tick': ct}
+        if is_current(manifest, filepath, CHART_VERSION, params):
+            continue
         print(f"Processing file: {filepath} (Pool timestamp: {pool_ts}, Matched central tick: {ct})")
-        plot_liquidity_distribution(filepath, max_liquidity, central_tick=ct)
\ No newline at end of file
+        pending.append((pool_ts, filepath, params))
+
+    # The charts keep no pyplot state, so snapshots can be rendered in worker processes. Each
+    # is handed its source and parses it itself, and results come back in order; a serial run
+    # renders each snapshot as it is read
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        render = executor.map if args.workers > 1 else map
+        results = render(render_snapshot if args.reuse_figure else plot_liquidity_distribution, [filepath for _, filepath, _ in pending],
+                         [None] * len(pending), [params['central_tick'] for _, _, params in pending])
+        for (pool_ts, filepath, params), chart_files in zip(pending, results):
+            if chart_files is not None:
+                record(manifest, filepath, CHART_VERSION, chart_files, params=params, timestamp=pool_ts)
+                save_manifest(output_charts_path, manifest)
+    save_manifest(output_charts_path, manifest)
\ No newline at end of file
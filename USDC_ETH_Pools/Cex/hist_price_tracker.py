@@ -1,10 +1,13 @@
 import http.client
 import json
 import os
-import re
 import csv
 import time
+import argparse
 from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared'))
+from snapshotCatalog import list_snapshots
 
 load_dotenv()
 
@@ -32,28 +35,19 @@ def get_price_for_timestamp(ts):
         print(f"Error fetching price for timestamp {ts}: {e}")
         return None
 
-def main():
+def main(start_time=None, end_time=None):
 
     csv_dir = os.getenv('output_csv_path_USDC_ETH_0.05_Pool')
     if not csv_dir:
         print("Error: 'output_csv_path_USDC_ETH_0.05_Pool' not defined in .env file.")
         return
 
-    pattern = re.compile(r'liquidity_data_(\d+)\.csv')
-    timestamps = []
-
     try:
-        files = os.listdir(csv_dir)
+        timestamps = [ts for ts, _ in list_snapshots(csv_dir, start_time, end_time)]
     except Exception as e:
         print(f"Error listing CSV directory '{csv_dir}': {e}")
         return
 
-    for filename in files:
-        match = pattern.match(filename)
-        if match:
-            ts = int(match.group(1))
-            timestamps.append(ts)
-
     if not timestamps:
         print(f"No matching CSV files found in '{csv_dir}'.")
         return
@@ -76,4 +70,8 @@ def main():
             time.sleep(0.1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch the Coinbase ETH price at each 0.05 pool snapshot")
+    parser.add_argument('--start-time', type=int, help="only snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only snapshots at or before this unix timestamp")
+    args = parser.parse_args()
+    main(args.start_time, args.end_time)
\ No newline at end of file
@@ -1,15 +1,19 @@
 import os
-import re
+import argparse
 import math
 import csv
-import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime
 from dotenv import load_dotenv
 import matplotlib.ticker as ticker
+import pandas as pd
 from decimal import Decimal, getcontext
 import mpmath as mp
 from scipy.stats import wasserstein_distance
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared'))
+from snapshotArchive import snapshot_sources, read_snapshot
+from liquidityMatrix import build_matrix, LiquidityMatrix
 
 load_dotenv()
 
@@ -40,30 +44,59 @@ def precise_price(tick):
     return float(price_mpf)
 
 def read_pool_data(filepath):
-    df = pd.read_csv(filepath)
+    df = read_snapshot(filepath)
     df['tickIdx'] = df['tickIdx'].astype(int)
     df['cumulative_liquidity'] = df['cumulative_liquidity'].astype(float)
     return df.sort_values('tickIdx')
 
 
-def get_max_liquidity(pool_csv_files_005, pool_csv_files_03):
+def pool_matrix(csv_dir, archive_path, matrix_dir):
+    """
+    The pool's liquidity matrix, kept in matrix_dir and rebuilt when the pool has
+    snapshots it does not hold. Returns None when the pool has no snapshots.
+    """
+    timestamps = [timestamp for timestamp, _ in snapshot_sources(csv_dir, archive_path)]
+    if os.path.exists(os.path.join(matrix_dir, 'meta.json')):
+        matrix = LiquidityMatrix(matrix_dir)
+        if matrix.timestamps.tolist() == timestamps:
+            return matrix
+    if build_matrix(csv_dir, matrix_dir, archive_path, mode='float32') is None:
+        return None
+    return LiquidityMatrix(matrix_dir)
+
+def get_max_liquidity(matrices):
+    # Highest cumulative liquidity in any snapshot of the pools, one block of rows at a time
     max_liquidity = 0
-    for _, filepath in pool_csv_files_005:
-        try:
-            df = pd.read_csv(filepath)
-            max_liquidity = max(max_liquidity, df['cumulative_liquidity'].astype(float).max())
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
-            continue
-    for _, filepath in pool_csv_files_03:
-        try:
-            df = pd.read_csv(filepath)
-            max_liquidity = max(max_liquidity, df['cumulative_liquidity'].astype(float).max())
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
-            continue
+    for matrix in matrices:
+        for _, block in matrix.chunks():
+            if block.size:
+                max_liquidity = max(max_liquidity, float(block.max()))
     return max_liquidity
 
+def compare_history(matrix_005, matrix_03, start_time=None, end_time=None):
+    """
+    Both pools over their whole history, from their liquidity matrices: per snapshot the
+    total liquidity and the liquidity-weighted mean and spread of the tick, each 0.05 pool
+    snapshot paired with the 0.3 pool snapshot within 15 seconds of it, as the charts pair them.
+    """
+    stats = {}
+    for name, matrix in (("005", matrix_005), ("03", matrix_03)):
+        if matrix is None:
+            continue
+        df = matrix.distribution_stats()
+        if start_time is not None:
+            df = df[df['timestamp'] >= start_time]
+        if end_time is not None:
+            df = df[df['timestamp'] <= end_time]
+        stats[name] = df.rename(columns={column: f"{column}_{name}" for column in df.columns if column != 'timestamp'})
+    if not stats:
+        return None
+    if len(stats) == 1:
+        return next(iter(stats.values()))
+    history = pd.merge_asof(stats["005"], stats["03"], on='timestamp', tolerance=15, direction='nearest')
+    history['mean_tick_difference'] = history['mean_tick_005'] - history['mean_tick_03']
+    return history
+
 def gen_cex_csv(filename):
     # rows sorted by timestamp
     with open(filename, 'r') as file:
@@ -71,27 +104,20 @@ def gen_cex_csv(filename):
         for row in reader:
             yield row
 
-def csv_file_gen(csv_dir):
-    pattern = re.compile(r'liquidity_data_(\d+)\.csv')
-    all_files = os.listdir(csv_dir)
-    pool_csv_files = []
-    for filename in all_files:
-        match = pattern.match(filename)
-        if match:
-            timestamp = int(match.group(1))
-            filepath = os.path.join(csv_dir, filename)
-            pool_csv_files.append((timestamp, filepath))
-    pool_csv_files.sort()
+def csv_file_gen(csv_dir, archive_path=None, start_time=None, end_time=None):
+    # Snapshots from the pool's archive when it has one, otherwise from its cataloged CSVs
+    pool_csv_files = snapshot_sources(csv_dir, archive_path, start_time, end_time)
 
     for timestamp, filepath in pool_csv_files:
         yield timestamp, filepath
 
 
-def compare_liquidity_distributions(pool_csv_files_005, pool_csv_files_03, cex_csv_dir):
+def compare_liquidity_distributions(pool_csv_files_005, pool_csv_files_03, cex_csv_dir, archive_path_005=None, archive_path_03=None,
+                                    start_time=None, end_time=None):
 
     gen_cex = gen_cex_csv(cex_csv_dir)
-    gen_005 = csv_file_gen(pool_csv_files_005)
-    gen_03 = csv_file_gen(pool_csv_files_03)
+    gen_005 = csv_file_gen(pool_csv_files_005, archive_path_005, start_time, end_time)
+    gen_03 = csv_file_gen(pool_csv_files_03, archive_path_03, start_time, end_time)
 
     cex_row = next(gen_cex, None)
     pool_005 = next(gen_005, None)
@@ -288,10 +314,27 @@ def plot_liquidity_distributions(pool_005_filepath, pool_03_filepath, cex_row):
     plt.close(fig)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the 0.05 and 0.3 pools' liquidity distributions")
+    parser.add_argument('--start-time', type=int, help="only compare snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only compare snapshots at or before this unix timestamp")
+    args = parser.parse_args()
 
     cex_csv_dir = os.getenv('output_csv_path_USDC_ETH_cex')
     pool_csv_dir_005 = os.getenv('output_csv_path_USDC_ETH_0.05_Pool')
     pool_csv_dir_03 = os.getenv('output_csv_path_USDC_ETH_0.3_Pool')
+    archive_path_005 = os.getenv('output_archive_path_USDC_ETH_0.05_Pool')
+    archive_path_03 = os.getenv('output_archive_path_USDC_ETH_0.3_Pool')
+
+    compare_liquidity_distributions(pool_csv_dir_005, pool_csv_dir_03, cex_csv_dir, archive_path_005, archive_path_03,
+                                    args.start_time, args.end_time)
 
-    compare_liquidity_distributions(pool_csv_dir_005, pool_csv_dir_03, cex_csv_dir)
+    # Whole-history statistics come from each pool's memory-mapped matrix instead of its snapshots
+    output_charts_path = os.getenv('output_charts_path_USDC_ETH_compare')
+    matrix_005 = pool_matrix(pool_csv_dir_005, archive_path_005, os.path.join(output_charts_path, "matrix_0.05"))
+    matrix_03 = pool_matrix(pool_csv_dir_03, archive_path_03, os.path.join(output_charts_path, "matrix_0.3"))
+    history = compare_history(matrix_005, matrix_03, args.start_time, args.end_time)
+    if history is not None:
+        history_file = os.path.join(output_charts_path, "liquidity_history.csv")
+        history.to_csv(history_file, index=False)
+        print(f"Liquidity history of {len(history)} snapshots saved to '{history_file}'")
     
@@ -13,6 +13,10 @@ CHANNEL_ID = os.getenv('discord_channel_id')
 CE_CURR_PRICE_TRACKER_PATH = os.getenv('cex_curr_price_tracker_path')
 GRAPH_QUERIES_0_05_PATH = os.getenv('USDC_ETH_0.05_Pool_graph_queries')
 GRAPH_QUERIES_0_3_PATH = os.getenv('USDC_ETH_0.3_Pool_graph_queries')
+ALL_POOLS_GRAPH_QUERIES_PATH = os.getenv('all_pools_graph_queries')
+
+USDC_ETH_0_05_POOL = "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640"
+USDC_ETH_0_3_POOL = "0x8ad599c3a0ff1de082011efddc58f1908eb6e6d8"
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -53,8 +57,12 @@ async def on_message(message):
         
         try:
             subprocess.run(['python3', CE_CURR_PRICE_TRACKER_PATH], check=True)
-            subprocess.run(['python3', GRAPH_QUERIES_0_05_PATH], check=True)
-            subprocess.run(['python3', GRAPH_QUERIES_0_3_PATH], check=True)
+            if ALL_POOLS_GRAPH_QUERIES_PATH:
+                # Both pools in shared requests with one timestamp
+                subprocess.run(['python3', ALL_POOLS_GRAPH_QUERIES_PATH, USDC_ETH_0_05_POOL, USDC_ETH_0_3_POOL], check=True)
+            else:
+                subprocess.run(['python3', GRAPH_QUERIES_0_05_PATH], check=True)
+                subprocess.run(['python3', GRAPH_QUERIES_0_3_PATH], check=True)
             logger.info("Successfully triggered external scripts.")
         except Exception as e:
             logger.error(f"Error triggering external scripts: {e}")
@@ -1,36 +1,34 @@
 import os
-import re
 import sys
+import argparse
 import pandas as pd
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from snapshotArchive import snapshot_sources, read_snapshot
 
 load_dotenv()
 
-def csv_file_gen(csv_dir):
+def csv_file_gen(csv_dir, archive_path=None, start_time=None, end_time=None):
     """
-    Yields tuples of (timestamp, filepath) for CSV files matching the pattern:
-    liquidity_data_<timestamp>.csv in the given directory.
+    Yields tuples of (timestamp, filepath) for the liquidity_data_<timestamp>.csv files
+    the snapshot catalog holds for the given directory, or (timestamp, snapshot) for the
+    snapshots in archive_path when the pool has an archive, limited to the time range.
     """
-    pattern = re.compile(r'liquidity_data_(\d+)\.csv')
     try:
-        for filename in os.listdir(csv_dir):
-            match = pattern.match(filename)
-            if match:
-                timestamp = int(match.group(1))
-                filepath = os.path.join(csv_dir, filename)
-                yield timestamp, filepath
+        for timestamp, filepath in snapshot_sources(csv_dir, archive_path, start_time, end_time):
+            yield timestamp, filepath
     except Exception as e:
         print(f"Error listing directory {csv_dir}: {e}")
 
-def check_negative_liquidity(csv_dir):
+def check_negative_liquidity(csv_dir, archive_path=None, start_time=None, end_time=None):
     """
-    Iterates over all CSV files in the directory using csv_file_gen.
+    Iterates over all CSV files in the directory (or snapshots in the archive) using csv_file_gen.
     If a CSV file contains any negative cumulative_liquidity value, it prints
     the file path and the min/max liquidityNet values (if available), then terminates.
     """
-    for _, filepath in csv_file_gen(csv_dir):
+    for _, filepath in csv_file_gen(csv_dir, archive_path, start_time, end_time):
         try:
-            df = pd.read_csv(filepath)
+            df = read_snapshot(filepath)
             # Convert the cumulative_liquidity column to numeric, coercing errors to NaN
             df['cumulative_liquidity'] = pd.to_numeric(df['cumulative_liquidity'], errors='coerce')
             # Also convert liquidityNet column if it exists
@@ -50,13 +48,20 @@ def check_negative_liquidity(csv_dir):
             print(f"Error reading {filepath}: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the USDC/ETH pools' snapshots for negative cumulative liquidity")
+    parser.add_argument('--start-time', type=int, help="only check snapshots at or after this unix timestamp")
+    parser.add_argument('--end-time', type=int, help="only check snapshots at or before this unix timestamp")
+    args = parser.parse_args()
+
     pool_csv_dir_005 = os.getenv('output_csv_path_USDC_ETH_0.05_Pool')
     pool_csv_dir_03 = os.getenv('output_csv_path_USDC_ETH_0.3_Pool')
+    archive_path_005 = os.getenv('output_archive_path_USDC_ETH_0.05_Pool')
+    archive_path_03 = os.getenv('output_archive_path_USDC_ETH_0.3_Pool')
 
     # Check for negative cumulative liquidity in both pool CSV directories.
     print("Checking 0.05 Pool CSV files for negative cumulative liquidity...")
-    check_negative_liquidity(pool_csv_dir_005)
+    check_negative_liquidity(pool_csv_dir_005, archive_path_005, args.start_time, args.end_time)
     print("Checking 0.3 Pool CSV files for negative cumulative liquidity...")
-    check_negative_liquidity(pool_csv_dir_03)
+    check_negative_liquidity(pool_csv_dir_03, archive_path_03, args.start_time, args.end_time)
 
     print("No negative cumulative liquidity values found in any CSV file.")
\ No newline at end of file
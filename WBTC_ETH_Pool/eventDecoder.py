@@ -0,0 +1,230 @@
+import json
+import sys
+import time
+import numpy as np
+from functools import lru_cache
+from web3 import Web3 # type: ignore
+
+# Fast decoder for the pool's Swap/Mint/Burn logs. Topic hashes are computed once and the
+# data words are sliced at fixed offsets, instead of going through web3's generic ABI
+# machinery for every event as process_log does.
+
+SWAP_SIGNATURE = "Swap(address,address,int256,int256,uint160,uint128,int24)"
+MINT_SIGNATURE = "Mint(address,address,int24,int24,uint128,uint256,uint256)"
+BURN_SIGNATURE = "Burn(address,int24,int24,uint128,uint256,uint256)"
+
+SWAP_TOPIC = "0x" + Web3.keccak(text=SWAP_SIGNATURE).hex().removeprefix("0x")
+MINT_TOPIC = "0x" + Web3.keccak(text=MINT_SIGNATURE).hex().removeprefix("0x")
+BURN_TOPIC = "0x" + Web3.keccak(text=BURN_SIGNATURE).hex().removeprefix("0x")
+
+EVENT_NAMES = {
+    SWAP_TOPIC: "Swap",
+    MINT_TOPIC: "Mint",
+    BURN_TOPIC: "Burn",
+}
+
+# Argument names in ABI order, indexed topics first where the layout needs them
+EVENT_ARGS = {
+    "Swap": ["sender", "recipient", "amount0", "amount1", "sqrtPriceX96", "liquidity", "tick"],
+    "Mint": ["sender", "owner", "tickLower", "tickUpper", "amount", "amount0", "amount1"],
+    "Burn": ["owner", "tickLower", "tickUpper", "amount", "amount0", "amount1"],
+}
+
+# Log fields process_log passes through unchanged
+LOG_FIELDS = ["logIndex", "transactionIndex", "transactionHash", "address", "blockHash", "blockNumber"]
+
+def to_hex(value):
+    # Raw JSON-RPC logs carry hex strings, web3-formatted logs carry HexBytes
+    if isinstance(value, str):
+        return value[2:] if value.startswith("0x") else value
+    return bytes(value).hex()
+
+def to_int(value):
+    return int(value, 16) if isinstance(value, str) else value
+
+def to_signed(word):
+    value = int(word, 16)
+    return value - (1 << 256) if value >= (1 << 255) else value
+
+@lru_cache(maxsize=None)
+def to_address(word):
+    # The same routers and position managers show up in most events
+    return Web3.to_checksum_address("0x" + word[-40:])
+
+def split_words(data):
+    data = to_hex(data)
+    return [data[i:i + 64] for i in range(0, len(data), 64)]
+
+def decode_args(event_name, topics, words):
+    if event_name == "Swap":
+        return {
+            "sender": to_address(topics[1]),
+            "recipient": to_address(topics[2]),
+            "amount0": to_signed(words[0]),
+            "amount1": to_signed(words[1]),
+            "sqrtPriceX96": int(words[2], 16),
+            "liquidity": int(words[3], 16),
+            "tick": to_signed(words[4]),
+        }
+    if event_name == "Mint":
+        return {
+            "sender": to_address(words[0]),
+            "owner": to_address(topics[1]),
+            "tickLower": to_signed(topics[2]),
+            "tickUpper": to_signed(topics[3]),
+            "amount": int(words[1], 16),
+            "amount0": int(words[2], 16),
+            "amount1": int(words[3], 16),
+        }
+    return {
+        "owner": to_address(topics[1]),
+        "tickLower": to_signed(topics[2]),
+        "tickUpper": to_signed(topics[3]),
+        "amount": int(words[0], 16),
+        "amount0": int(words[1], 16),
+        "amount1": int(words[2], 16),
+    }
+
+def decode_log(log):
+    """
+    Decodes one Swap, Mint or Burn log into the same shape process_log returns:
+    {'args', 'event'} plus the log's own fields.
+    """
+    topics = [to_hex(topic) for topic in log['topics']]
+    event_name = EVENT_NAMES["0x" + topics[0]]
+    decoded = {
+        "args": decode_args(event_name, topics, split_words(log['data'])),
+        "event": event_name,
+    }
+    for field in LOG_FIELDS:
+        decoded[field] = log[field]
+    return decoded
+
+def word_column(data, index):
+    # The index-th 32-byte word of every log's data
+    start = index * 64
+    return [words[start:start + 64] for words in data]
+
+def uint_column(words):
+    return [int(word, 16) for word in words]
+
+def int_column(words):
+    return [to_signed(word) for word in words]
+
+def int24_column(words):
+    # Ticks are int24 sign-extended to a word, so the low 6 hex digits hold the whole value
+    values = np.array([int(word[-6:], 16) for word in words], dtype=np.int64)
+    return np.where(values >= 1 << 23, values - (1 << 24), values)
+
+def address_column(words):
+    return [to_address(word) for word in words]
+
+def decode_columns(event_name, topics, data):
+    # topics[i] is the column of every log's i-th topic, data every log's data as hex
+    if event_name == "Swap":
+        return {
+            "sender": address_column(topics[1]),
+            "recipient": address_column(topics[2]),
+            "amount0": int_column(word_column(data, 0)),
+            "amount1": int_column(word_column(data, 1)),
+            "sqrtPriceX96": uint_column(word_column(data, 2)),
+            "liquidity": uint_column(word_column(data, 3)),
+            "tick": int24_column(word_column(data, 4)),
+        }
+    if event_name == "Mint":
+        return {
+            "sender": address_column(word_column(data, 0)),
+            "owner": address_column(topics[1]),
+            "tickLower": int24_column(topics[2]),
+            "tickUpper": int24_column(topics[3]),
+            "amount": uint_column(word_column(data, 1)),
+            "amount0": uint_column(word_column(data, 2)),
+            "amount1": uint_column(word_column(data, 3)),
+        }
+    return {
+        "owner": address_column(topics[1]),
+        "tickLower": int24_column(topics[2]),
+        "tickUpper": int24_column(topics[3]),
+        "amount": uint_column(word_column(data, 0)),
+        "amount0": uint_column(word_column(data, 1)),
+        "amount1": uint_column(word_column(data, 2)),
+    }
+
+def decode_log_page(logs):
+    """
+    Decodes a page of logs into columns per event:
+    {'Swap': {'transactionHash': [...], 'blockNumber': array, 'logIndex': array, 'sender': [...], ...}, ...}
+    The page is walked once to sort the logs by event, then each argument is decoded a whole
+    column at a time. Block numbers, log indexes and ticks are int64 arrays; the 256-bit
+    amounts stay Python ints, which numpy cannot hold exactly.
+    """
+    pages = {event_name: [] for event_name in EVENT_ARGS}
+    for log in logs:
+        topic = log['topics'][0]
+        pages[EVENT_NAMES[topic if isinstance(topic, str) else "0x" + to_hex(topic)]].append(log)
+
+    columns = {}
+    for event_name, page in pages.items():
+        # Words are only ever sliced from the right or parsed base 16, so raw hex topics keep their 0x
+        if page and not isinstance(page[0]['topics'][0], str):
+            topics = list(zip(*[[to_hex(topic) for topic in log['topics']] for log in page]))
+        else:
+            topics = list(zip(*[log['topics'] for log in page])) or [()] * 4
+        columns[event_name] = {
+            "transactionHash": [log['transactionHash'] for log in page],
+            "blockNumber": np.array([to_int(log['blockNumber']) for log in page], dtype=np.int64),
+            "logIndex": np.array([to_int(log['logIndex']) for log in page], dtype=np.int64),
+        }
+        columns[event_name].update(decode_columns(event_name, topics, [to_hex(log['data']) for log in page]))
+    return columns
+
+def benchmark(logs, pool_abi):
+    """
+    Checks decode_log against web3's process_log on recorded logs, field for field,
+    and prints the time each takes for the whole set.
+    """
+    pool_contract = Web3().eth.contract(abi=pool_abi)
+    logs = [log for log in logs if ("0x" + to_hex(log['topics'][0])) in EVENT_NAMES]
+
+    start = time.perf_counter()
+    expected = [pool_contract.events[EVENT_NAMES["0x" + to_hex(log['topics'][0])]]().process_log(log) for log in logs]
+    process_log_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [decode_log(log) for log in logs]
+    decode_log_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = decode_log_page(logs)
+    decode_page_time = time.perf_counter() - start
+
+    mismatches = 0
+    for web3_event, fast_event in zip(expected, decoded):
+        if dict(web3_event['args']) != fast_event['args'] or web3_event['event'] != fast_event['event'] \
+                or any(web3_event[field] != fast_event[field] for field in LOG_FIELDS):
+            mismatches += 1
+            print(f"Mismatch in {fast_event['transactionHash']}: {dict(web3_event['args'])} != {fast_event['args']}")
+
+    # The page's columns hold the same events in the same order within each event
+    for event_name, args in EVENT_ARGS.items():
+        page_args = [dict(zip(args, values)) for values in zip(*[
+            columns[event_name][arg].tolist() if isinstance(columns[event_name][arg], np.ndarray)
+            else columns[event_name][arg] for arg in args])]
+        web3_args = [dict(web3_event['args']) for web3_event in expected if web3_event['event'] == event_name]
+        if page_args != web3_args:
+            mismatches += 1
+            print(f"decode_log_page mismatch in {event_name} columns")
+
+    print(f"{len(logs)} logs, {mismatches} mismatches")
+    print(f"process_log:     {process_log_time:.3f}s")
+    print(f"decode_log:      {decode_log_time:.3f}s")
+    print(f"decode_log_page: {decode_page_time:.3f}s")
+    return mismatches
+
+if __name__ == "__main__":
+    # Usage: python eventDecoder.py <recorded_logs.json>  (see query.record_logs)
+    with open('abis/pool_abi.json') as f:
+        pool_abi = json.load(f)
+    with open(sys.argv[1]) as f:
+        recorded_logs = json.load(f)
+    sys.exit(1 if benchmark(recorded_logs, pool_abi) else 0)
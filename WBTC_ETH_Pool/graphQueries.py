@@ -1,12 +1,18 @@
 import requests # type: ignore
 import os, json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv # type: ignore
 from datetime import datetime
 import pandas as pd # type: ignore
 import matplotlib.pyplot as plt # type: ignore
-from decimal import Decimal, getcontext
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import wideInt
+from snapshotArchive import append_snapshots
+from subgraphClient import post_query
+from snapshotCatalog import register_snapshot, query_snapshots
 
-getcontext().prec = 78
 # Load env with debug
 load_dotenv()
 the_graph_api_key = os.getenv('the_graph_api_key')
@@ -19,17 +25,179 @@ POOL_ADDRESS = "0xcbcdf9626bc03e24f779434178a73a0b4bad62ed"
 OUTPUT_DIR = os.getenv('output_csv_path_WBTC_ETH_Pool')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_hourly_pool_data(pool_address):
+# Optional consolidated snapshot archive kept alongside the CSVs
+ARCHIVE_PATH = os.getenv('output_archive_path_WBTC_ETH_Pool')
+
+# Full Uniswap V3 tick domain, split into disjoint ranges for parallel fetching. Initialized
+# ticks cluster around the current price, so a window of WINDOW_SPACINGS tick spacings either
+# side of the current tick is split into NUM_TICK_RANGES ranges holding similar numbers of
+# ticks, and each sparse tail beyond it is one more range
+MIN_TICK = -887272
+MAX_TICK = 887272
+NUM_TICK_RANGES = 16
+WINDOW_SPACINGS = 2000
+
+# Tick spacing of each fee tier; the subgraph's pool entity only has the fee tier
+FEE_TICK_SPACING = {100: 1, 500: 10, 3000: 60, 10000: 200}
+
+# Backfill settings: blocks fetched concurrently and the resume file
+BACKFILL_WORKERS = 4
+CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, 'backfill_checkpoint.txt')
+# Backfilled snapshots added to the archive per rewrite of it
+ARCHIVE_BATCH = 64
+
+def split_tick_domain(current_tick, tick_spacing, num_ranges, known_ticks=None, window_spacings=WINDOW_SPACINGS):
+    """
+    Splits [MIN_TICK, MAX_TICK] into disjoint (lower, upper] bounds, matching the
+    tickIdx_gt / tickIdx_lte filters used by fetch_tick_range: num_ranges ranges over the
+    window of window_spacings tick spacings either side of current_tick, and one for each
+    tail outside it. known_ticks, the sorted tickIdx values of an earlier snapshot, put the
+    window's edges at their quantiles so each range holds about as many ticks; without
+    them the window is split evenly.
+    """
+    low = max(current_tick - window_spacings * tick_spacing, MIN_TICK - 1)
+    high = min(current_tick + window_spacings * tick_spacing, MAX_TICK)
+    inside = [tick for tick in known_ticks or () if low < tick <= high]
+    if len(inside) >= num_ranges:
+        cuts = [inside[(i * len(inside)) // num_ranges - 1] for i in range(1, num_ranges)]
+    else:
+        cuts = [low + (i * (high - low)) // num_ranges for i in range(1, num_ranges)]
+    edges = sorted({low, high, *cuts})
+    bounds = list(zip(edges[:-1], edges[1:]))
+    if low > MIN_TICK - 1:
+        bounds.insert(0, (MIN_TICK - 1, low))
+    if high < MAX_TICK:
+        bounds.append((high, MAX_TICK))
+    return bounds
+
+def known_ticks(timestamp=None):
+    """
+    The sorted tickIdx values of the pool's latest cataloged snapshot taken by timestamp
+    (any, when None), as a guide to where its ticks are; None when there is none to read.
+    """
+    try:
+        snapshots = query_snapshots(OUTPUT_DIR, end_time=timestamp, columns=('path',))
+        if not snapshots:
+            return None
+        return sorted(pd.read_csv(snapshots[-1][0], usecols=['tickIdx'])['tickIdx'].astype(int))
+    except Exception as e:
+        print(f"No earlier snapshot to split tick ranges by: {e}")
+        return None
+
+def block_filter(block):
+    # Pins an entity query to a block number; empty for the latest indexed state
+    return "" if block is None else ", block: {number: %d}" % block
+
+def get_indexed_block(block=None):
+    """
+    Returns {'number', 'timestamp'} of the given block, or of the subgraph's latest
+    indexed block when block is None.
+    """
+    query = """
+    {
+        _meta(%s) {
+            block {
+                number
+                timestamp
+            }
+        }
+    }
+    """ % ("" if block is None else "block: {number: %d}" % block)
+    meta_block = post_query(query)['_meta']['block']
+    return {
+        "number": int(meta_block['number']),
+        "timestamp": int(meta_block['timestamp'])
+    }
+
+def fetch_tick_range(pool_address, lower, upper, batch_size=1000, block=None):
+    """
+    Pages through the pool's ticks with lower < tickIdx <= upper, using the last
+    tickIdx seen as the cursor instead of skip. Returns (pool_data, ticks).
+    """
+    cursor = lower
+    ticks = []
+    pool_data = None
+
+    while True:
+        query = """
+        {
+            pool(id: "%s"%s) {
+                id
+                tick
+                ticks(first: %d, orderBy: tickIdx, orderDirection: asc, where: {tickIdx_gt: "%d", tickIdx_lte: "%d"}) {
+                    tickIdx
+                    liquidityNet
+                }
+            }
+        }
+        """ % (pool_address, block_filter(block), batch_size, cursor, upper)
+
+        data = post_query(query)['pool']
+        if data is None:
+            raise RuntimeError(f"Pool {pool_address} not found at block {block}")
+        if pool_data is None:
+            pool_data = {
+                "id": data['id'],
+                "tick": data['tick']
+            }
+
+        page = data['ticks']
+        for tick in page:
+            ticks.append({
+                "tickIdx": tick['tickIdx'],
+                "liquidityNet": tick['liquidityNet']
+            })
+        # A short page means the range is exhausted, no need for another round-trip
+        if len(page) < batch_size:
+            break
+        cursor = int(page[-1]['tickIdx'])
+
+    return pool_data, ticks
+
+def get_pool_state(pool_address, block=None):
+    # The pool's current tick and fee tier, which place the tick ranges
+    query = """
+    {
+        pool(id: "%s"%s) {
+            tick
+            feeTier
+        }
+    }
+    """ % (pool_address, block_filter(block))
+    data = post_query(query)['pool']
+    if data is None:
+        raise RuntimeError(f"Pool {pool_address} not found at block {block}")
+    return data
+
+def get_ticks_by_range(pool_address, num_ranges=NUM_TICK_RANGES, block=None, timestamp=None):
+    """
+    Fetches every tick of the pool by querying disjoint tick ranges concurrently, split
+    around the pool's current tick by the latest snapshot taken by timestamp. Ranges are
+    merged in ascending order, so the result matches the serial orderBy: tickIdx listing.
+    """
+    state = get_pool_state(pool_address, block)
+    ranges = split_tick_domain(int(state['tick'] or 0), FEE_TICK_SPACING.get(int(state['feeTier']), 1),
+                               num_ranges, known_ticks(timestamp))
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        results = list(executor.map(
+            lambda bounds: fetch_tick_range(pool_address, *bounds, block=block), ranges))
+
+    pool_data = next((data for data, _ in results if data is not None), None)
+    all_ticks = []
+    for _, ticks in results:
+        all_ticks.extend(ticks)
+    return pool_data, all_ticks
+
+def get_ticks_by_skip(pool_address, block=None):
     skip = 0
     batch_size = 1000
-    timestamp = int(datetime.now().timestamp())
     all_ticks = []
     pool_data = None
 
     while True:
         query = """
         {
-            pool(id: "%s") {
+            pool(id: "%s"%s) {
                 id
                 tick
                 ticks(first: %d, skip: %d, orderBy: tickIdx, orderDirection: asc) {
@@ -38,7 +206,7 @@ def get_hourly_pool_data(pool_address):
                 }
             }
         }
-        """ % (pool_address, batch_size, skip)
+        """ % (pool_address, block_filter(block), batch_size, skip)
 
         try:
             response = requests.post(
@@ -60,7 +228,6 @@ def get_hourly_pool_data(pool_address):
                     break
                 tick_data = []
                 for tick in ticks:
-                    print(tick)
                     tick_data.append({
                         "tickIdx": tick['tickIdx'],
                         "liquidityNet": tick['liquidityNet']
@@ -68,10 +235,22 @@ def get_hourly_pool_data(pool_address):
                 all_ticks.extend(tick_data)
                 skip += batch_size
                 
+            else:
+                print(f"Error: status {response.status_code}")
+                break
+                
         except Exception as e:
             print(f"Error: {e}")
             break
-    
+
+    return pool_data, all_ticks
+
+def write_snapshot(pool_data, all_ticks, timestamp, block=None, archive=True):
+    """
+    Writes the snapshot CSV and registers it in the catalog. With archive the snapshot is
+    also added to the pool's archive, if it has one; backfill archives its snapshots in
+    batches instead. Returns the CSV path and the snapshot DataFrame.
+    """
     df = pd.DataFrame(all_ticks)
     
     df['timestamp'] = timestamp
@@ -79,17 +258,116 @@ def get_hourly_pool_data(pool_address):
     df['pool_id'] = pool_data['id']
     
     df['tickIdx'] = df['tickIdx'].astype(int)
-    df['liquidityNet'] = df['liquidityNet'].apply(Decimal)
     df = df.sort_values('tickIdx')
-    df['cumulative_liquidity'] = df['liquidityNet'].cumsum()
+    df['cumulative_liquidity'] = wideInt.to_strings(wideInt.cumsum(wideInt.parse(df['liquidityNet'])))
     
     filename = f"liquidity_data_{timestamp}.csv"
     filepath = os.path.join(OUTPUT_DIR, filename)
     df.to_csv(filepath, index=False)
     print(f"Data saved to {filepath}")
+    register_snapshot(filepath, df, block)
+    if archive and ARCHIVE_PATH:
+        append_snapshots(ARCHIVE_PATH, [df])
+        print(f"Snapshot archived to {ARCHIVE_PATH}")
+    return filepath, df
+
+def get_hourly_pool_data(pool_address, fetch_mode="range"):
+    timestamp = int(datetime.now().timestamp())
+    block = None
+
+    if fetch_mode == "range":
+        try:
+            # Pin every page to one indexed block so the snapshot is consistent
+            block = get_indexed_block()['number']
+            pool_data, all_ticks = get_ticks_by_range(pool_address, block=block)
+        except Exception as e:
+            print(f"Error: {e}")
+            return
+    else:
+        pool_data, all_ticks = get_ticks_by_skip(pool_address)
+
+    if pool_data is None or not all_ticks:
+        # Nothing to build a distribution from; the next run takes a fresh snapshot
+        print(f"No ticks returned for pool {pool_address}, snapshot at {timestamp} skipped")
+        return
+    write_snapshot(pool_data, all_ticks, timestamp, block)
+
+def get_block_snapshot(pool_address, block, num_ranges=NUM_TICK_RANGES, archive=True):
+    """
+    Takes a snapshot of the pool as of the given block, stamped with the block's
+    timestamp instead of the time it was fetched. Returns write_snapshot's
+    (filepath, DataFrame), or None when the pool had no ticks.
+    """
+    block_info = get_indexed_block(block)
+    pool_data, all_ticks = get_ticks_by_range(pool_address, num_ranges=num_ranges, block=block,
+                                              timestamp=block_info['timestamp'])
+    if not all_ticks:
+        return None
+    return write_snapshot(pool_data, all_ticks, block_info['timestamp'], block, archive)
+
+def load_checkpoint(checkpoint_file=CHECKPOINT_FILE):
+    completed = set()
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    completed.add(int(line))
+    return completed
+
+def backfill(pool_address, start_block, end_block, step, workers=BACKFILL_WORKERS, checkpoint_file=CHECKPOINT_FILE):
+    """
+    Writes one snapshot every `step` blocks from start_block to end_block (inclusive),
+    fetching several blocks in parallel. The snapshots are archived from this thread in
+    batches of ARCHIVE_BATCH, one archive rewrite per batch. Blocks whose snapshot was
+    written (and archived) are appended to the checkpoint file, so rerunning the same
+    command resumes an interrupted backfill and retries failed or empty blocks.
+    """
+    completed = load_checkpoint(checkpoint_file)
+    blocks = [b for b in range(start_block, end_block + 1, step) if b not in completed]
+    print(f"Backfilling {len(blocks)} blocks ({len(completed)} already done)")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(checkpoint_file, 'a') as checkpoint:
+        futures = {executor.submit(get_block_snapshot, pool_address, b, archive=False): b for b in blocks}
+        pending = []
+        for future in as_completed(futures):
+            block = futures[future]
+            try:
+                snapshot = future.result()
+            except Exception as e:
+                print(f"Error at block {block}: {e}")
+                continue
+            if snapshot is None:
+                # Possibly a transient empty response, so the block is left for the next run
+                print(f"No ticks at block {block}, not checkpointed")
+                continue
+            pending.append((block, snapshot[1]))
+            if not ARCHIVE_PATH or len(pending) >= ARCHIVE_BATCH:
+                archive_batch(pending, checkpoint)
+        archive_batch(pending, checkpoint)
+
+def archive_batch(pending, checkpoint):
+    # Archives the (block, DataFrame) snapshots in one append, then checkpoints their blocks
+    if ARCHIVE_PATH and pending:
+        append_snapshots(ARCHIVE_PATH, [df for _, df in pending])
+        print(f"{len(pending)} snapshots archived to {ARCHIVE_PATH}")
+    for block, _ in pending:
+        checkpoint.write(f"{block}\n")
+    checkpoint.flush()
+    pending.clear()
 
 def main():
-    get_hourly_pool_data(POOL_ADDRESS)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backfill', nargs=2, type=int, metavar=('START_BLOCK', 'END_BLOCK'),
+                        help="take block-pinned snapshots over a block range instead of a live one")
+    parser.add_argument('--step', type=int, default=900, help="blocks between backfilled snapshots")
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help="blocks fetched in parallel")
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill(POOL_ADDRESS, args.backfill[0], args.backfill[1], args.step, workers=args.workers)
+    else:
+        get_hourly_pool_data(POOL_ADDRESS)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
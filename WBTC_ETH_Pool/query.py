@@ -1,12 +1,23 @@
 import requests # type: ignore
 import json
 import os
+import time
+import argparse
 from web3 import Web3 # type: ignore
 from dotenv import load_dotenv # type: ignore
 from datetime import datetime
 import pytz # type: ignore
 import pandas as pd # type: ignore
+import numpy as np # type: ignore
 import csv
+import sqlite3
+from collections import OrderedDict
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from eventDecoder import decode_log_page
+from eventStore import append_events, read_events, rollback_events
+from liquidityReplay import build_checkpoints, liquidity_at, write_distribution_csv
+import wideInt
 
 # Load environment variables
 load_dotenv()
@@ -34,16 +45,164 @@ value_decimals = 18
 
 pool_contract = w3.eth.contract(address=pool_address, abi=pool_abi)
 
-def get_pool_data():
-    # Get the current state of the pool
-    slot0 = pool_contract.functions.slot0().call()
+# Bounds of the Uniswap V3 tick domain
+MIN_TICK = -887272
+MAX_TICK = 887272
+
+# Max requests per JSON-RPC batch array; providers reject or throttle very large batches
+RPC_BATCH_SIZE = 100
+
+# Rate limits, server errors and dropped connections are retried with a doubling backoff
+RPC_MAX_RETRIES = 5
+RPC_BACKOFF = 1
+RPC_MAX_BACKOFF = 30
+RPC_REQUEST_TIMEOUT = 30
+RPC_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Pool functions by name, used to encode and decode raw eth_call data
+pool_functions = {entry['name']: entry for entry in pool_abi if entry.get('type') == 'function'}
+
+def post_rpc(payload):
+    """
+    Posts a JSON-RPC request or batch array and returns the decoded response. HTTP 429
+    and 5xx responses, rate-limit errors, dropped connections and bodies that are not
+    JSON (an HTML error page) are retried with backoff; other HTTP errors raise at once.
+    Raises RuntimeError once the retries run out.
+    """
+    delay = RPC_BACKOFF
+    for attempt in range(RPC_MAX_RETRIES + 1):
+        try:
+            response = requests.post(url, data=json.dumps(payload), headers={'content-type': 'application/json'},
+                                     timeout=RPC_REQUEST_TIMEOUT)
+            if response.status_code not in RPC_RETRY_STATUS:
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+                body = response.json()
+                if not (isinstance(body, dict) and 'error' in body and is_rate_limit_error(body['error'])):
+                    return body
+                error = body['error']
+            else:
+                error = f"HTTP {response.status_code}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = e
+        if attempt == RPC_MAX_RETRIES:
+            raise RuntimeError(f"RPC request failed after {RPC_MAX_RETRIES} retries: {error}")
+        print(f"RPC request failed ({error}), retrying in {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, RPC_MAX_BACKOFF)
+
+def rpc_request(method, params):
+    payload = {
+        "jsonrpc": "2.0",
+        "method": method,
+        "params": params,
+        "id": 1
+    }
+    response = post_rpc(payload)
+    if 'error' in response:
+        raise RuntimeError(f"{method} failed: {response['error']}")
+    return response['result']
+
+def rpc_batch(calls, batch_size=RPC_BATCH_SIZE, skip_failures=False):
+    """
+    Sends (method, params) calls as JSON-RPC batch arrays of up to batch_size requests
+    and returns their results in order. Items that come back with an error, and whole
+    batches the provider rejects, are retried as single requests. With skip_failures an
+    item whose single request still fails is None in the results instead of raising.
+    """
+    results = []
+    for start in range(0, len(calls), batch_size):
+        chunk = calls[start:start + batch_size]
+        payload = [{
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": i
+        } for i, (method, params) in enumerate(chunk)]
+
+        responses = {}
+        try:
+            response = post_rpc(payload)
+            if isinstance(response, list):
+                responses = {item.get('id'): item for item in response}
+            else:
+                print(f"Batch request rejected, falling back to single calls: {response}")
+        except Exception as e:
+            print(f"Batch request failed, falling back to single calls: {e}")
+
+        for i, (method, params) in enumerate(chunk):
+            item = responses.get(i)
+            if item is not None and 'result' in item and 'error' not in item:
+                results.append(item['result'])
+                continue
+            try:
+                results.append(rpc_request(method, params))
+            except RuntimeError as e:
+                if not skip_failures:
+                    raise
+                print(f"{method} {params} failed, skipped: {e}")
+                results.append(None)
+    return results
+
+def encode_pool_call(fn_name, args=()):
+    input_types = [i['type'] for i in pool_functions[fn_name]['inputs']]
+    selector = bytes(w3.keccak(text=f"{fn_name}({','.join(input_types)})")[:4])
+    return "0x" + (selector + w3.codec.encode(input_types, list(args))).hex()
+
+def call_pool_functions(calls, block='latest', batch_size=RPC_BATCH_SIZE, skip_failures=False):
+    """
+    Runs (fn_name, args) reads against the pool contract as batched eth_calls pinned
+    to one block, and returns each decoded output tuple in order; with skip_failures a
+    read that keeps failing is None instead of failing the whole call.
+    """
+    rpc_calls = [
+        ("eth_call", [{"to": pool_address, "data": encode_pool_call(fn_name, args)}, block])
+        for fn_name, args in calls
+    ]
+    outputs = []
+    for (fn_name, _), result in zip(calls, rpc_batch(rpc_calls, batch_size, skip_failures)):
+        if result is None:
+            outputs.append(None)
+            continue
+        output_types = [o['type'] for o in pool_functions[fn_name]['outputs']]
+        outputs.append(w3.codec.decode(output_types, bytes.fromhex(result[2:])))
+    return outputs
+
+def get_initialized_ticks(min_tick, max_tick, tick_spacing, block='latest', batch_size=RPC_BATCH_SIZE):
+    """
+    Reads tickBitmap words covering [min_tick, max_tick] and returns the initialized
+    ticks in ascending order. Each word holds 256 compressed ticks (tick // tick_spacing),
+    so this costs one call per word instead of one call per spaced tick.
+    """
+    min_compressed = min_tick // tick_spacing
+    max_compressed = max_tick // tick_spacing
+    word_positions = range(min_compressed >> 8, (max_compressed >> 8) + 1)
+    # A word that cannot be read only loses its own ticks, as a failed tick did in the per-tick loop
+    words = call_pool_functions([("tickBitmap", (word_pos,)) for word_pos in word_positions], block, batch_size,
+                                skip_failures=True)
+
+    initialized_ticks = []
+    for word_pos, output in zip(word_positions, words):
+        word = output[0] if output is not None else 0
+        while word:
+            # Lowest set bit first keeps ticks in ascending order
+            bit_pos = (word & -word).bit_length() - 1
+            word &= word - 1
+            compressed = word_pos * 256 + bit_pos
+            if min_compressed <= compressed <= max_compressed:
+                initialized_ticks.append(compressed * tick_spacing)
+    return initialized_ticks
+
+def get_pool_data(discovery="bitmap", full_range=False, batch_size=RPC_BATCH_SIZE):
+    # Pin every read to one block so the snapshot is consistent
+    block = hex(w3.eth.block_number)
+
+    # Get the current state of the pool, fee tier and tick spacing in one batch
+    slot0, (fee,), (tick_spacing,) = call_pool_functions(
+        [("slot0", ()), ("fee", ()), ("tickSpacing", ())], block, batch_size)
     sqrtPriceX96 = slot0[0]
     current_tick = slot0[1] # will have to modify later to be a multiple of the tick spacing 
     
-    # Get the fee tier and tick spacing from the pool contract
-    fee = pool_contract.functions.fee().call()
-    tick_spacing = pool_contract.functions.tickSpacing().call()
-    
     # Convert fee to percentage
     fee_percent = fee / 1e4  # Fee is returned in hundredths of a bip
     
@@ -56,32 +215,35 @@ def get_pool_data():
     
     # Define a reasonable tick range around the adjusted tick
     tick_range_multiplier = 1000
-    min_tick = adjusted_tick - (tick_range_multiplier * tick_spacing)
-    max_tick = adjusted_tick + (tick_range_multiplier * tick_spacing)
-    
-    # Initialize a list to store liquidity data
-    liquidity_data = []
-    
-    # Loop through ticks in the specified range
-    for tick in range(min_tick, max_tick + tick_spacing, tick_spacing):
-        try:
-            tick_data = pool_contract.functions.ticks(tick).call()
-            liquidity_gross = int(tick_data[0])
-            liquidity_net = int(tick_data[1])
-            if liquidity_gross > 0 or liquidity_net != 0:
-                liquidity_data.append({
-                    'tickIdx': tick,
-                    'liquidityGross': liquidity_gross,
-                    'liquidityNet': liquidity_net
-                })
-        except Exception:
-            continue
+    if full_range:
+        min_tick = MIN_TICK
+        max_tick = MAX_TICK
+    else:
+        min_tick = adjusted_tick - (tick_range_multiplier * tick_spacing)
+        max_tick = adjusted_tick + (tick_range_multiplier * tick_spacing)
     
-    # Create DataFrame with explicit data types
-    df = pd.DataFrame(liquidity_data).astype({
-        'tickIdx': 'int64',
-        'liquidityGross': 'int64',
-        'liquidityNet': 'int64'
+    if discovery == "bitmap":
+        # Only query ticks the bitmap marks as initialized
+        ticks = get_initialized_ticks(min_tick, max_tick, tick_spacing, block, batch_size)
+    else:
+        # Query every spaced tick in the specified range
+        ticks = list(range(min_tick, max_tick + tick_spacing, tick_spacing))
+
+    # Ticks whose read keeps failing are skipped and the snapshot carries on, as the per-tick loop did
+    tick_results = call_pool_functions([("ticks", (tick,)) for tick in ticks], block, batch_size, skip_failures=True)
+    ticks = [tick for tick, tick_data in zip(ticks, tick_results) if tick_data is not None]
+    tick_results = [tick_data for tick_data in tick_results if tick_data is not None]
+
+    # liquidityGross / liquidityNet are uint128 / int128, so they are held as exact wide
+    # integers rather than int64, which overflows on large positions
+    gross = wideInt.from_ints([tick_data[0] for tick_data in tick_results])
+    net = wideInt.from_ints([tick_data[1] for tick_data in tick_results])
+    initialized = ~wideInt.is_zero(gross) | ~wideInt.is_zero(net)
+
+    df = pd.DataFrame({
+        'tickIdx': np.array(ticks, dtype=np.int64)[initialized],
+        'liquidityGross': wideInt.to_strings(gross[initialized]),
+        'liquidityNet': wideInt.to_strings(net[initialized])
     })
     
     if not df.empty:
@@ -98,11 +260,53 @@ def get_pool_data():
                   quoting=csv.QUOTE_MINIMAL)
 
 
-def get_swap_data(start_block, end_block):
-    # Define the Swap event signature (keccak hash)
-    swap_event_signature = "Swap(address,address,int256,int256,uint160,uint128,int24)"
-    swap_event_signature_hash = "0x" + w3.keccak(text=swap_event_signature).hex() #Need to put into hexadecimal format
+# Adaptive eth_getLogs chunking: grow while responses are light, halve on provider limits
+INITIAL_LOG_CHUNK = 1250
+MAX_LOG_CHUNK = 50000
+LOG_GROW_THRESHOLD = 2000
+LOG_REQUEST_TIMEOUT = 30
+# Provider messages for a range or result set that is too large: these split the chunk
+LOG_LIMIT_ERRORS = ("query returned more than", "more than 10000 results", "response size exceeded",
+                    "response size is larger", "block range", "range too large", "range is too large",
+                    "too many logs", "too many results", "query timeout", "timed out")
+# Rate limiting: the same chunk is retried after a backoff instead of being split
+LOG_RATE_LIMIT_ERRORS = ("rate limit", "rate-limit", "too many requests", "request count exceeded",
+                         "compute units", "capacity exceeded")
+LOG_MAX_RETRIES = 8
+LOG_BACKOFF = 1
+LOG_MAX_BACKOFF = 60
+LOG_CHECKPOINT_FILE = os.path.join("outputFiles", "log_scan_checkpoint.json")
+
+# Parquet event store partitioned by pool, event and block range
+EVENT_STORE_DIR = os.path.join("outputFiles", "eventStore")
+
+# Replay checkpoints for reconstructing liquidity from Mint/Burn history
+REPLAY_CHECKPOINT_DIR = os.path.join("outputFiles", "liquidityCheckpoints")
+REPLAY_OUTPUT_DIR = os.path.join("outputFiles", "liquidityReplayCSV")
+# Blocks before the target first searched for the last swap, about a day; doubled until one is found
+CURRENT_TICK_WINDOW = 7200
+
+# Block timestamps are cached in memory (LRU) and on disk, shared by every script that points at the same file
+BLOCK_CACHE_SIZE = 100000
+BLOCK_CACHE_FILE = os.getenv('block_timestamp_cache_path') or os.path.join("outputFiles", "block_timestamps.sqlite")
+block_timestamps = OrderedDict()
+block_cache_db = None
 
+# Live indexing: poll interval in seconds, and how deep a block must be before it is treated as final
+POLL_INTERVAL = 12
+CONFIRMATION_DEPTH = 12
+LIVE_STATE_FILE = os.path.join("outputFiles", "live_index_state.json")
+
+# Event signatures (keccak hashes) used as topic0 filters
+swap_event_signature_hash = "0x" + w3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)").hex() #Need to put into hexadecimal format
+mint_event_signature_hash = "0x" + w3.keccak(text="Mint(address,address,int24,int24,uint128,uint256,uint256)").hex()
+burn_event_signature_hash = "0x" + w3.keccak(text="Burn(address,int24,int24,uint128,uint256,uint256)").hex()
+
+def get_logs(start_block, end_block, topic_hashes):
+    """
+    Queries the pool's logs in a block range whose topic0 is any of topic_hashes
+    (a single OR-topic filter) and returns the raw eth_getLogs response.
+    """
     # Create the payload to filter logs
     log_payload = {
         "jsonrpc": "2.0",
@@ -111,48 +315,167 @@ def get_swap_data(start_block, end_block):
             "fromBlock": hex(start_block),  # Properly format to hex
             "toBlock": hex(end_block),      # Properly format to hex
             "address": pool_address,
-            "topics": [swap_event_signature_hash]
+            "topics": [topic_hashes]
         }],
         "id": 1
     }
 
     # Query the logs
-    log_response = requests.post(url, data=json.dumps(log_payload), headers={'content-type': 'application/json'}).json()
+    response = requests.post(url, data=json.dumps(log_payload), headers={'content-type': 'application/json'},
+                             timeout=LOG_REQUEST_TIMEOUT)
+    # A 429 body is often not JSON-RPC at all, so report it as an error callers already check for
+    if response.status_code == 429:
+        return {'error': {'code': 429, 'message': f"Too Many Requests: {response.text[:200]}"}}
+    return response.json()
+
+def get_transactions(transaction_hashes, batch_size=RPC_BATCH_SIZE):
+    """
+    Fetches each unique transaction once, in JSON-RPC batches, and returns
+    {transaction_hash: {'gas', 'gasPrice', 'value'}} with integer values. A transaction the
+    node returns as null (not yet indexed, or lagging behind the logs) is asked for once more
+    on its own and left out of the result if it is still null.
+    """
+    unique_hashes = list(dict.fromkeys(transaction_hashes))
+    results = rpc_batch([("eth_getTransactionByHash", [h]) for h in unique_hashes], batch_size)
+    transactions = {}
+    for transaction_hash, transaction in zip(unique_hashes, results):
+        if transaction is None:
+            transaction = rpc_request("eth_getTransactionByHash", [transaction_hash])
+        if transaction is None:
+            print(f"Transaction {transaction_hash} not found, its rows are left without gas and value")
+            continue
+        transactions[transaction_hash] = {
+            'gas': int(transaction['gas'], 16),
+            'gasPrice': int(transaction['gasPrice'], 16),
+            'value': int(transaction['value'], 16),
+        }
+    return transactions
+
+def prefetch_log_page(logs, enrich=True):
+    """
+    Batches the lookups a page of logs needs: block timestamps always, transactions only
+    when enriching. Returns the transactions by hash, or None when enrich is False.
+    """
+    prefetch_log_timestamps(logs)
+    if not enrich:
+        return None
+    return get_transactions(log['transactionHash'] for log in logs)
+
+def transaction_details(transaction_data):
+    if transaction_data is None:
+        return {'gas': None, 'gasPrice': None, 'gasPriceAdjusted': None}
+    return {
+        'gas': transaction_data['gas'],
+        'gasPrice': transaction_data['gasPrice'],
+        'gasPriceAdjusted': transaction_data['gasPrice'] / (10 ** gas_decimals),
+    }
+
+def swap_rows(columns, transactions=None):
+    # One row per Swap from decode_log_page's Swap columns
+    swap_data = []
+    for transaction_hash, block_number, log_index, sender, recipient, amount0, amount1, tick in zip(
+            columns['transactionHash'], columns['blockNumber'].tolist(), columns['logIndex'].tolist(),
+            columns['sender'], columns['recipient'], columns['amount0'], columns['amount1'], columns['tick'].tolist()):
+        # Create a dictionary to hold transaction details
+        swap_info = {
+            'transaction_hash': transaction_hash,
+            'sender': sender,
+            'recipient': recipient,
+        }
+        # Gas and value come from the transaction, only fetched when enriching
+        if transactions is not None:
+            transaction_data = transactions.get(transaction_hash)
+            swap_info.update(transaction_details(transaction_data))
+            swap_info['value'] = None if transaction_data is None else transaction_data['value'] / (10 ** value_decimals)
+        swap_info.update({
+            'WBTCTokens': amount0,
+            'ETHTokens': amount1,
+            'WBTCTokensAdjusted': amount0/(10 ** wbtc_decimals),
+            'ETHTokensAdjusted': amount1/(10 ** eth_decimals),
+            'tick': tick,
+            'block': block_number,
+            'logIndex': log_index,
+            'timestamp': get_block_timestamp(block_number),
+        })
+        swap_data.append(swap_info)
+    return swap_data
+
+def mint_rows(columns, transactions=None):
+    # One row per Mint from decode_log_page's Mint columns
+    provider_data = []
+    for transaction_hash, block_number, log_index, sender, amount, amount0, amount1, tick_lower, tick_upper in zip(
+            columns['transactionHash'], columns['blockNumber'].tolist(), columns['logIndex'].tolist(),
+            columns['sender'], columns['amount'],
+            columns['amount0'], columns['amount1'], columns['tickLower'].tolist(), columns['tickUpper'].tolist()):
+        provider_info = {
+            'transaction_hash': transaction_hash,
+            'provider': sender,
+        }
+        if transactions is not None:
+            provider_info.update(transaction_details(transactions.get(transaction_hash)))
+        provider_info.update({
+            'amount': amount,
+            'WBTCTokens': amount0,
+            'ETHTokens': amount1,
+            'WBTCTokensAdjusted': amount0/(10 ** wbtc_decimals),
+            'ETHTokensAdjusted': amount1/(10 ** eth_decimals),
+            'block': block_number,
+            'logIndex': log_index,
+            'timestamp': get_block_timestamp(block_number),
+            'lowerTick': tick_lower,
+            'upperTick': tick_upper
+        })
+        provider_data.append(provider_info)
+    return provider_data
+
+def burn_rows(columns, transactions=None):
+    # One row per Burn from decode_log_page's Burn columns
+    burn_data = []
+    for transaction_hash, block_number, log_index, owner, amount, amount0, amount1, tick_lower, tick_upper in zip(
+            columns['transactionHash'], columns['blockNumber'].tolist(), columns['logIndex'].tolist(),
+            columns['owner'], columns['amount'],
+            columns['amount0'], columns['amount1'], columns['tickLower'].tolist(), columns['tickUpper'].tolist()):
+        burn_info = {
+            'transaction_hash': transaction_hash,
+            'provider': owner, #references owner
+        }
+        if transactions is not None:
+            burn_info.update(transaction_details(transactions.get(transaction_hash)))
+        burn_info.update({
+            'amount': amount,
+            'WBTCTokens': -amount0,
+            'ETHTokens': -amount1,
+            'WBTCTokensAdjusted': -amount0/(10 ** wbtc_decimals),
+            'ETHTokensAdjusted': -amount1/(10 ** eth_decimals),
+            'block': block_number,
+            'logIndex': log_index,
+            'timestamp': get_block_timestamp(block_number),
+            'lowerTick': tick_lower,
+            'upperTick': tick_upper
+        })
+        burn_data.append(burn_info)
+    return burn_data
+
+def decode_swap_log(log, transactions=None):
+    return swap_rows(decode_log_page([log])['Swap'], transactions)[0]
+
+def decode_mint_log(log, transactions=None):
+    return mint_rows(decode_log_page([log])['Mint'], transactions)[0]
+
+def decode_burn_log(log, transactions=None):
+    return burn_rows(decode_log_page([log])['Burn'], transactions)[0]
+
+def get_swap_data(start_block, end_block, enrich=True):
+    log_response = get_logs(start_block, end_block, [swap_event_signature_hash])
 
     swap_data_list = [] 
     
     if 'result' in log_response and log_response['result']:
-        
+        transactions = prefetch_log_page(log_response['result'], enrich)
 
         # Process and decode each log entry
         for log in log_response['result']:
-            transaction_hash = log['transactionHash']
-
-            # Decode log entry
-            decoded_event = pool_contract.events.Swap().process_log(log)
-
-            # Get the full transaction data using the transaction hash
-            transaction_data = w3.eth.get_transaction(transaction_hash)
-            
-            # Create a dictionary to hold transaction details
-            transaction_details = {
-                'transaction_hash': transaction_hash,
-                'sender': decoded_event['args']['sender'],
-                'recipient': decoded_event['args']['recipient'],
-                'gas': transaction_data['gas'],
-                'gasPrice': transaction_data['gasPrice'],
-                'gasPriceAdjusted': transaction_data['gasPrice'] / (10 ** gas_decimals),
-                'value': transaction_data['value'] / (10 ** value_decimals),
-                'WBTCTokens': decoded_event['args']['amount0'],
-                'ETHTokens': decoded_event['args']['amount1'],
-                'WBTCTokensAdjusted': decoded_event['args']['amount0']/(10 ** wbtc_decimals),
-                'ETHTokensAdjusted': decoded_event['args']['amount1']/(10 ** eth_decimals),
-                'block': transaction_data['blockNumber'],
-                'timestamp': get_block_timestamp(transaction_data['blockNumber']),
-            }
-
-            # Append the transaction details to the list
-            swap_data_list.append(transaction_details)
+            swap_data_list.append(decode_swap_log(log, transactions))
             
     else:
         print("Error retrieving logs:", log_response)
@@ -160,57 +483,16 @@ def get_swap_data(start_block, end_block):
 
     return swap_data_list
 
-def get_provider_data(start_block, end_block):
-    # Define the Mint event signature (keccak hash)
-    mint_event_signature = "Mint(address,address,int24,int24,uint128,uint256,uint256)"
-    mint_event_signature_hash = "0x" + w3.keccak(text=mint_event_signature).hex()
-
-    # Create the payload to filter logs
-    log_payload = {
-        "jsonrpc": "2.0",
-        "method": "eth_getLogs",
-        "params": [{
-            "fromBlock": hex(start_block),
-            "toBlock": hex(end_block),
-            "address": pool_address,
-            "topics": [mint_event_signature_hash]
-        }],
-        "id": 1
-    }
-
-    # Query the logs
-    log_response = requests.post(url, data=json.dumps(log_payload), headers={'content-type': 'application/json'}).json()
+def get_provider_data(start_block, end_block, enrich=True):
+    log_response = get_logs(start_block, end_block, [mint_event_signature_hash])
 
     provider_data = []
     if 'result' in log_response and log_response['result']:
-        # Create a contract instance
+        transactions = prefetch_log_page(log_response['result'], enrich)
 
         # Process and decode each log entry
         for log in log_response['result']:
-            transaction_hash = log['transactionHash']
-            
-            # Decode log entry
-            decoded_event = pool_contract.events.Mint().process_log(log)
-
-            # Get the full transaction data
-            transaction_data = w3.eth.get_transaction(transaction_hash)
-            provider_info = {
-                'transaction_hash': transaction_hash,
-                'provider': decoded_event['args']['sender'],
-                'gas': transaction_data['gas'],
-                'gasPrice': transaction_data['gasPrice'],
-                'gasPriceAdjusted': transaction_data['gasPrice'] / (10 ** gas_decimals),
-                'amount': decoded_event['args']['amount'],
-                'WBTCTokens': decoded_event['args']['amount0'],
-                'ETHTokens': decoded_event['args']['amount1'],
-                'WBTCTokensAdjusted': decoded_event['args']['amount0']/(10 ** wbtc_decimals),
-                'ETHTokensAdjusted': decoded_event['args']['amount1']/(10 ** eth_decimals),
-                'block': transaction_data.blockNumber,
-                'timestamp': get_block_timestamp(transaction_data['blockNumber']),
-                'lowerTick': decoded_event['args']['tickLower'],
-                'upperTick': decoded_event['args']['tickUpper']
-            }
-            provider_data.append(provider_info)
+            provider_data.append(decode_mint_log(log, transactions))
 
     else:
         print("No Mint events found in the specified block range.")
@@ -218,62 +500,195 @@ def get_provider_data(start_block, end_block):
 
     return provider_data
 
-def get_burn_data(start_block, end_block):
-
-    burn_event_signature = "Burn(address,int24,int24,uint128,uint256,uint256)"
-    burn_event_signature_hash = "0x" + w3.keccak(text=burn_event_signature).hex()
-    
-    log_payload = {
-        "jsonrpc": "2.0",
-        "method": "eth_getLogs",
-        "params": [{
-            "fromBlock": hex(start_block),
-            "toBlock": hex(end_block),
-            "address": pool_address,
-            "topics": [burn_event_signature_hash]
-        }],
-        "id": 1
-    }
-    log_response = requests.post(url, data=json.dumps(log_payload), headers={'content-type': 'application/json'}).json()
+def get_burn_data(start_block, end_block, enrich=True):
+    log_response = get_logs(start_block, end_block, [burn_event_signature_hash])
     burn_data = []
     if 'result' in log_response and log_response['result']:
+        transactions = prefetch_log_page(log_response['result'], enrich)
 
         # Process and decode each log entry
         for log in log_response['result']:
-            transaction_hash = log['transactionHash']
-
-            decoded_event = pool_contract.events.Burn().process_log(log)
-
-            transaction_data = w3.eth.get_transaction(transaction_hash)
-            
-            burn_info = {
-                'transaction_hash': transaction_hash,
-                'provider': decoded_event['args']['owner'], #references owner
-                'gas': transaction_data['gas'],
-                'gasPrice': transaction_data['gasPrice'],
-                'gasPriceAdjusted': transaction_data['gasPrice'] / (10 ** gas_decimals),
-                'amount': decoded_event['args']['amount'],
-                'WBTCTokens': -decoded_event['args']['amount0'],
-                'ETHTokens': -decoded_event['args']['amount1'],
-                'WBTCTokensAdjusted': -decoded_event['args']['amount0']/(10 ** wbtc_decimals),
-                'ETHTokensAdjusted': -decoded_event['args']['amount1']/(10 ** eth_decimals),
-                'block': transaction_data.blockNumber,
-                'timestamp': get_block_timestamp(transaction_data['blockNumber']),
-                'lowerTick': decoded_event['args']['tickLower'],
-                'upperTick': decoded_event['args']['tickUpper']
-            }
-            burn_data.append(burn_info)
+            burn_data.append(decode_burn_log(log, transactions))
 
     else:
         print("No Burn events found in the specified block range.")
 
     return burn_data
 
-def get_liquidity_provider_data(start_block, end_block):
-    provider_data = get_provider_data(start_block, end_block)
-    burn_data = get_burn_data(start_block, end_block)
+def record_logs(start_block, end_block, filepath, events=("Swap", "Mint", "Burn")):
+    # Saves raw logs for replaying through eventDecoder.py's benchmark
+    log_response = get_logs(start_block, end_block, get_event_topics(events))
+    with open(filepath, 'w') as f:
+        json.dump(log_response.get('result', []), f)
+
+def get_event_topics(events):
+    topics = {
+        "Swap": swap_event_signature_hash,
+        "Mint": mint_event_signature_hash,
+        "Burn": burn_event_signature_hash,
+    }
+    return [topics[event] for event in events]
+
+def decode_pool_logs(logs, enrich=True):
+    """
+    Decodes the page into columns by topic0 in one pass and returns
+    (swap_data, provider_data, burn_data). With enrich=False the rows
+    skip the transaction lookups and only carry event and block fields.
+    """
+    transactions = prefetch_log_page(logs, enrich)
+    columns = decode_log_page(logs)
+    return (swap_rows(columns['Swap'], transactions), mint_rows(columns['Mint'], transactions),
+            burn_rows(columns['Burn'], transactions))
+
+def get_pool_events(start_block, end_block, events=("Swap", "Mint", "Burn"), enrich=True):
+    """
+    Scans the block range once for all requested events with a single OR-topic
+    eth_getLogs filter. Returns (swap_data, provider_data, burn_data).
+    """
+    log_response = get_logs(start_block, end_block, get_event_topics(events))
+    if 'result' in log_response:
+        return decode_pool_logs(log_response['result'], enrich)
+
+    print("Error retrieving logs:", log_response)
+    return [], [], []
+
+def is_rate_limit_error(error):
+    message = str(error).lower()
+    return any(text in message for text in LOG_RATE_LIMIT_ERRORS)
+
+def is_log_limit_error(error):
+    # Rate limits are checked first: their messages can also mention "exceeded" or "limit"
+    if is_rate_limit_error(error):
+        return False
+    message = str(error).lower()
+    # A read timeout means the node took too long over the range; a connect timeout says
+    # nothing about the range, so it is retried as is
+    return isinstance(error, requests.exceptions.ReadTimeout) or any(text in message for text in LOG_LIMIT_ERRORS)
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_ranges(start_block, end_block, completed):
+    # Gaps of [start_block, end_block] not yet covered by the completed ranges
+    gaps = []
+    block = start_block
+    for done_start, done_end in merge_ranges(completed):
+        if done_end < block:
+            continue
+        if done_start > end_block:
+            break
+        if done_start > block:
+            gaps.append((block, done_start - 1))
+        block = done_end + 1
+    if block <= end_block:
+        gaps.append((block, end_block))
+    return gaps
+
+def scan_key(events, sink, enrich=True):
+    # Completed ranges only count for the same events going to the same named sink, with or
+    # without the transaction details
+    return ",".join(sorted(events)) + "->" + sink + ("" if enrich else " (unenriched)")
+
+def load_scan_checkpoint(checkpoint_file, key=None):
+    if not os.path.exists(checkpoint_file):
+        return {} if key is None else []
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+    scans = checkpoint.get('scans', {})
+    # Checkpoints from before scans were keyed came from the default scan into the event store
+    if 'completed' in checkpoint:
+        scans.setdefault(scan_key(("Swap", "Mint", "Burn"), "eventStore"), checkpoint['completed'])
+    if key is None:
+        return scans
+    return [tuple(r) for r in scans.get(key, [])]
+
+def save_scan_checkpoint(checkpoint_file, key, completed):
+    # Other scans sharing the file keep their ranges
+    scans = load_scan_checkpoint(checkpoint_file)
+    scans[key] = [list(r) for r in completed]
+    # Write then rename so an interrupted save never leaves a corrupt checkpoint
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump({'scans': scans}, f)
+    os.replace(tmp_file, checkpoint_file)
+
+def scan_logs(start_block, end_block, on_chunk=None, events=("Swap", "Mint", "Burn"),
+              checkpoint_file=LOG_CHECKPOINT_FILE, enrich=True, sink=None):
+    """
+    Scans [start_block, end_block] with eth_getLogs in adaptively sized chunks: the chunk
+    doubles while responses stay small and is halved when the provider reports too many
+    results or times out. Rate limits, dropped connections and unreadable responses retry the
+    same chunk with exponential backoff. Each chunk's decoded events go to on_chunk(from_block,
+    to_block, swap_data, provider_data, burn_data) before the chunk is recorded in the
+    checkpoint under the events, sink and enrich, so rerunning the same scan only covers the
+    blocks that are still missing. sink names one of SCAN_SINKS (the event store by default);
+    a custom on_chunk needs a sink name of its own to key its checkpoint.
+    """
+    if on_chunk is None:
+        sink = sink or "eventStore"
+        on_chunk = SCAN_SINKS[sink]
+    elif sink is None:
+        raise ValueError("scan_logs needs a sink name to checkpoint a custom on_chunk under")
+    os.makedirs(os.path.dirname(checkpoint_file) or ".", exist_ok=True)
+    key = scan_key(events, sink, enrich)
+    completed = load_scan_checkpoint(checkpoint_file, key)
+    topic_hashes = get_event_topics(events)
+    chunk_size = INITIAL_LOG_CHUNK
+    retries = 0
+
+    for gap_start, gap_end in missing_ranges(start_block, end_block, completed):
+        block = gap_start
+        while block <= gap_end:
+            chunk_end = min(block + chunk_size - 1, gap_end)
+            try:
+                log_response = get_logs(block, chunk_end, topic_hashes)
+                error = log_response.get('error')
+            # Any transport failure, or a body that is not JSON (ValueError), is worth retrying
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log_response = None
+                error = e
+
+            if error is not None:
+                if is_log_limit_error(error) and chunk_end > block:
+                    chunk_size = max(1, (chunk_end - block + 1) // 2)
+                    print(f"Splitting blocks {block}-{chunk_end}: {error}")
+                    continue
+                # JSON-RPC errors other than limits (bad params, unknown method) will not go away
+                transient = log_response is None or is_rate_limit_error(error) or is_log_limit_error(error)
+                if transient and retries < LOG_MAX_RETRIES:
+                    delay = min(LOG_BACKOFF * 2 ** retries, LOG_MAX_BACKOFF)
+                    retries += 1
+                    print(f"Retrying blocks {block}-{chunk_end} in {delay}s ({retries}/{LOG_MAX_RETRIES}): {error}")
+                    time.sleep(delay)
+                    continue
+                raise RuntimeError(f"eth_getLogs failed for blocks {block}-{chunk_end}: {error}")
+            retries = 0
+
+            logs = log_response['result']
+            on_chunk(block, chunk_end, *decode_pool_logs(logs, enrich))
+            completed = merge_ranges(completed + [(block, chunk_end)])
+            save_scan_checkpoint(checkpoint_file, key, completed)
+            print(f"Scanned blocks {block}-{chunk_end}: {len(logs)} logs")
+
+            if len(logs) < LOG_GROW_THRESHOLD:
+                chunk_size = min(chunk_size * 2, MAX_LOG_CHUNK)
+            block = chunk_end + 1
+
+def get_liquidity_provider_data(start_block, end_block, enrich=True):
+    _, provider_data, burn_data = get_pool_events(start_block, end_block, events=("Mint", "Burn"), enrich=enrich)
+    # Mint and Burn rows share a layout, so tag them for replaying into liquidity
+    for row in provider_data:
+        row['event'] = "Mint"
+    for row in burn_data:
+        row['event'] = "Burn"
     liquidity_data = provider_data + burn_data
-    liquidity_data.sort(key=lambda x: x['block'])
+    liquidity_data.sort(key=lambda x: (x['block'], x['logIndex']))
 
     return liquidity_data
 
@@ -284,9 +699,69 @@ def process_transaction(log, pool_contract, event_name):
     transaction_data = w3.eth.get_transaction(transaction_hash)
     return decoded_event, transaction_data
 
+def get_block_cache_db():
+    global block_cache_db
+    if block_cache_db is None:
+        os.makedirs(os.path.dirname(BLOCK_CACHE_FILE) or ".", exist_ok=True)
+        block_cache_db = sqlite3.connect(BLOCK_CACHE_FILE)
+        block_cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS block_timestamps (block INTEGER PRIMARY KEY, timestamp INTEGER NOT NULL)")
+    return block_cache_db
+
+def remember_block_timestamp(block_number, unix_timestamp):
+    block_timestamps[block_number] = unix_timestamp
+    block_timestamps.move_to_end(block_number)
+    if len(block_timestamps) > BLOCK_CACHE_SIZE:
+        block_timestamps.popitem(last=False)
+
+def prefetch_block_timestamps(block_numbers, batch_size=RPC_BATCH_SIZE):
+    """
+    Makes sure every block in block_numbers has its timestamp cached: blocks missing from
+    memory are looked up on disk, and the rest are fetched in JSON-RPC batches and stored.
+    """
+    missing = sorted({int(b) for b in block_numbers if b not in block_timestamps})
+    if not missing:
+        return
+
+    db = get_block_cache_db()
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        rows = db.execute(
+            "SELECT block, timestamp FROM block_timestamps WHERE block IN (%s)" % ",".join("?" * len(chunk)),
+            chunk).fetchall()
+        for block_number, unix_timestamp in rows:
+            remember_block_timestamp(block_number, unix_timestamp)
+
+    missing = [b for b in missing if b not in block_timestamps]
+    if not missing:
+        return
+
+    blocks = rpc_batch([("eth_getBlockByNumber", [hex(b), False]) for b in missing], batch_size)
+    rows = [(block_number, int(block['timestamp'], 16)) for block_number, block in zip(missing, blocks)]
+    db.executemany("INSERT OR REPLACE INTO block_timestamps (block, timestamp) VALUES (?, ?)", rows)
+    db.commit()
+    for block_number, unix_timestamp in rows:
+        remember_block_timestamp(block_number, unix_timestamp)
+
+def forget_block_timestamps(from_block):
+    # Drops cached timestamps of reorged blocks so they are fetched again from the new chain
+    for block_number in [b for b in block_timestamps if b >= from_block]:
+        del block_timestamps[block_number]
+    db = get_block_cache_db()
+    db.execute("DELETE FROM block_timestamps WHERE block >= ?", (from_block,))
+    db.commit()
+
+def prefetch_log_timestamps(logs):
+    # One batched lookup for every block in a page of raw logs
+    prefetch_block_timestamps(int(log['blockNumber'], 16) for log in logs)
+
 def get_block_timestamp(block_number):
-    block = w3.eth.get_block(block_number)
-    unix_timestamp = block['timestamp']
+    if block_number in block_timestamps:
+        block_timestamps.move_to_end(block_number)
+    else:
+        prefetch_block_timestamps([block_number])
+    unix_timestamp = block_timestamps[block_number]
     dt_object = datetime.fromtimestamp(unix_timestamp, pytz.UTC)
     return dt_object
 
@@ -310,21 +785,273 @@ def write_liquidity_data_csv(liquidity_data, filename="liquidity_data.csv"):
     filepath = os.path.join("outputFiles", filename)
     df.to_csv(filepath, index=False)
 
+# (block, logIndex) of the rows already in each appended CSV, read once per process
+csv_keys = {}
+
+def written_csv_keys(filepath):
+    if filepath not in csv_keys:
+        keys = set()
+        if os.path.exists(filepath):
+            df = pd.read_csv(filepath, usecols=['block', 'logIndex'])
+            keys = set(zip(df['block'].tolist(), df['logIndex'].tolist()))
+        csv_keys[filepath] = keys
+    return csv_keys[filepath]
+
+def append_data_csv(data, filename):
+    # Rows already in the file, as when a failed round is indexed again, are skipped
+    filepath = os.path.join("outputFiles", filename)
+    seen = written_csv_keys(filepath)
+    data = [row for row in data if (row['block'], row['logIndex']) not in seen]
+    if not data:
+        return
+    df = pd.DataFrame(data)
+    df.to_csv(filepath, mode='a', header=not os.path.exists(filepath), index=False)
+    seen.update((row['block'], row['logIndex']) for row in data)
+
+def append_events_csv(from_block, to_block, swap_data, provider_data, burn_data):
+    # scan_logs sink: append each chunk to the same files write_*_csv produce
+    append_data_csv(swap_data, "swap_data.csv")
+    append_data_csv(provider_data, "provider_data.csv")
+    append_data_csv(burn_data, "burn_data.csv")
+    append_data_csv(sorted(provider_data + burn_data, key=lambda x: (x['block'], x['logIndex'])), "liquidity_data.csv")
+
+def append_events_store(from_block, to_block, swap_data, provider_data, burn_data):
+    # Default scan_logs/follow_events sink: stream each chunk into the Parquet event store
+    append_events(EVENT_STORE_DIR, pool_address, "Swap", swap_data)
+    append_events(EVENT_STORE_DIR, pool_address, "Mint", provider_data)
+    append_events(EVENT_STORE_DIR, pool_address, "Burn", burn_data)
+
+# scan_logs sinks by the name their checkpoints are kept under
+SCAN_SINKS = {
+    "eventStore": append_events_store,
+    "csv": append_events_csv,
+}
+
+def rollback_events_store(from_block):
+    for event_name in ("Swap", "Mint", "Burn"):
+        rollback_events(EVENT_STORE_DIR, pool_address, event_name, from_block)
+    # Replay checkpoints past the reorg were built from rows that no longer exist
+    if os.path.isdir(REPLAY_CHECKPOINT_DIR):
+        for filename in os.listdir(REPLAY_CHECKPOINT_DIR):
+            if filename.startswith("checkpoint_") and int(filename.split('_')[1]) >= from_block:
+                os.remove(os.path.join(REPLAY_CHECKPOINT_DIR, filename))
+
+def read_swap_data(start_block=None, end_block=None, start_time=None, end_time=None):
+    return read_events(EVENT_STORE_DIR, pool_address, "Swap", start_block, end_block, start_time, end_time)
+
+def read_liquidity_provider_data(start_block=None, end_block=None, start_time=None, end_time=None):
+    """
+    Mint and Burn rows from the event store merged in (block, logIndex) order, like
+    get_liquidity_provider_data, with an 'event' column telling them apart.
+    """
+    frames = []
+    for event_name in ("Mint", "Burn"):
+        df = read_events(EVENT_STORE_DIR, pool_address, event_name, start_block, end_block, start_time, end_time)
+        if df is not None:
+            df['event'] = event_name
+            frames.append(df)
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True).sort_values(['block', 'logIndex'], kind='stable').reset_index(drop=True)
+
+def get_current_tick(block):
+    """
+    Pool tick after the last swap at or before the block, taken from the event store. Only a
+    window of blocks before it is read, widened until it holds a swap, instead of the whole
+    Swap history.
+    """
+    window = CURRENT_TICK_WINDOW
+    while True:
+        start_block = max(block - window + 1, 0)
+        swaps = read_events(EVENT_STORE_DIR, pool_address, "Swap", start_block=start_block, end_block=block,
+                            columns=['block', 'logIndex', 'tick'])
+        if swaps is not None and not swaps.empty:
+            return int(swaps['tick'].iloc[-1])
+        if start_block == 0:
+            return None
+        window *= 2
+
+def get_liquidity_distribution(block=None, timestamp=None, write_csv=True):
+    """
+    Reconstructs the liquidity distribution as of a block or unix timestamp from the Mint/Burn
+    history in the event store, starting from the nearest replay checkpoint. The store must
+    cover the pool's history from its creation. With write_csv the result is written as a
+    liquidity_data_<timestamp>.csv snapshot.
+    """
+    events = read_liquidity_provider_data(end_block=block, end_time=timestamp)
+    if events is None:
+        print("No Mint/Burn events in the event store.")
+        return None
+
+    state = liquidity_at(events, REPLAY_CHECKPOINT_DIR, block=block, timestamp=timestamp)
+    if write_csv:
+        write_distribution_csv(state, REPLAY_OUTPUT_DIR, pool_address, get_current_tick(state['block']))
+    return state
+
+def update_replay_checkpoints():
+    # Extends the checkpoints to the end of the stored history so later queries replay little
+    events = read_liquidity_provider_data()
+    if events is not None:
+        build_checkpoints(events, REPLAY_CHECKPOINT_DIR)
+
+def rollback_data_csv(filename, from_block):
+    filepath = os.path.join("outputFiles", filename)
+    if not os.path.exists(filepath):
+        return
+    df = pd.read_csv(filepath)
+    df[df['block'] < from_block].to_csv(filepath, index=False)
+    csv_keys.pop(filepath, None)
+
+def rollback_events_csv(from_block):
+    # Default follow_events rollback: drop rows from reorged blocks in the files append_events_csv writes
+    for filename in ("swap_data.csv", "provider_data.csv", "burn_data.csv", "liquidity_data.csv"):
+        rollback_data_csv(filename, from_block)
+
+def get_block_hashes(block_numbers, batch_size=RPC_BATCH_SIZE):
+    block_numbers = list(block_numbers)
+    blocks = rpc_batch([("eth_getBlockByNumber", [hex(b), False]) for b in block_numbers], batch_size)
+    return {b: (block['hash'] if block else None) for b, block in zip(block_numbers, blocks)}
+
+def load_live_state(state_file):
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file) as f:
+        state = json.load(f)
+    state['block_hashes'] = {int(b): h for b, h in state['block_hashes'].items()}
+    return state
+
+def save_live_state(state_file, state):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump({
+            'last_block': state['last_block'],
+            'block_hashes': {str(b): h for b, h in state['block_hashes'].items()}
+        }, f)
+    os.replace(tmp_file, state_file)
+
+def find_reorg_block(block_hashes):
+    # Lowest tracked block whose hash no longer matches the canonical chain, or None
+    current_hashes = get_block_hashes(sorted(block_hashes))
+    for block_number in sorted(block_hashes):
+        if current_hashes[block_number] != block_hashes[block_number]:
+            return block_number
+    return None
+
+def follow_step(state, confirmations, on_events, on_rollback, topic_hashes, enrich, max_range):
+    """
+    One polling round: rolls back to the first reorged block if any tracked hash changed,
+    then indexes the blocks between the last indexed block and the head.
+    Returns True when new blocks were indexed.
+    """
+    head = int(rpc_request("eth_blockNumber", []), 16)
+
+    reorg_block = find_reorg_block(state['block_hashes'])
+    if reorg_block is not None:
+        print(f"Reorg detected at block {reorg_block}, rolling back")
+        on_rollback(reorg_block)
+        forget_block_timestamps(reorg_block)
+        state['last_block'] = reorg_block - 1
+        state['block_hashes'] = {b: h for b, h in state['block_hashes'].items() if b < reorg_block}
+
+    from_block = state['last_block'] + 1
+    to_block = min(head, from_block + max_range - 1)
+    if from_block > to_block:
+        return False
+
+    # Only blocks within the confirmation depth can still be reorged, so only those are tracked
+    tracked_hashes = get_block_hashes(b for b in range(from_block, to_block + 1) if b > head - confirmations)
+    if None in tracked_hashes.values():
+        return False
+
+    log_response = get_logs(from_block, to_block, topic_hashes)
+    if 'error' in log_response:
+        raise RuntimeError(f"eth_getLogs failed for blocks {from_block}-{to_block}: {log_response['error']}")
+    logs = log_response['result']
+
+    # Logs from a different fork than the hashes we just read: the chain moved, retry next round
+    for log in logs:
+        block_number = int(log['blockNumber'], 16)
+        if block_number in tracked_hashes and log['blockHash'] != tracked_hashes[block_number]:
+            return False
+
+    on_events(from_block, to_block, *decode_pool_logs(logs, enrich))
+
+    state['last_block'] = to_block
+    state['block_hashes'].update(tracked_hashes)
+    state['block_hashes'] = {b: h for b, h in state['block_hashes'].items() if b > head - confirmations}
+    print(f"Indexed blocks {from_block}-{to_block}: {len(logs)} logs (head {head})")
+    return True
+
+# Failures of the node or the connection to it, which a later polling round can get past;
+# anything else is a bug in the sinks or decoding and stops follow_events
+RPC_ERRORS = (requests.exceptions.RequestException, json.JSONDecodeError, RuntimeError)
+
+def follow_events(start_block=None, confirmations=CONFIRMATION_DEPTH, poll_interval=POLL_INTERVAL,
+                  on_events=None, on_rollback=None, events=("Swap", "Mint", "Burn"),
+                  state_file=LIVE_STATE_FILE, enrich=True, max_range=INITIAL_LOG_CHUNK):
+    """
+    Follows new blocks by polling and hands decoded events to on_events(from_block, to_block,
+    swap_data, provider_data, burn_data) as they arrive. Hashes of blocks within the
+    confirmation depth are kept, and when one changes on_rollback(from_block) removes the rows
+    from the reorged blocks before they are indexed again. Progress is saved to state_file so
+    a restart continues where it stopped.
+    """
+    if on_events is None:
+        on_events = append_events_store
+    if on_rollback is None:
+        on_rollback = rollback_events_store
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+
+    state = load_live_state(state_file)
+    if state is None:
+        if start_block is None:
+            start_block = int(rpc_request("eth_blockNumber", []), 16)
+        state = {'last_block': start_block - 1, 'block_hashes': {}}
+    topic_hashes = get_event_topics(events)
+
+    while True:
+        try:
+            caught_up = not follow_step(state, confirmations, on_events, on_rollback, topic_hashes, enrich, max_range)
+            save_live_state(state_file, state)
+        except RPC_ERRORS as e:
+            print(f"Error following blocks: {e}")
+            caught_up = True
+        # Keep going without sleeping while catching up on a backlog
+        if caught_up:
+            time.sleep(poll_interval)
+
 # #47000 is an approximate upper bound on a week's worth of ethereum blocks. Typical block takes about 13 seconds to be mined.
+# #scan_logs sizes the chunks to the provider's limits and appends to the event store as it goes, resuming from its checkpoint
+# #Pass sink="csv" to append to the CSVs instead
+# scan_logs(latest_block-47000, latest_block)
+
+# #Fixed-size alternative that keeps everything in memory
 # #Need to break it up in chunks of around 5000 blocks though otherwise hit some sort of limits
 # swap_data = []
 # provider_data = []
 # burn_data = []
-# liquidity_data = []
 # for i in range(latest_block-47000, latest_block, 1250):
-#     swap_data += get_swap_data(i+1, i+1250)
-#     provider_data += get_provider_data(i+1, i+1250)
-#     burn_data += get_burn_data(i+1, i+1250)
-#     liquidity_data += get_liquidity_provider_data(i+1, i+1250)
+#     swaps, mints, burns = get_pool_events(i+1, i+1250)
+#     swap_data += swaps
+#     provider_data += mints
+#     burn_data += burns
+# liquidity_data = sorted(provider_data + burn_data, key=lambda x: x['block'])
 
 # write_swap_data_csv(swap_data)
 # write_provider_data_csv(provider_data)
 # write_burn_data_csv(burn_data)
 # write_liquidity_data_csv(liquidity_data)
 
-get_pool_data()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--follow', action='store_true',
+                        help="follow new blocks and append Swap/Mint/Burn events as they are mined")
+    parser.add_argument('--start-block', type=int, help="first block to index when no live state exists")
+    parser.add_argument('--confirmations', type=int, default=CONFIRMATION_DEPTH,
+                        help="blocks kept for reorg checks before being treated as final")
+    args = parser.parse_args()
+
+    if args.follow:
+        follow_events(start_block=args.start_block, confirmations=args.confirmations)
+    else:
+        get_pool_data()
\ No newline at end of file
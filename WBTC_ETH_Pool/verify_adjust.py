@@ -0,0 +1,91 @@
+import os
+import random
+from decimal import Decimal
+from dotenv import load_dotenv
+from adjustFiles import adjust_liquidity, read_snapshot
+
+load_dotenv()
+
+# Checks adjust_liquidity against the Decimal loop adjustFiles.py used to run, on generated
+# liquidityNet columns and on the pool's own snapshots when they are on disk
+
+def decimal_adjust(values, starts=(0,)):
+    # The original loop: Decimal sums restarting at Decimal('0') when negative or at a new file
+    net_text, text = [], []
+    starts = set(starts)
+    cumulative = Decimal('0')
+    for i, value in enumerate(values):
+        if i in starts:
+            cumulative = Decimal('0')
+        liquidity = Decimal(value)
+        cumulative += liquidity
+        if cumulative < 0:
+            cumulative = Decimal('0')
+        net_text.append(str(liquidity))
+        text.append(str(cumulative))
+    return net_text, text
+
+def compare(name, values, starts=(0,)):
+    expected_net, expected = decimal_adjust(values, starts)
+    net_text, text = adjust_liquidity(values, starts)
+    mismatches = [i for i in range(len(values))
+                  if net_text[i] != expected_net[i] or text[i] != expected[i]]
+    for i in mismatches[:5]:
+        print(f"{name} row {i}: input {values[i]!r} gave ({net_text[i]}, {text[i]}), "
+              f"Decimal gave ({expected_net[i]}, {expected[i]})")
+    return not mismatches
+
+def generated_cases(seed=0, count=200):
+    rng = random.Random(seed)
+    cases = [
+        ("integers", ["5", "-3", "-10", "7", "0", "-0"]),
+        ("float text", ["123.0", "-23.0", "-200.0", "5", "1.5e+16", "-1.5e+16"]),
+        ("zero exponents", ["0.0", "-0.00", "0E-7", "1E+3", "-1E+3", "2"]),
+    ]
+    for n in range(count):
+        values = []
+        for _ in range(rng.randint(1, 40)):
+            number = rng.randint(-2 ** 127, 2 ** 127) if rng.random() < 0.5 else rng.randint(-10 ** 6, 10 ** 6)
+            style = rng.random()
+            if style < 0.6:
+                values.append(str(number))
+            elif style < 0.8:
+                values.append(f"{number}.{'0' * rng.randint(1, 3)}")
+            else:
+                values.append(f"{rng.randint(-9, 9)}.{rng.randint(0, 9)}e+{rng.randint(1, 30)}")
+        cases.append((f"generated {n}", values))
+    return cases
+
+def main():
+    passed = failed = 0
+    cases = generated_cases()
+    for name, values in cases:
+        if compare(name, values):
+            passed += 1
+        else:
+            failed += 1
+
+    # Several generated files in one pass, as adjust_files batches them
+    values, starts = [], []
+    for _, case in cases[:32]:
+        starts.append(len(values))
+        values += case
+    if compare("batched", values, starts):
+        passed += 1
+    else:
+        failed += 1
+
+    source_dir = os.getenv('output_csv_path_WBTC_ETH_Pool')
+    if source_dir and os.path.isdir(source_dir):
+        for filename in sorted(os.listdir(source_dir))[:100]:
+            if filename.endswith('.csv'):
+                values = read_snapshot(os.path.join(source_dir, filename))['liquidityNet'].tolist()
+                if compare(filename, values):
+                    passed += 1
+                else:
+                    failed += 1
+
+    print(f"{passed} cases match the Decimal loop, {failed} differ")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
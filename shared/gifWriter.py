@@ -0,0 +1,79 @@
+import numpy as np
+from PIL import Image # type: ignore
+from PIL.GifImagePlugin import getheader, getdata # type: ignore
+
+# Animated GIF written one frame at a time. Pillow's save_all and imageio's GIF writer keep
+# every frame until the file is closed; this writes each frame to disk as it is appended,
+# so memory stays constant in the number of frames. append_data matches imageio's writers.
+
+# Palette index left unused by build_palette, marking pixels a delta frame leaves unchanged
+TRANSPARENT = 255
+
+def build_palette(frames, colors=TRANSPARENT):
+    """
+    One palette for a whole animation, from a sample of its frames (RGB or RGBA arrays of
+    one size). Every other pixel row and column is enough for the charts' flat colors.
+    """
+    sample = np.concatenate([np.asarray(frame)[::2, ::2, :3] for frame in frames])
+    return Image.fromarray(sample).quantize(colors, method=Image.Quantize.MEDIANCUT)
+
+class GifWriter:
+    """
+    Without a palette every frame is quantized on its own and written whole. With a shared
+    palette from build_palette the frames use the global color table, and each frame after
+    the first only writes the rectangle that changed, its unchanged pixels transparent.
+    """
+
+    def __init__(self, path, duration=1000, loop=0, palette=None):
+        # duration is per frame, in milliseconds; loop 0 repeats forever
+        self.fp = open(path, 'wb')
+        self.duration = duration
+        self.loop = loop
+        self.palette = palette
+        self.previous = None
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_header(self, image):
+        header, _ = getheader(image, info={'loop': self.loop, 'duration': self.duration})
+        self.fp.write(b"".join(header))
+
+    def append_data(self, frame):
+        image = Image.fromarray(np.asarray(frame)[:, :, :3])
+        if self.palette is None:
+            image = image.quantize(256)
+            if self.frames == 0:
+                self.write_header(image)
+            # Each frame carries its own palette, so frames need not share colors
+            self.fp.write(b"".join(getdata(image, duration=self.duration, include_color_table=True)))
+            self.frames += 1
+            return
+
+        image = image.quantize(palette=self.palette, dither=Image.Dither.NONE)
+        indices = np.asarray(image)
+        if self.previous is None:
+            self.write_header(image)
+            self.fp.write(b"".join(getdata(image, duration=self.duration)))
+        else:
+            changed = indices != self.previous
+            rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            # An unchanged frame still needs a (one pixel, transparent) frame to hold its time
+            top, bottom = (rows[0], rows[-1] + 1) if len(rows) else (0, 1)
+            left, right = (columns[0], columns[-1] + 1) if len(columns) else (0, 1)
+            region = np.where(changed[top:bottom, left:right], indices[top:bottom, left:right], TRANSPARENT).astype(np.uint8)
+            delta = Image.frombytes('P', (right - left, bottom - top), region.tobytes())
+            # disposal 1 leaves the previous frame in place under the transparent pixels
+            self.fp.write(b"".join(getdata(delta, offset=(int(left), int(top)), duration=self.duration,
+                                           disposal=1, transparency=TRANSPARENT)))
+        self.previous = indices
+        self.frames += 1
+
+    def close(self):
+        if not self.fp.closed:
+            self.fp.write(b";")
+            self.fp.close()
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd # type: ignore
+import wideInt
+from snapshotArchive import snapshot_sources, read_snapshot
+
+# A pool's whole snapshot history as one dense snapshots x ticks array on disk, memory-mapped
+# on read so slices and aggregations page in only what they touch. Column j is the tick
+# tick_min + j * tick_spacing and holds the liquidity active from that tick up to the next
+# grid tick, i.e. the cumulative_liquidity of the last initialized tick at or below it.
+#
+#   <directory>/values.npy      float32 / float64 (value / scale), or exact int64 wideInt
+#                               limbs with a trailing LIMBS axis
+#   <directory>/timestamps.npy  one timestamp per row, ascending
+#   <directory>/meta.json       tick grid, mode, scale and how the values were derived
+
+MODES = {'exact': np.int64, 'float64': np.float64, 'float32': np.float32}
+
+# Rows per block when aggregating, which bounds the memory an aggregation uses
+CHUNK_ROWS = 256
+
+def sparse_rows(sources, clamped=False, mode='float64', scale=1.0):
+    """
+    Reads every snapshot once, as its sorted initialized ticks and their cumulative
+    liquidity: wideInt limbs in exact mode, otherwise floats divided by scale, so the dense
+    pass needs none of the snapshots again.
+    """
+    rows = []
+    for _, source in sources:
+        df = read_snapshot(source, clamped).sort_values('tickIdx')
+        cumulative = wideInt.parse(df['cumulative_liquidity'])
+        rows.append((df['tickIdx'].to_numpy(dtype=np.int64),
+                     cumulative if mode == 'exact' else wideInt.to_float(cumulative) / scale))
+    return rows
+
+def tick_grid(rows, tick_spacing=None):
+    """
+    The lowest and highest initialized tick and, unless given, the tick spacing as the
+    gcd of the distances between initialized ticks.
+    """
+    tick_min, tick_max, spacing = None, None, 0
+    for ticks, _ in rows:
+        if len(ticks) == 0:
+            continue
+        low, high = int(ticks[0]), int(ticks[-1])
+        tick_min = low if tick_min is None else min(tick_min, low)
+        tick_max = high if tick_max is None else max(tick_max, high)
+        if tick_spacing is None:
+            spacing = int(np.gcd.reduce(np.append(ticks - tick_min, spacing)))
+    return tick_min, tick_max, tick_spacing or spacing or 1
+
+def dense_row(ticks, cumulative, grid):
+    # A snapshot's cumulative liquidity forward-filled onto the grid; zero below its first tick
+    index = np.searchsorted(ticks, grid, side='right') - 1
+    row = cumulative[np.maximum(index, 0)] if len(ticks) else np.zeros((len(grid),) + cumulative.shape[1:], cumulative.dtype)
+    row[index < 0] = 0
+    return row
+
+def build_matrix(csv_dir, output_dir, archive_path=None, mode='float64', scale=1.0, clamped=False,
+                 tick_spacing=None, tick_min=None, tick_max=None):
+    """
+    Aligns every snapshot of a pool (from its archive when archive_path exists, otherwise
+    its CSVs) onto one tick grid and writes the matrix to output_dir, one row at a time.
+    Each snapshot is read once; the grid comes from the sparse rows kept from that read.
+    clamped uses the adjustFiles cumulative liquidity; tick_min / tick_max narrow the grid.
+    The matrix is built beside output_dir and swapped in when complete.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {sorted(MODES)}")
+    sources = snapshot_sources(csv_dir, archive_path)
+    if not sources:
+        print(f"No snapshots found in '{csv_dir}'.")
+        return None
+
+    rows = sparse_rows(sources, clamped, mode, scale)
+    low, high, spacing = tick_grid(rows, tick_spacing)
+    tick_min = low if tick_min is None else tick_min
+    tick_max = high if tick_max is None else tick_max
+    grid = np.arange(tick_min, tick_max + 1, spacing, dtype=np.int64)
+
+    tmp_dir = output_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    shape = (len(sources), len(grid), wideInt.LIMBS) if mode == 'exact' else (len(sources), len(grid))
+    values = np.lib.format.open_memmap(os.path.join(tmp_dir, 'values.npy'), mode='w+', dtype=MODES[mode], shape=shape)
+    for i, (ticks, cumulative) in enumerate(rows):
+        values[i] = dense_row(ticks, cumulative, grid)
+    values.flush()
+    del values
+
+    np.save(os.path.join(tmp_dir, 'timestamps.npy'), np.array([timestamp for timestamp, _ in sources], dtype=np.int64))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'tick_min': int(tick_min),
+            'tick_spacing': int(spacing),
+            'mode': mode,
+            'scale': scale,
+            'clamped': clamped,
+            'source': archive_path if archive_path and os.path.exists(archive_path) else csv_dir,
+        }, f, indent=1)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    print(f"Liquidity matrix {shape} saved to {output_dir}")
+    return output_dir
+
+class LiquidityMatrix:
+    """
+    Read access to a built matrix. values is memory-mapped, so row, column and window
+    return views that read from disk only as they are used.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r')
+        self.timestamps = np.load(os.path.join(directory, 'timestamps.npy'))
+        self.rows = {int(timestamp): row for row, timestamp in enumerate(self.timestamps)}
+        self.tick_min = self.meta['tick_min']
+        self.tick_spacing = self.meta['tick_spacing']
+        self.ticks = self.tick_min + self.tick_spacing * np.arange(self.values.shape[1], dtype=np.int64)
+        self.exact = self.meta['mode'] == 'exact'
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column_index(self, tick):
+        # The grid column whose range holds tick
+        column = (int(tick) - self.tick_min) // self.tick_spacing
+        if not 0 <= column < len(self.ticks):
+            raise KeyError(f"Tick {tick} is outside the matrix grid [{self.ticks[0]}, {self.ticks[-1]}]")
+        return column
+
+    def row(self, timestamp):
+        # Liquidity across the grid for the snapshot at timestamp
+        row = self.rows.get(int(timestamp))
+        if row is None:
+            raise KeyError(f"No snapshot at {timestamp} in {self.directory}")
+        return self.values[row]
+
+    def column(self, tick):
+        # Liquidity at tick in every snapshot, oldest first
+        return self.values[:, self.column_index(tick)]
+
+    def window(self, start_time=None, end_time=None, tick_lower=None, tick_upper=None):
+        """
+        Snapshots with start_time <= timestamp <= end_time and the grid columns covering
+        tick_lower to tick_upper, as (timestamps, ticks, values).
+        """
+        first = 0 if start_time is None else int(np.searchsorted(self.timestamps, start_time, side='left'))
+        last = len(self.timestamps) if end_time is None else int(np.searchsorted(self.timestamps, end_time, side='right'))
+        low = 0 if tick_lower is None else max(0, (int(tick_lower) - self.tick_min) // self.tick_spacing)
+        high = len(self.ticks) if tick_upper is None else max(0, (int(tick_upper) - self.tick_min) // self.tick_spacing + 1)
+        return self.timestamps[first:last], self.ticks[low:high], self.values[first:last, low:high]
+
+    def to_float(self, values):
+        # Values from row / column / window as floats in the liquidity's own units
+        if self.exact:
+            values = np.asarray(values)
+            return wideInt.to_float(values.reshape(-1, wideInt.LIMBS)).reshape(values.shape[:-1])
+        return np.asarray(values, dtype=np.float64) * self.meta['scale']
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        # (first row, float block) over the whole history, one block in memory at a time
+        for first in range(0, len(self.timestamps), chunk_rows):
+            yield first, self.to_float(self.values[first:first + chunk_rows])
+
+    def distribution_stats(self, chunk_rows=CHUNK_ROWS):
+        """
+        Per snapshot: the total liquidity across the grid (negatives clipped to zero, as
+        compare.py plots them) and the liquidity-weighted mean and standard deviation of the
+        tick, computed block by block as array operations.
+        """
+        totals, means, stds = [], [], []
+        ticks = self.ticks.astype(np.float64)
+        for _, block in self.chunks(chunk_rows):
+            weights = np.clip(block, 0, None)
+            total = weights.sum(axis=1)
+            safe = np.where(total > 0, total, 1)
+            mean = weights @ ticks / safe
+            variance = weights @ (ticks ** 2) / safe - mean ** 2
+            totals.append(total)
+            means.append(np.where(total > 0, mean, np.nan))
+            stds.append(np.where(total > 0, np.sqrt(np.clip(variance, 0, None)), np.nan))
+        return pd.DataFrame({
+            'timestamp': self.timestamps,
+            'total_liquidity': np.concatenate(totals) if totals else [],
+            'mean_tick': np.concatenate(means) if means else [],
+            'std_tick': np.concatenate(stds) if stds else [],
+        })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a memory-mapped snapshots x ticks liquidity matrix for a pool")
+    parser.add_argument("csv_dir", help="Directory of liquidity_data_<timestamp>.csv snapshots")
+    parser.add_argument("output_dir", help="Directory to write the matrix to")
+    parser.add_argument("--archive", help="Snapshot archive to read instead of the CSVs")
+    parser.add_argument("--mode", choices=sorted(MODES), default="float64", help="exact keeps every value as wide integer limbs")
+    parser.add_argument("--scale", type=float, default=1.0, help="Divisor applied to float values")
+    parser.add_argument("--clamped", action="store_true", help="Use the adjusted (clamped at zero) cumulative liquidity")
+    parser.add_argument("--tick-spacing", type=int, help="Grid spacing (default: inferred from the snapshots)")
+    parser.add_argument("--tick-min", type=int)
+    parser.add_argument("--tick-max", type=int)
+    args = parser.parse_args()
+    build_matrix(args.csv_dir, args.output_dir, args.archive, args.mode, args.scale, args.clamped,
+                 args.tick_spacing, args.tick_min, args.tick_max)
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+# Per-stage record of which outputs are up to date, kept next to the stage's outputs.
+# Entries are keyed by source file name and hold the source's size, mtime and sha256,
+# the stage's code version, any parameters the outputs depend on, the output paths and
+# stats derived on the way. A stage skips a source whose entry still matches. A source is a
+# file path or an archived snapshot (snapshotArchive.ArchivedSnapshot), which is keyed by
+# the name of the CSV it stands for and checked against its stored digest.
+
+MANIFEST_NAME = "manifest.json"
+
+def load_manifest(directory):
+    filepath = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(filepath):
+        return {}
+    try:
+        with open(filepath) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {filepath}: {e}")
+        return {}
+
+def save_manifest(directory, manifest):
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, MANIFEST_NAME)
+    tmp_file = filepath + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, filepath)
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_name(source):
+    return os.path.basename(source) if isinstance(source, str) else source.name
+
+def unchanged(manifest, source_path):
+    """
+    Whether the source still matches its entry. Size and mtime settle it without reading
+    the file; a source that was only touched is confirmed by its hash.
+    """
+    entry = manifest.get(source_name(source_path))
+    if entry is None:
+        return False
+    if not isinstance(source_path, str):
+        return source_path.sha256 == entry['sha256']
+    stat = os.stat(source_path)
+    if stat.st_size != entry['size']:
+        return False
+    if stat.st_mtime_ns == entry['mtime_ns']:
+        return True
+    if file_hash(source_path) != entry['sha256']:
+        return False
+    entry['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+def is_current(manifest, source_path, version, params=None):
+    # Up to date: same source, same code version and parameters, and every output still there
+    entry = manifest.get(source_name(source_path))
+    if entry is None or entry['version'] != version or entry.get('params') != params:
+        return False
+    if not all(os.path.exists(output) for output in entry['outputs']):
+        return False
+    return unchanged(manifest, source_path)
+
+def cached_stats(manifest, source_path):
+    # Stats derived from the source on an earlier run, or None if the source has changed
+    if unchanged(manifest, source_path):
+        return manifest[source_name(source_path)].get('stats')
+    return None
+
+def record(manifest, source_path, version, outputs, stats=None, params=None, timestamp=None):
+    if isinstance(source_path, str):
+        stat = os.stat(source_path)
+        size, mtime_ns, sha256 = stat.st_size, stat.st_mtime_ns, file_hash(source_path)
+    else:
+        size, mtime_ns, sha256 = None, None, source_path.sha256
+    manifest[source_name(source_path)] = {
+        'timestamp': timestamp,
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'sha256': sha256,
+        'version': version,
+        'params': params,
+        'outputs': outputs,
+        'stats': stats
+    }
+
+def prune(manifest, source_names):
+    # Drops entries whose source files are gone
+    for name in set(manifest) - set(source_names):
+        del manifest[name]
\ No newline at end of file
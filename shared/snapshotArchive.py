@@ -0,0 +1,432 @@
+import os
+import io
+import bisect
+import argparse
+import hashlib
+import threading
+import numpy as np
+import pandas as pd # type: ignore
+import pyarrow as pa # type: ignore
+import pyarrow.parquet as pq # type: ignore
+import wideInt
+from snapshotCatalog import list_snapshots, register_snapshot, SNAPSHOT_PATTERN
+
+# A pool's liquidity_data_<timestamp>.csv snapshots consolidated into one Parquet file with
+# one row per snapshot: timestamp, current_tick, pool_id and a digest of its contents, plus
+# ticks and liquidityNet values as ragged list columns. Nothing is repeated per tick, and
+# cumulative_liquidity is not stored since readers rebuild it from liquidityNet. Rows are
+# sorted by timestamp in row groups of SNAPSHOTS_PER_GROUP.
+#
+# Consecutive snapshots differ in only a handful of ticks, so a row holds the full snapshot
+# (a keyframe) only every KEYFRAME_INTERVAL rows. Every other row holds just the
+# (tickIdx, liquidityNet) pairs that changed since the previous snapshot, with a null
+# liquidityNet for a tick that was removed, and a snapshot is materialized by applying the
+# deltas after its keyframe.
+#
+# Snapshots newer than everything archived are written to small part files in
+# <archive>.parts instead of rewriting the archive, and the parts are folded back into it
+# once there are MAX_PARTS of them or an older snapshot is inserted. A part's rows are all
+# newer than the rows before it, so a part left behind by a fold that stopped before removing
+# it is recognised by its timestamps and ignored.
+
+ARCHIVE_NAME = "snapshots.parquet"
+SNAPSHOTS_PER_GROUP = 16
+MAX_PARTS = 64
+
+# Rows from one keyframe to the next; 1 stores every snapshot in full
+KEYFRAME_INTERVAL = 64
+
+# Appends read the archive to encode against it, so within a process they take turns
+archive_lock = threading.Lock()
+
+# Exact integers up to 76 digits, the same type the event store uses for amounts
+WIDE_INT = pa.decimal256(76, 0)
+
+SCHEMA = pa.schema([
+    pa.field('timestamp', pa.int64()),
+    pa.field('current_tick', pa.int32()),
+    pa.field('pool_id', pa.string()),
+    pa.field('sha256', pa.string()),
+    pa.field('keyframe', pa.bool_()),
+    pa.field('tickIdx', pa.list_(pa.int32())),
+    pa.field('liquidityNet', pa.list_(WIDE_INT)),
+])
+
+def snapshot_row(df):
+    """
+    One snapshot DataFrame (the columns of a liquidity_data_<timestamp>.csv) as an archive
+    row, its liquidityNet values normalized to plain integer strings.
+    """
+    df = df.sort_values('tickIdx')
+    ticks = df['tickIdx'].to_numpy(dtype=np.int32)
+    net = wideInt.parse(df['liquidityNet'])
+    current_tick = df['current_tick'].iloc[0]
+    return {
+        'timestamp': int(df['timestamp'].iloc[0]),
+        'current_tick': None if pd.isna(current_tick) else int(current_tick),
+        'pool_id': df['pool_id'].iloc[0],
+        'sha256': hashlib.sha256(ticks.tobytes() + net.tobytes()).hexdigest(),
+        'keyframe': True,
+        'tickIdx': ticks,
+        'liquidityNet': wideInt.to_strings(net),
+    }
+
+def delta_row(previous, row):
+    # row as its changes since previous: added or changed ticks with their value, removed ticks with None
+    before = dict(zip(previous['tickIdx'].tolist(), previous['liquidityNet']))
+    after = dict(zip(row['tickIdx'].tolist(), row['liquidityNet']))
+    changed = {tick: net for tick, net in after.items() if before.get(tick) != net}
+    changed.update({tick: None for tick in before if tick not in after})
+    ticks = sorted(changed)
+    return {**row, 'keyframe': False,
+            'tickIdx': np.array(ticks, dtype=np.int32),
+            'liquidityNet': np.array([changed[tick] for tick in ticks], dtype=object)}
+
+def encode(rows, keyframe_interval=KEYFRAME_INTERVAL, previous=None, since=0):
+    """
+    Delta-encodes full rows in timestamp order. previous is the full snapshot just before
+    rows and since the number of rows from its keyframe up to and including it; without
+    previous the first row becomes a keyframe.
+    """
+    encoded = []
+    for row in rows:
+        if previous is None or since >= keyframe_interval:
+            encoded.append(row)
+            since = 1
+        else:
+            encoded.append(delta_row(previous, row))
+            since += 1
+        previous = row
+    return encoded
+
+def to_table(rows):
+    # The ragged columns share one offsets array, built once for the whole batch
+    lengths = [len(row['tickIdx']) for row in rows]
+    offsets = pa.array(np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int32))
+    ticks = pa.array(np.concatenate([row['tickIdx'] for row in rows]), type=pa.int32())
+    net = pa.array(np.concatenate([row['liquidityNet'] for row in rows]), type=pa.string()).cast(WIDE_INT)
+    return pa.Table.from_arrays([
+        pa.array([row['timestamp'] for row in rows], type=pa.int64()),
+        pa.array([row['current_tick'] for row in rows], type=pa.int32()),
+        pa.array([row['pool_id'] for row in rows], type=pa.string()),
+        pa.array([row['sha256'] for row in rows], type=pa.string()),
+        pa.array([row['keyframe'] for row in rows], type=pa.bool_()),
+        pa.ListArray.from_arrays(offsets, ticks),
+        pa.ListArray.from_arrays(offsets, net),
+    ], schema=SCHEMA)
+
+def parts_dir(archive_path):
+    return archive_path + ".parts"
+
+def archive_files(archive_path):
+    # The archive file and its part files in timestamp order
+    files = [archive_path] if os.path.exists(archive_path) else []
+    directory = parts_dir(archive_path)
+    if os.path.isdir(directory):
+        parts = [filename for filename in os.listdir(directory)
+                 if filename.startswith('part-') and filename.endswith('.parquet')]
+        files += [os.path.join(directory, filename) for filename in sorted(parts, key=lambda name: int(name.split('-')[1]))]
+    return files
+
+def write_parquet(filepath, table):
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    # A temp name of its own, so a writer in another process never writes over this one's
+    tmp_file = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table.sort_by('timestamp'), tmp_file, row_group_size=SNAPSHOTS_PER_GROUP)
+    os.replace(tmp_file, filepath)
+
+def write_archive(archive_path, table):
+    # Replaces the archive with table, which holds every snapshot, and drops the parts folded into it
+    write_parquet(archive_path, table)
+    for filepath in archive_files(archive_path)[1:]:
+        os.remove(filepath)
+
+def write_part(archive_path, table):
+    timestamps = table.column('timestamp').to_pylist()
+    write_parquet(os.path.join(parts_dir(archive_path), f"part-{min(timestamps)}-{max(timestamps)}.parquet"), table)
+
+def read_table(archive_path):
+    table = pq.read_table(archive_path)
+    if 'keyframe' not in table.column_names:
+        # Archives written before delta encoding hold every snapshot in full
+        table = table.append_column('keyframe', pa.array([True] * table.num_rows, type=pa.bool_()))
+    return table.select(SCHEMA.names).cast(SCHEMA)
+
+def append_snapshots(archive_path, frames, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Writes snapshot DataFrames into the archive, replacing any archived snapshot with the
+    same timestamp. Snapshots newer than the archive are delta-encoded against its newest
+    one and written as a part file. Otherwise rows before the keyframe of the first new
+    snapshot are kept as they are, the rest are re-encoded, and the archive is rewritten with
+    its parts folded in. Every file is swapped in whole, so readers never see a partial one,
+    and appends from several threads are serialized. Returns the number of snapshots written.
+    """
+    with archive_lock:
+        return write_snapshots(archive_path, frames, keyframe_interval)
+
+def write_snapshots(archive_path, frames, keyframe_interval):
+    rows = {}
+    for df in frames:
+        row = snapshot_row(df)
+        rows[row['timestamp']] = row
+    count = len(rows)
+    if not count:
+        return 0
+    if not os.path.exists(archive_path):
+        write_archive(archive_path, to_table(encode([rows[t] for t in sorted(rows)], keyframe_interval)))
+        return count
+
+    archive = SnapshotArchive(archive_path)
+    start = bisect.bisect_left(archive.timestamps, min(rows))
+    previous, since = None, 0
+    if start == len(archive) and start > 0:
+        # Past the newest snapshot, so its run of deltas simply continues
+        previous = archive.full_row(start - 1)
+        since = start - archive.keyframe_before(start - 1)
+        tail = to_table(encode([rows[t] for t in sorted(rows)], keyframe_interval, previous, since))
+        if len(archive.files) <= MAX_PARTS:
+            write_part(archive_path, tail)
+            return count
+    else:
+        if start < len(archive):
+            start = archive.keyframe_before(start)
+            for row in range(start, len(archive)):
+                if archive.timestamps[row] not in rows:
+                    rows[archive.timestamps[row]] = archive.full_row(row)
+        tail = to_table(encode([rows[t] for t in sorted(rows)], keyframe_interval, previous, since))
+
+    write_archive(archive_path, pa.concat_tables([archive.table().slice(0, start), tail]))
+    return count
+
+def import_csv_dir(csv_dir, archive_path, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Imports every snapshot CSV in csv_dir that the archive does not already hold, reading
+    each file once: the bytes read are parsed for the archive and hashed for the catalog.
+    Returns the number of snapshots imported.
+    """
+    archived = set(SnapshotArchive(archive_path).rows) if os.path.exists(archive_path) else set()
+    frames = []
+    for filename in sorted(os.listdir(csv_dir)):
+        match = SNAPSHOT_PATTERN.match(filename)
+        if not match or int(match.group(1)) in archived:
+            continue
+        filepath = os.path.join(csv_dir, filename)
+        try:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            df = pd.read_csv(io.BytesIO(data), dtype={'liquidityNet': str, 'cumulative_liquidity': str, 'pool_id': str})
+            register_snapshot(filepath, df, sha256=hashlib.sha256(data).hexdigest())
+            frames.append(df)
+        except Exception as e:
+            print(f"Error reading {filepath}: {e}")
+    count = append_snapshots(archive_path, frames, keyframe_interval)
+    print(f"Imported {count} snapshots into {archive_path}")
+    return count
+
+class SnapshotArchive:
+    """
+    Read access to an archive and its parts. Opening it reads only the per-snapshot metadata
+    columns and indexes them by timestamp, so any snapshot is then found in constant time, and
+    rebuilt from its keyframe and at most KEYFRAME_INTERVAL - 1 deltas.
+    """
+
+    def __init__(self, archive_path):
+        self.path = archive_path
+        self.files, self.timestamps, self.digests = [], [], []
+        frames, keyframes, self.groups, group_rows = [], [], [], []
+        for filepath in archive_files(archive_path):
+            parquet_file = pq.ParquetFile(filepath)
+            columns = [name for name in ('timestamp', 'current_tick', 'pool_id', 'sha256', 'keyframe')
+                       if name in parquet_file.schema_arrow.names]
+            metadata = parquet_file.read(columns=columns)
+            timestamps = metadata.column('timestamp').to_pylist()
+            if self.timestamps and timestamps and timestamps[0] <= self.timestamps[-1]:
+                # Already folded into the archive by a rewrite that stopped before removing it
+                continue
+            if 'keyframe' in columns:
+                keyframes.append(len(self.timestamps) + np.flatnonzero(metadata.column('keyframe').to_numpy(zero_copy_only=False)))
+            else:
+                keyframes.append(len(self.timestamps) + np.arange(len(timestamps)))
+            self.files.append(filepath)
+            self.timestamps += timestamps
+            self.digests += metadata.column('sha256').to_pylist()
+            frames.append(metadata.to_pandas())
+            for group in range(parquet_file.num_row_groups):
+                self.groups.append((parquet_file, group))
+                group_rows.append(parquet_file.metadata.row_group(group).num_rows)
+        self.rows = {timestamp: row for row, timestamp in enumerate(self.timestamps)}
+        self.metadata = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.keyframes = np.concatenate(keyframes) if keyframes else np.zeros(0, dtype=np.int64)
+        self.group_starts = np.cumsum([0] + group_rows)
+        self.cached_group = (None, None)
+        self.cached_state = (None, None)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __contains__(self, timestamp):
+        return timestamp in self.rows
+
+    def row_group(self, group):
+        # Iterating in timestamp order reads each row group once
+        if self.cached_group[0] != group:
+            parquet_file, file_group = self.groups[group]
+            self.cached_group = (group, parquet_file.read_row_group(file_group, columns=['tickIdx', 'liquidityNet']))
+        return self.cached_group[1]
+
+    def table(self):
+        # Every stored row, from the archive and its parts, in timestamp order
+        return pa.concat_tables([read_table(filepath) for filepath in self.files])
+
+    def row_index(self, timestamp):
+        row = self.rows.get(timestamp)
+        if row is None:
+            raise KeyError(f"No snapshot at {timestamp} in {self.path}")
+        return row
+
+    def keyframe_before(self, row):
+        # The last keyframe at or before row
+        return int(self.keyframes[np.searchsorted(self.keyframes, row, side='right') - 1])
+
+    def stored_row(self, row):
+        # The ticks and liquidityNet values as stored: the full snapshot or its delta
+        group = int(np.searchsorted(self.group_starts, row, side='right')) - 1
+        snapshot = self.row_group(group).slice(row - self.group_starts[group], 1)
+        ticks = snapshot.column('tickIdx').combine_chunks().flatten().to_numpy().tolist()
+        net = snapshot.column('liquidityNet').combine_chunks().flatten().cast(pa.string()).to_pylist()
+        return ticks, net
+
+    def materialize(self, row):
+        """
+        The snapshot at row as a {tickIdx: liquidityNet} dict: its keyframe with the deltas
+        up to row applied. Reading forward from the last snapshot materialized only applies
+        the deltas in between, so iterating in timestamp order reads each row once.
+        """
+        start = self.keyframe_before(row)
+        last, state = self.cached_state
+        if last is not None and start <= last <= row:
+            state, first = dict(state), last + 1
+        else:
+            state, first = dict(zip(*self.stored_row(start))), start + 1
+        for delta in range(first, row + 1):
+            for tick, net in zip(*self.stored_row(delta)):
+                if net is None:
+                    state.pop(tick, None)
+                else:
+                    state[tick] = net
+        self.cached_state = (row, state)
+        return state
+
+    def full_row(self, row):
+        # The snapshot at row in full, as snapshot_row builds it
+        state = self.materialize(row)
+        ticks = sorted(state)
+        info = self.metadata.iloc[row]
+        return {
+            'timestamp': self.timestamps[row],
+            'current_tick': None if pd.isna(info['current_tick']) else int(info['current_tick']),
+            'pool_id': info['pool_id'],
+            'sha256': self.digests[row],
+            'keyframe': True,
+            'tickIdx': np.array(ticks, dtype=np.int32),
+            'liquidityNet': np.array([state[tick] for tick in ticks], dtype=object),
+        }
+
+    def read(self, timestamp, clamped=False):
+        """
+        The snapshot at timestamp with the columns of its liquidity_data_<timestamp>.csv.
+        cumulative_liquidity is the plain running sum graphQueries writes, or with clamped
+        the running sum floored at zero that adjustFiles writes.
+        """
+        row = self.row_index(timestamp)
+        state = self.materialize(row)
+        ticks = np.array(sorted(state), dtype=np.int64)
+        net_text = [state[tick] for tick in ticks.tolist()]
+        net = wideInt.parse(net_text)
+        cumulative = wideInt.clamped_cumsum(net) if clamped else wideInt.cumsum(net)
+        info = self.metadata.iloc[row]
+        return pd.DataFrame({
+            'tickIdx': ticks.astype(np.int64),
+            'liquidityNet': np.array(net_text, dtype=object),
+            'timestamp': timestamp,
+            'current_tick': info['current_tick'],
+            'pool_id': info['pool_id'],
+            'cumulative_liquidity': wideInt.to_strings(cumulative),
+        })
+
+    def changes(self, timestamp):
+        """
+        What changed at timestamp since the previous snapshot: added or changed ticks with
+        their new liquidityNet, and removed ticks with None. A delta row already is the
+        answer; a keyframe is diffed against the snapshot before it.
+        """
+        row = self.row_index(timestamp)
+        if row != self.keyframe_before(row):
+            ticks, net = self.stored_row(row)
+        else:
+            previous = self.full_row(row - 1) if row else {'tickIdx': np.zeros(0, dtype=np.int32), 'liquidityNet': []}
+            delta = delta_row(previous, self.full_row(row))
+            ticks, net = delta['tickIdx'], delta['liquidityNet']
+        return pd.DataFrame({
+            'tickIdx': np.asarray(ticks, dtype=np.int64),
+            'liquidityNet': np.array(net, dtype=object),
+        })
+
+    def snapshots(self, start_time=None, end_time=None):
+        # (timestamp, ArchivedSnapshot) pairs with start_time <= timestamp <= end_time, oldest first
+        first = 0 if start_time is None else bisect.bisect_left(self.timestamps, start_time)
+        last = len(self.timestamps) if end_time is None else bisect.bisect_right(self.timestamps, end_time)
+        return [(timestamp, ArchivedSnapshot(self, timestamp)) for timestamp in self.timestamps[first:last]]
+
+# Archives opened in this process by path, so snapshots sent to worker processes share one
+open_archives = {}
+
+def archived_snapshot(archive_path, timestamp):
+    if archive_path not in open_archives:
+        open_archives[archive_path] = SnapshotArchive(archive_path)
+    return ArchivedSnapshot(open_archives[archive_path], timestamp)
+
+class ArchivedSnapshot:
+    """
+    One archived snapshot, accepted wherever a snapshot CSV path is: by read_snapshot and
+    by the manifest, which keys it by the CSV name and its stored digest. It pickles as its
+    archive path and timestamp, so it can be handed to a worker process like a path.
+    """
+
+    def __init__(self, archive, timestamp):
+        self.archive = archive
+        self.timestamp = timestamp
+        self.name = f"liquidity_data_{timestamp}.csv"
+        self.sha256 = archive.digests[archive.rows[timestamp]]
+
+    def __str__(self):
+        return f"{self.archive.path}[{self.timestamp}]"
+
+    def __reduce__(self):
+        return archived_snapshot, (self.archive.path, self.timestamp)
+
+def snapshot_sources(csv_dir, archive_path=None, start_time=None, end_time=None):
+    # Archived snapshots when the pool has an archive, otherwise its cataloged snapshot CSVs
+    if archive_path and os.path.exists(archive_path):
+        return SnapshotArchive(archive_path).snapshots(start_time, end_time)
+    return list_snapshots(csv_dir, start_time, end_time)
+
+def read_snapshot(source, clamped=False):
+    """
+    Reads a snapshot from a CSV path or an ArchivedSnapshot, keeping liquidityNet and
+    cumulative_liquidity as strings so they stay exact. clamped only applies to archived
+    snapshots; a CSV carries its own cumulative_liquidity.
+    """
+    if isinstance(source, ArchivedSnapshot):
+        return source.archive.read(source.timestamp, clamped)
+    return pd.read_csv(source, dtype={'liquidityNet': str, 'cumulative_liquidity': str})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import liquidity_data_<timestamp>.csv snapshots into a snapshot archive")
+    parser.add_argument("csv_dir", help="Directory of snapshot CSVs")
+    parser.add_argument("archive_path", nargs="?", help=f"Archive file (default: <csv_dir>/../{ARCHIVE_NAME})")
+    parser.add_argument("--keyframe-interval", type=int, default=KEYFRAME_INTERVAL,
+                        help="Rows from one full keyframe to the next; 1 stores every snapshot in full")
+    args = parser.parse_args()
+    import_csv_dir(args.csv_dir, args.archive_path or os.path.join(os.path.dirname(os.path.abspath(args.csv_dir)), ARCHIVE_NAME),
+                   args.keyframe_interval)
\ No newline at end of file
@@ -0,0 +1,190 @@
+import os
+import re
+import sqlite3
+import hashlib
+from collections import namedtuple
+import argparse
+import threading
+import pandas as pd # type: ignore
+import wideInt
+
+# SQLite catalog of liquidity_data_<timestamp>.csv snapshots, shared by every script in the
+# repository. Collectors add a row as they write each snapshot, and readers find snapshots
+# with one indexed query instead of reading every file. A directory is only listed again when
+# its mtime has moved since it was last reconciled, so snapshots written by other means are
+# cataloged the next time it is listed and deleted ones are dropped. A file rewritten in place
+# leaves the directory's mtime alone; run this module on the directory to resync it.
+
+# One catalog at the top of the repository, so the collectors and every reader share it
+CATALOG_FILE = os.getenv('snapshot_catalog_path') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outputFiles", "snapshot_catalog.sqlite")
+
+SNAPSHOT_PATTERN = re.compile(r'liquidity_data_(\d+)\.csv')
+
+CatalogRow = namedtuple('CatalogRow', ['path', 'directory', 'pool', 'timestamp', 'block', 'rows', 'current_tick',
+                                       'max_cumulative_liquidity', 'sha256', 'size', 'mtime_ns'])
+
+catalog_db = None
+# Backfills register snapshots from worker threads, which share the one connection
+catalog_lock = threading.Lock()
+
+def get_catalog_db():
+    global catalog_db
+    if catalog_db is None:
+        os.makedirs(os.path.dirname(CATALOG_FILE) or ".", exist_ok=True)
+        # Collectors and readers in other processes share the file, so writers wait for its lock
+        catalog_db = sqlite3.connect(CATALOG_FILE, timeout=60, check_same_thread=False)
+        catalog_db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                path TEXT PRIMARY KEY,
+                directory TEXT NOT NULL,
+                pool TEXT,
+                timestamp INTEGER NOT NULL,
+                block INTEGER,
+                rows INTEGER,
+                current_tick INTEGER,
+                max_cumulative_liquidity TEXT,
+                sha256 TEXT,
+                size INTEGER,
+                mtime_ns INTEGER
+            )""")
+        columns = {column for _, column, *_ in catalog_db.execute("PRAGMA table_info(snapshots)")}
+        for column in ('size', 'mtime_ns'):
+            # Catalogs from before files were stat'ed; their rows are re-hashed on the next resync
+            if column not in columns:
+                catalog_db.execute(f"ALTER TABLE snapshots ADD COLUMN {column} INTEGER")
+        catalog_db.execute("""
+            CREATE TABLE IF NOT EXISTS directories (
+                directory TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL
+            )""")
+        catalog_db.execute("CREATE INDEX IF NOT EXISTS snapshots_directory_time ON snapshots (directory, timestamp)")
+        catalog_db.execute("CREATE INDEX IF NOT EXISTS snapshots_pool_time ON snapshots (pool, timestamp)")
+    return catalog_db
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def register_snapshot(filepath, df=None, block=None, commit=True, sha256=None):
+    """
+    Adds or refreshes the catalog row of a snapshot CSV. df is the snapshot as written,
+    which saves reading the file back; block is the block it was taken at, if known.
+    """
+    add_catalog_row(catalog_row(filepath, df, block, sha256), commit)
+
+def catalog_row(filepath, df=None, block=None, sha256=None):
+    """
+    The catalog row of a snapshot CSV, as a CatalogRow. sha256 is the digest of the bytes
+    written, when the writer has them at hand, which saves hashing the file back.
+    """
+    if df is None:
+        df = pd.read_csv(filepath, dtype={'liquidityNet': str, 'cumulative_liquidity': str, 'pool_id': str})
+    filepath = os.path.abspath(filepath)
+    match = SNAPSHOT_PATTERN.match(os.path.basename(filepath))
+    timestamp = int(match.group(1)) if match else int(df['timestamp'].iloc[0])
+    current_tick = df['current_tick'].iloc[0] if len(df) else None
+    stat = os.stat(filepath)
+    return CatalogRow(filepath, os.path.dirname(filepath),
+                      str(df['pool_id'].iloc[0]).lower() if len(df) else None,
+                      timestamp, block, len(df),
+                      None if current_tick is None or pd.isna(current_tick) else int(current_tick),
+                      str(wideInt.max_int(wideInt.parse(df['cumulative_liquidity']))),
+                      sha256 or file_hash(filepath), stat.st_size, stat.st_mtime_ns)
+
+def add_catalog_row(row, commit=True):
+    with catalog_lock:
+        db = get_catalog_db()
+        db.execute(f"INSERT OR REPLACE INTO snapshots ({', '.join(CatalogRow._fields)}) "
+                   f"VALUES ({', '.join('?' * len(CatalogRow._fields))})", row)
+        if commit:
+            db.commit()
+
+def catalog_directory(csv_dir):
+    """
+    Reconciles the catalog with csv_dir: catalogs snapshot CSVs that have no row yet, drops
+    rows whose file is gone, and re-hashes files whose size or mtime no longer match their
+    row, reading them again only if their contents changed. Returns the number of snapshots
+    added or updated.
+    """
+    directory = os.path.abspath(csv_dir)
+    db = get_catalog_db()
+    # Taken before listing, so files written while it runs move the mtime past what is stored
+    directory_mtime = os.stat(directory).st_mtime_ns
+    known = {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in
+             db.execute("SELECT path, size, mtime_ns, sha256 FROM snapshots WHERE directory = ?", (directory,))}
+    present = {os.path.join(directory, filename) for filename in os.listdir(directory) if SNAPSHOT_PATTERN.match(filename)}
+    changed = 0
+    for filepath in sorted(present):
+        try:
+            if filepath in known:
+                size, mtime_ns, sha256 = known[filepath]
+                stat = os.stat(filepath)
+                if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                    continue
+                digest = file_hash(filepath)
+                if digest == sha256:
+                    # Touched or copied, not changed: only the stored stat is stale
+                    db.execute("UPDATE snapshots SET size = ?, mtime_ns = ? WHERE path = ?",
+                               (stat.st_size, stat.st_mtime_ns, filepath))
+                    continue
+                register_snapshot(filepath, commit=False, sha256=digest)
+            else:
+                register_snapshot(filepath, commit=False)
+            changed += 1
+        except Exception as e:
+            print(f"Error cataloging {filepath}: {e}")
+    db.executemany("DELETE FROM snapshots WHERE path = ?", [(path,) for path in known.keys() - present])
+    db.execute("INSERT OR REPLACE INTO directories VALUES (?, ?)", (directory, directory_mtime))
+    db.commit()
+    return changed
+
+def directory_changed(csv_dir):
+    # Whether files were added, removed or renamed in csv_dir since it was last reconciled
+    directory = os.path.abspath(csv_dir)
+    stored = get_catalog_db().execute("SELECT mtime_ns FROM directories WHERE directory = ?", (directory,)).fetchone()
+    return stored is None or stored[0] != os.stat(directory).st_mtime_ns
+
+def query_snapshots(csv_dir=None, pool=None, start_time=None, end_time=None, columns=('timestamp', 'path')):
+    """
+    Catalog rows for one directory or pool with start_time <= timestamp <= end_time, oldest
+    first, as tuples of columns.
+    """
+    conditions, params = [], []
+    if csv_dir is not None:
+        conditions.append("directory = ?")
+        params.append(os.path.abspath(csv_dir))
+    if pool is not None:
+        conditions.append("pool = ?")
+        params.append(pool.lower())
+    if start_time is not None:
+        conditions.append("timestamp >= ?")
+        params.append(int(start_time))
+    if end_time is not None:
+        conditions.append("timestamp <= ?")
+        params.append(int(end_time))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {', '.join(columns)} FROM snapshots{where} ORDER BY timestamp, path"
+    return get_catalog_db().execute(query, params).fetchall()
+
+def list_snapshots(csv_dir, start_time=None, end_time=None):
+    """
+    (timestamp, filepath) for the snapshot CSVs in csv_dir within the time range, oldest
+    first. The catalog's rows are trusted unless the directory's mtime has moved since it was
+    last reconciled. Raises FileNotFoundError for a missing directory, as os.listdir would.
+    """
+    if not os.path.isdir(csv_dir):
+        raise FileNotFoundError(f"No such directory: '{csv_dir}'")
+    if directory_changed(csv_dir):
+        catalog_directory(csv_dir)
+    return query_snapshots(csv_dir, start_time=start_time, end_time=end_time)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resync the snapshot catalog with directories of snapshot CSVs")
+    parser.add_argument("csv_dirs", nargs="+", help="Directories of liquidity_data_<timestamp>.csv snapshots")
+    args = parser.parse_args()
+    for csv_dir in args.csv_dirs:
+        print(f"{csv_dir}: {catalog_directory(csv_dir)} snapshots added or updated")
\ No newline at end of file
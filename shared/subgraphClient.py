@@ -0,0 +1,35 @@
+import os
+import threading
+import requests # type: ignore
+
+# Requests to the Uniswap V3 subgraph, shared by each pool's graphQueries.py and the all-pools
+# collector so every query goes through the same checks and the same concurrency limit.
+
+SUBGRAPH_ID = "5zvR82QoaXYFyDEKLZ9t6v9adgnptxYpKpSbxtgVENFV"
+
+# Subgraph requests in flight at once across all threads; backfill workers each fan out
+# over several tick range threads, so the requests themselves are what gets bounded
+MAX_CONCURRENT_REQUESTS = 8
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+def graph_api_url():
+    # Read when a query is sent, so scripts can load their .env after importing this module
+    return f"https://gateway.thegraph.com/api/{os.getenv('the_graph_api_key')}/subgraphs/id/{SUBGRAPH_ID}"
+
+def post_query(query):
+    """
+    Sends a query to The Graph and returns its data, raising on HTTP or GraphQL errors
+    so that a failed page is never mistaken for an empty one.
+    """
+    with request_slots:
+        response = requests.post(
+            graph_api_url(),
+            json={'query': query},
+            headers={'Content-Type': 'application/json'}
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"status {response.status_code}: {response.text}")
+    payload = response.json()
+    if payload.get('errors'):
+        raise RuntimeError(payload['errors'])
+    return payload['data']
\ No newline at end of file
@@ -0,0 +1,169 @@
+import numpy as np
+from decimal import Decimal, InvalidOperation
+
+# Exact wide integers for liquidityGross / liquidityNet (uint128 / int128 on-chain) and their
+# running sums. A column of n values is an (n, LIMBS) int64 array of little-endian 32-bit
+# limbs: the lower limbs stay in [0, 2**32) and the top limb carries the sign, so anything
+# within +-2**159 is exact and add / cumsum / compare run as numpy operations instead of
+# Decimal or Python int arithmetic on every row. CSVs keep the plain decimal strings.
+
+LIMB_BITS = 32
+LIMBS = 4
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+# Packed two's-complement layout for converting to and from Python ints: the three low
+# limbs as uint32 and the signed top limb as int64, 20 bytes per value
+PACKED = np.dtype([('low', '<u4', (LIMBS - 1,)), ('top', '<i8')])
+
+def normalize(limbs):
+    # Propagates carries upward so every limb but the top one is back in [0, 2**32)
+    limbs = np.array(limbs, dtype=np.int64, copy=True)
+    for k in range(LIMBS - 1):
+        carry = limbs[:, k] >> LIMB_BITS
+        limbs[:, k] &= LIMB_MASK
+        limbs[:, k + 1] += carry
+    return limbs
+
+def zeros(n):
+    return np.zeros((n, LIMBS), dtype=np.int64)
+
+def from_ints(values):
+    # Python ints -> limbs through one packed buffer rather than per-limb arithmetic
+    size = PACKED.itemsize
+    try:
+        packed = np.frombuffer(b''.join([int(value).to_bytes(size, 'little', signed=True) for value in values]), dtype=PACKED)
+    except OverflowError:
+        raise ValueError("integer too wide for wideInt")
+    limbs = zeros(len(packed))
+    limbs[:, :LIMBS - 1] = packed['low']
+    limbs[:, LIMBS - 1] = packed['top']
+    return limbs
+
+def to_ints(limbs):
+    packed = np.empty(len(limbs), dtype=PACKED)
+    packed['low'] = limbs[:, :LIMBS - 1]
+    packed['top'] = limbs[:, LIMBS - 1]
+    buffer, size = packed.tobytes(), PACKED.itemsize
+    return [int.from_bytes(buffer[i:i + size], 'little', signed=True) for i in range(0, len(buffer), size)]
+
+def to_integral(value):
+    # Whole-number strings int() rejects, such as '123.0' or '1.5e+16' from older float snapshots
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"invalid integer literal: '{value}'")
+    if not number.is_finite() or number != number.to_integral_value():
+        raise ValueError(f"invalid integer literal: '{value}'")
+    return int(number)
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return to_integral(value)
+
+def parse(strings):
+    """
+    Parses decimal integer strings into limbs. Text to number is the one per-value step,
+    done by Python's own int parser; everything after it runs on the limbs.
+    """
+    strings = list(strings)
+    try:
+        values = list(map(int, strings))
+    except (ValueError, TypeError):
+        values = [parse_int(value) for value in strings]
+    return from_ints(values)
+
+def to_strings(limbs):
+    # Inverse of parse, as an object array ready for a DataFrame column
+    return np.array(list(map(str, to_ints(limbs))), dtype=object)
+
+def to_float(limbs):
+    # Nearest float64, for plotting and scaling
+    scale = 2.0 ** (LIMB_BITS * np.arange(LIMBS))
+    return limbs.astype(np.float64) @ scale
+
+def negate(limbs):
+    return normalize(-np.asarray(limbs, dtype=np.int64))
+
+def add(a, b):
+    return normalize(np.asarray(a, dtype=np.int64) + b)
+
+def subtract(a, b):
+    return normalize(np.asarray(a, dtype=np.int64) - b)
+
+def segment_ids(n, starts):
+    # Row -> segment number for segments beginning at the given row offsets
+    first = np.zeros(n, dtype=bool)
+    starts = np.asarray(starts, dtype=np.int64)
+    first[starts[starts < n]] = True
+    first[:1] = True
+    return np.cumsum(first) - 1
+
+def cumsum(limbs, segments=None):
+    """
+    Running sum, restarting at every segment when segments (from segment_ids) is given.
+    Limb-wise running sums cannot overflow int64 below 2**31 rows, and one carry pass
+    fixes them up.
+    """
+    sums = normalize(np.cumsum(limbs, axis=0))
+    if segments is None or len(limbs) == 0:
+        return sums
+    first = np.flatnonzero(np.diff(segments, prepend=-1))
+    before = np.vstack([zeros(1), sums[:-1]])[first]
+    return subtract(sums, before[segments])
+
+def is_negative(limbs):
+    return limbs[:, LIMBS - 1] < 0
+
+def is_zero(limbs):
+    return (limbs == 0).all(axis=1)
+
+def clip_negative(limbs):
+    # Negative values become zero, like clip(lower=0)
+    return np.where(is_negative(limbs)[:, None], 0, limbs)
+
+def order(limbs):
+    # Ascending sort order; lexsort takes the last key (the signed top limb) as primary
+    return np.lexsort(limbs.T)
+
+def cummin(limbs, segments=None):
+    """
+    Running minimum, restarting at every segment when segments is given. The scan runs
+    over each row's rank, offset per segment so earlier segments can never win, which
+    keeps the prefix pass on plain int64.
+    """
+    n = len(limbs)
+    ranks = np.empty(n, dtype=np.int64)
+    sorted_rows = order(limbs)
+    ranks[sorted_rows] = np.arange(n)
+    if segments is not None:
+        ranks -= segments * n
+        return limbs[sorted_rows[np.minimum.accumulate(ranks) + segments * n]]
+    return limbs[sorted_rows[np.minimum.accumulate(ranks)]]
+
+def clamped_cumsum(limbs, segments=None):
+    """
+    Running sum that restarts from zero whenever it would go negative, that is
+    c[i] = max(0, c[i-1] + x[i]), and from zero at every segment. This equals the plain
+    running sum minus its running minimum floored at zero, so it needs no per-row loop.
+    """
+    if len(limbs) == 0:
+        return zeros(0)
+    sums = cumsum(limbs, segments)
+    lows = cummin(sums, segments)
+    return subtract(sums, np.where(is_negative(lows)[:, None], lows, 0))
+
+def argmax(limbs):
+    # Narrows the candidates limb by limb from the top, so the whole comparison stays in numpy
+    candidates = np.arange(len(limbs))
+    for k in range(LIMBS - 1, -1, -1):
+        column = limbs[candidates, k]
+        candidates = candidates[column == column.max()]
+    return int(candidates[0])
+
+def max_int(limbs):
+    # Largest value as a Python int, or 0 for an empty column
+    if len(limbs) == 0:
+        return 0
+    return to_ints(limbs[[argmax(limbs)]])[0]
\ No newline at end of file